@@ -0,0 +1,158 @@
+from math import pi, cos, sin
+
+from Business.PartAction import add_revolve_in_part
+from Data.Axis import Axis
+from Data.Document import Document
+from Data.Part import Part
+from Data.Proformer import ProformerType
+from Data.Sketch import Sketch
+from Data.Vertex import Vertex
+import Business.SketchActions as SketchActions
+
+__author__ = 'mamj'
+
+
+def create_document():
+	return Document()
+
+
+def create_sketch(doc, name="Sketch"):
+	sketch = Sketch(doc)
+	sketch.name = name
+	doc.add_sketch(sketch)
+	return sketch
+
+
+def add_grid(sketch, cells, size=1.0, x=0.0, y=0.0):
+	"""
+	Adds a grid of cells x cells squares of line edges with its lower left corner in (x, y).
+	:return: (cells + 1) x (cells + 1) list of the key points
+	"""
+	kps = [[sketch.create_keypoint(x + i * size, y + j * size, 0) for j in range(cells + 1)] for i in range(cells + 1)]
+	for i in range(cells + 1):
+		for j in range(cells):
+			sketch.create_line_edge(kps[i][j], kps[i][j + 1])
+			sketch.create_line_edge(kps[j][i], kps[j + 1][i])
+	return kps
+
+
+def add_arcs(sketch, count, radius=0.4, x=0.0, y=-2.0):
+	"""
+	Adds a row of count closed quarter circles, each an arc with a chord line.
+	"""
+	for i in range(count):
+		center = sketch.create_keypoint(x + i, y, 0)
+		arc = sketch.create_arc_edge(center, 0, pi / 2, radius)
+		kps = arc.get_end_key_points()
+		sketch.create_line_edge(kps[0], kps[1])
+
+
+def add_fillets(sketch, count, radius=0.1, x=0.0, y=-4.0):
+	"""
+	Adds a zigzag line with a fillet in each of its count inner corners.
+	"""
+	radius_param = sketch.create_parameter("fillet_radius", radius)
+	kps = [sketch.create_keypoint(x + i, y + (i % 2), 0) for i in range(count + 2)]
+	for i in range(count + 1):
+		sketch.create_line_edge(kps[i], kps[i + 1])
+	for kp in kps[1:-1]:
+		sketch.create_fillet_edge(kp, radius_param)
+
+
+def create_sketch_document(cells, arcs=0, fillets=0):
+	"""
+	Document with one sketch holding a grid of cells x cells squares, a row of arcs and a zigzag with fillets.
+	"""
+	doc = create_document()
+	sketch = create_sketch(doc)
+	add_grid(sketch, cells)
+	add_arcs(sketch, arcs)
+	add_fillets(sketch, fillets)
+	return doc, sketch
+
+
+def add_pattern(sketch, count, length=3.0):
+	"""
+	Adds a count x count square pattern of a unit square with its area.
+	"""
+	kps = [sketch.create_keypoint(x - 10, y - 10, 0) for x, y in [(0, 0), (1, 0), (1, 1), (0, 1)]]
+	edges = [sketch.create_line_edge(kps[i], kps[(i + 1) % 4]) for i in range(4)]
+	area = sketch.create_area()
+	for edge in edges:
+		area.add_edge(edge)
+	counts = {'param_1_name': 'count1', 'param_1_value': count, 'param_2_name': 'count2', 'param_2_value': count}
+	dimensions = {'param_1_name': 'length', 'param_1_value': length, 'param_2_name': 'angle', 'param_2_value': 0.0}
+	return SketchActions.create_pattern(sketch, ProformerType.Square, kps, edges, [area], counts, dimensions)
+
+
+def create_pattern_document(count):
+	doc = create_document()
+	sketch = create_sketch(doc)
+	proformer = add_pattern(sketch, count)
+	return doc, sketch, proformer
+
+
+def create_parameter_chain(doc, depth):
+	"""
+	Creates the parameters p0 to p<depth> where every parameter is a formula of the one before it.
+	:return: the list of parameters
+	"""
+	parameters = doc.get_parameters()
+	chain = [parameters.create_parameter("p0", 1.0)]
+	for i in range(1, depth + 1):
+		parameter = parameters.create_parameter("p%d" % i, 0.0)
+		parameter.value = "p%d * 1.0001 + 1" % (i - 1)
+		chain.append(parameter)
+	return chain
+
+
+def create_part_document(extrudes, revolves=0):
+	"""
+	Document with a sketch of separate squares and a part with an extrude feature per square, and a revolve feature
+	per square above a revolve axis line.
+	"""
+	doc = create_document()
+	sketch = create_sketch(doc)
+	count = extrudes + revolves
+	for i in range(count):
+		x = 2.0 * i
+		kps = [sketch.create_keypoint(x + dx, 1 + dy, 0) for dx, dy in [(0, 0), (1, 0), (1, 1), (0, 1)]]
+		for j in range(4):
+			sketch.create_line_edge(kps[j], kps[(j + 1) % 4])
+	axis_kps = [sketch.create_keypoint(0, 0, 0), sketch.create_keypoint(1, 0, 0)]
+	axis_edge = sketch.create_line_edge(axis_kps[0], axis_kps[1])
+	SketchActions.create_all_areas(doc, sketch)
+	areas = sorted(sketch.get_areas(), key=lambda a: min(kp.x for kp in a.get_keypoints()))
+
+	part = Part(doc.get_parameters())
+	doc.get_geometries().add_geometry(part)
+	plane = part.create_plane_feature('XY', Vertex(0, 0, 0), Vertex(1, 0, 0), Vertex(0, 1, 0))
+	part.add_sketch(sketch)
+	sketch_feature = part.create_sketch_feature(sketch, plane)
+	for area in areas[:extrudes]:
+		part.create_extrude_feature('Extrude', sketch_feature, area, [0, 1])
+	if revolves > 0:
+		axis = Axis(doc)
+		axis.set_edge_governor(axis_edge, sketch)
+		for area in areas[extrudes:]:
+			add_revolve_in_part(doc, part, sketch_feature, area, [pi / 2, 0], axis)
+	return doc, sketch, part
+
+
+def create_instances_document(instances, cells=4):
+	"""
+	Document with a base sketch, a sketch holding instances of it on a circle and a drawing with a sketch view of the
+	base sketch per instance.
+	"""
+	doc, base_sketch = create_sketch_document(cells)
+	sketch = create_sketch(doc, "Instances")
+	for i in range(instances):
+		angle = 2 * pi * i / max(instances, 1)
+		kp = sketch.create_keypoint(10 * cos(angle), 10 * sin(angle), 0)
+		sketch.create_sketch_instance(base_sketch, kp)
+	drawings = doc.get_drawings()
+	header = drawings.create_header()
+	drawing = drawings.create_drawing([0.841, 0.594], "Drawing", header, 0)
+	for i in range(instances):
+		drawing.create_sketch_view(base_sketch, 0.01, Vertex(0.02 + 0.01 * (i % 50), 0.02 + 0.01 * (i // 50)))
+	return doc, sketch, drawing
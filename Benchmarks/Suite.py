@@ -0,0 +1,268 @@
+import gc
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+import Business
+import Business.SketchActions as SketchActions
+from Benchmarks import Generators
+from Business.batch import get_part_triangles
+from Data.DocumentStream import stream_format_ending
+from Data.Tessellation import tessellate_draw_data
+
+__author__ = 'mamj'
+
+
+class Benchmark(object):
+	"""
+	A timed operation. setup is called with the size before every repetition and is not timed, run is called with
+	what setup returns and is timed.
+	"""
+	def __init__(self, name, base_size, setup, run, description=""):
+		self.name = name
+		self.base_size = base_size
+		self.setup = setup
+		self.run = run
+		self.description = description
+
+	def get_size(self, scale):
+		return max(1, int(round(self.base_size * scale)))
+
+	def measure(self, scale, repeat):
+		size = self.get_size(scale)
+		times = []
+		for i in range(repeat):
+			state = self.setup(size)
+			gc.collect()
+			start = time.perf_counter()
+			self.run(state)
+			times.append(time.perf_counter() - start)
+			if isinstance(state, dict) and 'cleanup' in state:
+				state['cleanup']()
+		return {
+			'name': self.name,
+			'size': size,
+			'times': times,
+			'min': min(times),
+			'median': statistics.median(times),
+			'mean': statistics.mean(times)
+		}
+
+
+class SkippedBenchmark(Exception):
+	pass
+
+
+def setup_areas(size):
+	doc, sketch = Generators.create_sketch_document(size, arcs=size, fillets=size)
+	return {'doc': doc, 'sketch': sketch}
+
+
+def run_areas(state):
+	SketchActions.create_all_areas(state['doc'], state['sketch'])
+
+
+def create_file_document(size):
+	doc, sketch = Generators.create_sketch_document(size, arcs=size, fillets=size)
+	SketchActions.create_all_areas(doc, sketch)
+	Generators.add_pattern(sketch, max(2, size // 4))
+	return doc
+
+
+def setup_save(ending):
+	def setup(size):
+		doc = create_file_document(size)
+		path = tempfile.mkdtemp(prefix="pracedru-benchmark-")
+		doc.path = path
+		doc.name = "benchmark" + ending
+		return {'doc': doc, 'cleanup': lambda: shutil.rmtree(path, ignore_errors=True)}
+	return setup
+
+
+def run_save(state):
+	Business.save_document(state['doc'])
+
+
+def setup_load(ending):
+	save_setup = setup_save(ending)
+
+	def setup(size):
+		state = save_setup(size)
+		Business.save_document(state['doc'])
+		state['file_path'] = os.path.join(state['doc'].path, state['doc'].name)
+		return state
+	return setup
+
+
+def run_load(state):
+	doc = Business.load_document(state['file_path'])
+	doc.get_geometries().items()
+
+
+def setup_parameters(size):
+	doc = Generators.create_document()
+	return {'chain': Generators.create_parameter_chain(doc, size)}
+
+
+def run_parameters(state):
+	chain = state['chain']
+	chain[0].value = 2.0
+	chain[-1].value
+
+
+def setup_pattern_create(size):
+	doc = Generators.create_document()
+	return {'sketch': Generators.create_sketch(doc), 'size': size}
+
+
+def run_pattern_create(state):
+	Generators.add_pattern(state['sketch'], state['size'])
+	state['sketch'].get_keypoints()
+
+
+def setup_pattern(size):
+	doc, sketch, proformer = Generators.create_pattern_document(size)
+	sketch.get_keypoints()
+	return {'doc': doc, 'sketch': sketch, 'proformer': proformer}
+
+
+def run_pattern_resize(state):
+	count = state['sketch'].get_parameter_by_name('count1')
+	count.value = count.value + 1
+	state['sketch'].get_keypoints()
+
+
+def run_pattern_move(state):
+	kp = state['proformer'].base_keypoints[0]
+	kp.x = kp.x - 0.5
+
+
+def setup_part(size):
+	doc, sketch, part = Generators.create_part_document(size, max(1, size // 4))
+	return {'doc': doc, 'part': part}
+
+
+def run_part_update(state):
+	state['part'].update_geometry()
+
+
+def setup_part_triangles(size):
+	state = setup_part(size)
+	state['part'].update_geometry()
+	return state
+
+
+def run_part_triangles(state):
+	get_part_triangles(state['part'])
+
+
+def setup_tessellation(size):
+	doc, sketch = Generators.create_sketch_document(size, arcs=size * size, fillets=size)
+	return {'sketch': sketch}
+
+
+def run_tessellation(state):
+	origin = np.zeros(3)
+	pm = np.eye(3)
+	for edge in state['sketch'].get_edges():
+		tessellate_draw_data(edge.get_draw_data(), origin, pm)
+
+
+def setup_spatial_index(size):
+	doc, sketch = Generators.create_sketch_document(size, arcs=size, fillets=size)
+	SketchActions.create_all_areas(doc, sketch)
+	return {'sketch': sketch}
+
+
+def run_spatial_index(state):
+	sketch = state['sketch']
+	sketch.get_spatial_index().rebuild()
+	sketch.get_limits()
+
+
+def get_paint_device():
+	"""
+	Creates a QGuiApplication on the offscreen platform, so sketches can be painted without a display.
+	"""
+	os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+	try:
+		from PyQt5.QtGui import QGuiApplication, QImage
+	except ImportError as e:
+		raise SkippedBenchmark("PyQt5 is not available: %s" % str(e))
+	if QGuiApplication.instance() is None:
+		get_paint_device.application = QGuiApplication(['benchmark'])
+	return QImage(1024, 1024, QImage.Format_ARGB32)
+
+
+def setup_paint_sketch(size):
+	image = get_paint_device()
+	doc, sketch = Generators.create_sketch_document(size, arcs=size, fillets=size)
+	return {'doc': doc, 'sketch': sketch, 'image': image}
+
+
+def setup_paint_instances(size):
+	image = get_paint_device()
+	doc, sketch, drawing = Generators.create_instances_document(size)
+	return {'doc': doc, 'sketch': sketch, 'image': image}
+
+
+def run_paint(state):
+	from PyQt5.QtGui import QColor, QPainter
+	from Data.Vertex import Vertex
+	from GUI.Widgets.NewDrawers import draw_sketch, get_pens
+	sketch = state['sketch']
+	image = state['image']
+	limits = sketch.get_limits()
+	width = max(limits[2] - limits[0], 1e-6)
+	height = max(limits[3] - limits[1], 1e-6)
+	scale = min(image.width() / width, image.height() / height) * 0.9
+	offset = Vertex(-limits[0] - width / 2, -limits[1] - height / 2)
+	center = Vertex(image.width() / 2, image.height() / 2)
+	qp = QPainter()
+	qp.begin(image)
+	qp.setRenderHint(QPainter.Antialiasing)
+	pens = get_pens(state['doc'], 6000 / scale, QColor(0, 0, 0))
+	draw_sketch(qp, sketch, scale, 1 / scale, offset, center, 0, pens, {})
+	qp.end()
+
+
+benchmarks = [
+	Benchmark('create_all_areas', 16, setup_areas, run_areas, "areas of a grid of size x size squares"),
+	Benchmark('save_json', 16, setup_save('.jadoc'), run_save, "save a sketch document as text"),
+	Benchmark('load_json', 16, setup_load('.jadoc'), run_load, "load a sketch document from text"),
+	Benchmark('save_stream', 16, setup_save(stream_format_ending), run_save, "save a sketch document as stream"),
+	Benchmark('load_stream', 16, setup_load(stream_format_ending), run_load, "load a sketch document from stream"),
+	Benchmark('parameter_propagation', 500, setup_parameters, run_parameters, "change the root of a formula chain"),
+	Benchmark('proformer_create', 20, setup_pattern_create, run_pattern_create, "create a size x size pattern"),
+	Benchmark('proformer_resize', 20, setup_pattern, run_pattern_resize, "grow a size x size pattern by a row"),
+	Benchmark('proformer_move', 20, setup_pattern, run_pattern_move, "move a key point of a size x size pattern"),
+	Benchmark('part_update_geometry', 20, setup_part, run_part_update, "regenerate size extrudes and revolves"),
+	Benchmark('part_triangles', 20, setup_part_triangles, run_part_triangles, "triangulate the part surfaces"),
+	Benchmark('tessellation', 16, setup_tessellation, run_tessellation, "tessellate the edges of a sketch"),
+	Benchmark('spatial_index', 16, setup_spatial_index, run_spatial_index, "rebuild the spatial index of a sketch"),
+	Benchmark('paint_sketch', 16, setup_paint_sketch, run_paint, "paint a sketch offscreen"),
+	Benchmark('paint_instances', 50, setup_paint_instances, run_paint, "paint size sketch instances offscreen")
+]
+
+
+def run_benchmarks(scale=1.0, repeat=3, names=None, report=None):
+	"""
+	Runs the benchmarks, or those whose names contain one of names, and returns their results. Benchmarks that can
+	not run here are returned with the reason they were skipped.
+	"""
+	results = []
+	for benchmark in benchmarks:
+		if names is not None and not any(name in benchmark.name for name in names):
+			continue
+		try:
+			result = benchmark.measure(scale, repeat)
+		except SkippedBenchmark as e:
+			result = {'name': benchmark.name, 'size': benchmark.get_size(scale), 'skipped': str(e)}
+		results.append(result)
+		if report is not None:
+			report(result)
+	return results
@@ -0,0 +1,72 @@
+"""
+Runs the benchmarks and writes the results as JSON, so they can be compared between releases.
+
+	python -m Benchmarks --scale 1 --repeat 5 --output results.json --compare previous.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from Benchmarks.Suite import run_benchmarks
+
+__author__ = 'mamj'
+
+scales = {'small': 0.25, 'medium': 1.0, 'large': 4.0}
+
+
+def get_revision():
+	try:
+		return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def format_result(result, previous=None):
+	if 'skipped' in result:
+		return "%-24s %8d  skipped: %s" % (result['name'], result['size'], result['skipped'])
+	line = "%-24s %8d  min %9.4fs  median %9.4fs" % (result['name'], result['size'], result['min'], result['median'])
+	if previous is not None and 'median' in previous and previous['size'] == result['size'] and previous['median'] > 0:
+		line += "  %6.2fx" % (result['median'] / previous['median'])
+	return line
+
+
+def main(args=None):
+	parser = argparse.ArgumentParser(prog="python -m Benchmarks", description="Times the hot paths on synthetic documents.")
+	parser.add_argument('--scale', default='medium', help="small, medium, large or a factor on the base sizes")
+	parser.add_argument('--repeat', type=int, default=3, help="repetitions of every benchmark")
+	parser.add_argument('--filter', nargs='*', help="only run benchmarks whose names contain one of these")
+	parser.add_argument('--output', metavar='FILE', help="write the results as JSON to FILE")
+	parser.add_argument('--compare', metavar='FILE', help="show the median relative to the results in FILE")
+	options = parser.parse_args(args)
+	scale = scales[options.scale] if options.scale in scales else float(options.scale)
+
+	previous = {}
+	if options.compare is not None:
+		with open(options.compare) as data_file:
+			previous = {result['name']: result for result in json.load(data_file)['results']}
+
+	results = run_benchmarks(scale, options.repeat, options.filter,
+							 lambda result: print(format_result(result, previous.get(result['name'], None)), flush=True))
+	data = {
+		'revision': get_revision(),
+		'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+		'python': platform.python_version(),
+		'numpy': np.__version__,
+		'platform': platform.platform(),
+		'scale': scale,
+		'repeat': options.repeat,
+		'results': results
+	}
+	if options.output is not None:
+		with open(options.output, 'w') as data_file:
+			json.dump(data, data_file, indent=2)
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -1,9 +1,9 @@
-import collections
-from math import pi
+import numpy as np
 
 from Business.ParameterActions import get_create_parameter
 from Business.Undo import DoObject
 from Data.Document import Document
+from Data.PlanarGraph import find_faces, find_holes
 from Data.Proformer import ProformerType
 from Data.Sketch import *
 
@@ -135,77 +135,99 @@ def set_similar_y(document: Document, sketch: Sketch, key_points: [], name):
 		kp.set_y_parameter(param.uid)
 
 
-def find_all_similar(doc, sketch, digits):
-	key_points = sketch.get_keypoints()
-	sim_x_dict = {}
-	sim_y_dict = {}
-	arcs = []
-	doc.do_update = False
-	for kp in key_points:
-		x_name = round(kp.x, digits)
-		y_name = round(kp.y, digits)
-		if x_name not in sim_x_dict:
-			sim_x_dict[x_name] = []
-		if y_name not in sim_y_dict:
-			sim_y_dict[y_name] = []
-		sim_x_dict[x_name].append(kp)
-		sim_y_dict[y_name].append(kp)
+def cluster_values(values, tolerance):
+	"""
+	Groups values that are within tolerance of the smallest value of their group. The values are sorted once and a
+	new cluster is started at the first value more than tolerance above the start of the current one, so a cluster
+	never spans more than tolerance, however closely its neighbours are chained.
+	:return: tuple of the cluster index of every value and the mean value of every cluster, in ascending order
+	"""
+	values = np.asarray(values, dtype=np.float64)
+	if len(values) == 0:
+		return np.zeros(0, dtype=np.int64), np.zeros(0)
+	order = np.argsort(values, kind='stable')
+	sorted_values = values[order]
+	starts = np.zeros(len(values), dtype=bool)
+	start = 0
+	while start < len(values):
+		starts[start] = True
+		start = int(np.searchsorted(sorted_values, sorted_values[start] + tolerance, side='right'))
+	labels = np.empty(len(values), dtype=np.int64)
+	labels[order] = np.cumsum(starts) - 1
+	counts = np.bincount(labels)
+	means = np.bincount(labels, weights=values) / counts
+	return labels, means
+
+
+def get_unique_names(parameters, prefix, count):
+	names = set(param.name for param in parameters.get_all_parameters())
+	unique_names = []
 	counter = 0
-
-	sim_x_dict = collections.OrderedDict(sorted(sim_x_dict.items()))
-	sim_y_dict = collections.OrderedDict(sorted(sim_y_dict.items()))
-	for sim_x_list_tuple in sim_x_dict.items():
-		sim_x_list = sim_x_list_tuple[1]
-		param = None
-		for kp in sim_x_list:
-			if kp.get_x_parameter() is not None:
-				param = kp.get_x_parameter()
+	while len(unique_names) < count:
+		name = prefix + '%03d' % counter
+		if name not in names:
+			unique_names.append(name)
+		counter += 1
+	return unique_names
+
+
+def set_similar_parameters(sketch, key_points, values, component, tolerance, digits):
+	"""
+	Gives the key points that have similar values of a component a common parameter. Clusters that already have a
+	parameter on one of their key points keep it, the parameters of the others are created in one operation.
+	"""
+	labels, means = cluster_values(values, tolerance)
+	if digits is not None:
+		means = np.round(means, digits)
+	clusters = [[] for i in range(len(means))]
+	for kp, label in zip(key_points, labels):
+		clusters[label].append(kp)
+	cluster_params = [None] * len(clusters)
+	for index, cluster in enumerate(clusters):
+		for kp in cluster:
+			param = kp.get_x_parameter() if component == 0 else kp.get_y_parameter()
+			if param is not None:
+				cluster_params[index] = param
 				break
-		if param is None:
-			exists = True
-			while exists:
-				name = 'X%03d' % counter
-				if sketch.get_parameter_by_name(name) is None:
-					exists = False
-				counter += 1
-			param = sketch.create_parameter(name, float(sim_x_list_tuple[0]))
-			param.hidden = True
-		for kp in sim_x_list:
-			kp.set_x_parameter(param.uid)
-	counter = 0
-	for sim_y_list_tuple in sim_y_dict.items():
-		sim_y_list = sim_y_list_tuple[1]
-		param = None
-		for kp in sim_y_list:
-			if kp.get_y_parameter() is not None:
-				param = kp.get_y_parameter()
-				break
-		if param is None:
-			exists = True
-			while exists:
-				name = 'Y%03d' % counter
-				if sketch.get_parameter_by_name(name) is None:
-					exists = False
-				counter += 1
-			param = sketch.create_parameter(name, float(sim_y_list_tuple[0]))
-			param.hidden = True
-		for kp in sim_y_list:
-			kp.set_y_parameter(param.uid)
-	for edge in sketch.get_edges():
-		if edge.type == EdgeType.ArcEdge:
-			r = edge.get_meta_data("r")
-			ea = edge.get_meta_data("ea")
-			sa = edge.get_meta_data("sa")
-			if edge.get_meta_data_parameter('r') is None:
-				param_r = doc.get_parameters().create_parameter('PARR_' + edge.name, r)
-				edge.set_meta_data_parameter('r', param_r)
-			if edge.get_meta_data_parameter('sa') is None:
-				param_sa = doc.get_parameters().create_parameter('PARSA_' + edge.name, sa)
-				edge.set_meta_data_parameter('sa', param_sa)
-			if edge.get_meta_data_parameter('ea') is None:
-				param_ea = doc.get_parameters().create_parameter('PAREA_' + edge.name, ea)
-				edge.set_meta_data_parameter('ea', param_ea)
-	doc.do_update = True
+	missing = [index for index, param in enumerate(cluster_params) if param is None]
+	names = get_unique_names(sketch, 'X' if component == 0 else 'Y', len(missing))
+	new_params = sketch.create_parameters([(name, float(means[index])) for name, index in zip(names, missing)], True)
+	for index, param in zip(missing, new_params):
+		cluster_params[index] = param
+	for cluster, param in zip(clusters, cluster_params):
+		for kp in cluster:
+			if component == 0 and kp.get_x_parameter() is not param:
+				kp.set_x_parameter(param.uid)
+			elif component == 1 and kp.get_y_parameter() is not param:
+				kp.set_y_parameter(param.uid)
+
+
+def find_all_similar(doc, sketch, digits=None, tolerance=None):
+	"""
+	Parametrizes the sketch by giving key points with similar x or y values common parameters. Values are similar
+	when they are within tolerance of each other, if only digits is given the tolerance is half a unit of the last
+	digit. Arcs get parameters for their radius and angles.
+	"""
+	if tolerance is None:
+		tolerance = 0.5 * 10 ** -(digits if digits is not None else 3)
+	with doc.batch():
+		key_point_array = sketch.get_key_point_array()
+		key_points = key_point_array.get_key_points()
+		doc.do_update = False
+		coordinates = key_point_array.get_coordinates()[:, :2]
+		set_similar_parameters(sketch, key_points, coordinates[:, 0], 0, tolerance, digits)
+		set_similar_parameters(sketch, key_points, coordinates[:, 1], 1, tolerance, digits)
+		arc_params = []
+		for edge in sketch.get_edges():
+			if edge.type == EdgeType.ArcEdge:
+				for meta_name, prefix in (('r', 'PARR_'), ('sa', 'PARSA_'), ('ea', 'PAREA_')):
+					if edge.get_meta_data_parameter(meta_name) is None:
+						arc_params.append((edge, meta_name, prefix + edge.name))
+		params = doc.get_parameters().create_parameters(
+			[(name, edge.get_meta_data(meta_name)) for edge, meta_name, name in arc_params])
+		for arc_param, param in zip(arc_params, params):
+			arc_param[0].set_meta_data_parameter(arc_param[1], param)
+		doc.do_update = True
 
 
 def remove_key_points(sketch, kps):
@@ -235,34 +257,27 @@ def create_area(sketch, branch):
 	for edge in branch['edges']:
 		area.add_edge(edge)
 	find_fillets(sketch, area)
+	return area
 
 
 def create_all_areas(docs: Document, sketch: Sketch):
-	edges = []
-	for edge in sketch.get_edges():
-		edges.append(edge)
-	branches = find_all_areas(edges)
-	sketch.clear_areas()
-	unique_branches = []
-	for branch in branches:
-		is_unique = True
-		for unique_branch in unique_branches:
-			if len(branch['edges']) == len(unique_branch['edges']):
-				same_all = True
-				for edge in branch['edges']:
-					if edge not in unique_branch['edges']:
-						same_all = False
-				if same_all:
-					is_unique = False
-		if is_unique:
-			unique_branches.append(branch)
-
-	for branch in unique_branches:
-		if branch['enclosed']:
-			area = sketch.create_area()
-			for edge in branch['edges']:
-				area.add_edge(edge)
-			find_fillets(sketch, area)
+	with docs.batch():
+		docs.set_status("Finding areas", 0)
+		faces = find_all_areas(sketch.get_edges())
+		holes = find_holes(faces)
+		sketch.clear_areas()
+		enclosed = [index for index, face in enumerate(faces) if face['enclosed']]
+		# The outline of a part of the sketch is an area too, unless it is the loop of an enclosed face already
+		loops = set(frozenset(faces[index]['edges']) for index in enclosed)
+		enclosed.extend(index for index, face in enumerate(faces) if face['boundary'] and frozenset(face['edges']) not in loops)
+		count = len(enclosed)
+		areas = {}
+		for counter, index in enumerate(enclosed):
+			docs.set_status("Creating area %d of %d" % (counter + 1, count), 100 * counter / count)
+			areas[index] = create_area(sketch, faces[index])
+		for index, hole_indexes in holes.items():
+			create_composite_area(sketch, areas[index], [areas[hole_index] for hole_index in hole_indexes])
+		docs.set_status("Created %d areas" % count)
 
 
 def find_fillets(sketch, area):
@@ -279,124 +294,14 @@ def find_fillets(sketch, area):
 
 
 def find_all_areas(edges):
-	# edges_object = doc.get_edges()
-	connections = {}
-	for edge in edges:
-		# edge = edge_tuple[1]
-		if edge.type != EdgeType.FilletLineEdge:
-			kps = edge.get_end_key_points()
-			for kp in kps:
-				if kp.uid not in connections:
-					connection = {'kp': kp, 'edges': [], 'uid': kp.uid}
-					connections[kp.uid] = connection
-					# connection = connections[kp.uid]
-				else:
-					connection = connections[kp.uid]
-				connection['edges'].append(edge)
-
-	branches = []
-	for connection_tuple in connections.items():
-		conn1 = None
-		if len(connection_tuple[1]['edges']) > 1:
-			conn1 = connection_tuple[1]
-		elif connection_tuple[1]['edges'][0].type == EdgeType.CircleEdge:
-			conn1 = connection_tuple[1]
-
-		if conn1 is not None:
-			for edge in conn1['edges']:
-				branch = {'edges': [edge], 'start_conn': conn1}
-				branches.append(branch)
-
-	for branch in branches:
-		follow_branch(branch, branches, connections)
-	return branches
-
-
-def follow_branch(branch, branches, connections):
-	branch_ended = False
-	next_connection = None
-	previous_edge = branch['edges'][0]
-	if previous_edge.type == EdgeType.CircleEdge:
-		branch_ended = True
-		branch['enclosed'] = True
-	for kp in previous_edge.get_end_key_points():
-		if kp.uid != branch['start_conn']['uid']:
-			next_connection = connections[kp.uid]
-	last_connection = branch['start_conn']
-	while not branch_ended:
-		this_connection = next_connection
-		next_edge = None
-		if len(this_connection['edges']) > 2:
-			this_kp = this_connection['kp']
-			prev_kp = last_connection['kp']
-			smallest_angle = None
-			for edge in this_connection['edges']:
-				if edge is not previous_edge and edge.type != EdgeType.FilletLineEdge and edge.type != EdgeType.CircleEdge:
-					kps = edge.get_keypoints()
-					if kps[0] == this_kp:
-						next_kp = kps[1]
-					else:
-						next_kp = kps[0]
-					angle = angle_between_edges(this_kp, prev_kp, next_kp)
-					if smallest_angle is None:
-						smallest_angle = angle
-						next_edge = edge
-					else:
-						if angle < smallest_angle:
-							smallest_angle = angle
-							next_edge = edge
-			for edge in this_connection['edges']:
-				if edge is not next_edge and edge is not previous_edge and edge.type != EdgeType.FilletLineEdge and edge.type != EdgeType.CircleEdge:
-					exists = False
-					for existing_branch in branches:
-						if existing_branch['edges'][0] == edge and this_connection == existing_branch['start_conn']:
-							exists = True
-					if not exists:
-						pass
-
-			if next_edge in branch['edges']:
-				branch_ended = True
-				branch['enclosed'] = False
-				next_edge = None
-			else:
-				branch['edges'].append(next_edge)
-		elif len(this_connection['edges']) == 2:
-			this_kp = this_connection['kp']
-			if this_connection['edges'][0] == previous_edge:
-				next_edge = this_connection['edges'][1]
-			else:
-				next_edge = this_connection['edges'][0]
-			if next_edge in branch['edges']:
-				branch_ended = True
-				next_edge = None
-				branch['enclosed'] = False
-			else:
-				branch['edges'].append(next_edge)
-		else:
-			branch_ended = True
-			branch['enclosed'] = False
-
-		if next_edge is not None:
-			last_connection = this_connection
-			next_connection = None
-			for kp in next_edge.get_end_key_points():
-				if kp.uid == branch['start_conn']['uid']:
-					branch_ended = True
-					branch['enclosed'] = True
-				elif kp.uid == last_connection['uid']:
-					pass
-				else:
-					next_connection = connections[kp.uid]
-
-		if next_connection is None and not branch_ended:
-			raise Exception('Wierd ending detected!!')
-		previous_edge = next_edge
-
-		# areas.append(branch)
+	"""
+	Finds the loops of the edges as the faces of the planar graph they make.
+	:return: list of branches with the loop 'edges' and 'enclosed' telling if the loop encloses an area
+	"""
+	return find_faces(edges)
 
 
 def create_composite_area(sketch, base_area, subtract_areas):
-	print("create_composite_area")
 	comp_area = sketch.create_composite_area()
 	comp_area.base_area = base_area
 	for area in subtract_areas:
@@ -404,16 +309,6 @@ def create_composite_area(sketch, base_area, subtract_areas):
 	return comp_area
 
 
-def angle_between_edges(common_kp, kp1, kp2):
-	alpha1 = common_kp.angle2d(kp1)
-	alpha2 = common_kp.angle2d(kp2)
-	alpha = alpha2 - alpha1
-	while alpha < 0:
-		alpha += 2 * pi
-	while alpha > 2 * pi:
-		alpha -= 2 * pi
-	return alpha
-
 def create_mirror(sketch, type, kps, edges, areas):
 	proformer = sketch.create_proformer(type, "New Mirror")
 	proformer.base_keypoints = kps
@@ -2,30 +2,38 @@ import json
 import os
 
 import Data
-import GUI
+import Data.DocumentStream
 from Data.Document import Document
 from Data.Part import Part
 from Data.Sketch import Sketch, Attribute
 from Data.Vertex import Vertex
 
 
-def load_document(file_path, ignore_version=False):
-	data = Data.read_json_data_from_disk(file_path)
-	doc = Data.Document.Document.deserialize(data, ignore_version)
+def load_document(file_path, ignore_version=False, lazy=False):
+	if Data.DocumentStream.is_stream_file(file_path):
+		data = Data.DocumentStream.read_document_data(file_path)
+	else:
+		data = Data.read_json_data_from_disk(file_path)
+	doc = Data.Document.Document.deserialize(data, ignore_version, lazy)
 	doc.path = os.path.dirname(file_path)
 	doc.name = os.path.basename(file_path)
 	return doc
 
 
 def new_document():
+	from GUI.MainWindow import MainWindow
 	doc = Document()
-	main_window = GUI.MainWindow.MainWindow(doc)
+	main_window = MainWindow(doc)
 	main_window.show()
 
 
 def save_document(doc: Document):
-	data = json.dumps(doc, default=Data.complex_handler)
-	Data.write_data_to_disk(doc.path + "/" + doc.name, data)
+	file_path = doc.path + "/" + doc.name
+	if file_path.lower().endswith(Data.DocumentStream.stream_format_ending):
+		Data.DocumentStream.write_document(file_path, doc)
+	else:
+		data = json.dumps(doc, default=Data.complex_handler)
+		Data.write_data_to_disk(file_path, data)
 	doc.is_modified = False
 	doc.set_status('Document saved')
 
@@ -0,0 +1,187 @@
+"""
+Headless batch processing of documents, without Qt.
+
+	python -m Business.batch --resolve --regenerate --stl out/ drawings/*.jadoc
+
+Every document is processed in its own process, the time of each step is reported per file.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import Business
+import Data.DocumentStream
+
+__author__ = 'mamj'
+
+text_format_ending = '.jadoc'
+stl_format_ending = '.stl'
+
+
+def resolve_proformers(doc):
+	"""
+	Resolves the proformers of all sketches of the document again.
+	:return: the number of proformers resolved
+	"""
+	count = 0
+	for sketch in doc.get_geometries().get_sketches():
+		for proformer in list(sketch.proformers):
+			proformer.resolve()
+			count += 1
+	return count
+
+
+def regenerate_parts(doc):
+	"""
+	Regenerates the surfaces of all parts of the document.
+	:return: the number of parts regenerated
+	"""
+	parts = doc.get_geometries().get_parts()
+	for part in parts:
+		part.update_geometry()
+	return len(parts)
+
+
+def get_part_triangles(part):
+	"""
+	Returns the triangles of all the surfaces of the part as an (n, 3, 3) array.
+	"""
+	triangles = []
+	for surface in part.get_surfaces():
+		surface_triangles = np.asarray(surface.get_faces_normals()[0], dtype=np.float32)
+		if surface_triangles.size > 0:
+			triangles.append(surface_triangles.reshape(-1, 3, 3))
+	if len(triangles) == 0:
+		return np.zeros((0, 3, 3), dtype=np.float32)
+	return np.concatenate(triangles)
+
+
+def write_stl(file_path, triangles):
+	"""
+	Writes the (n, 3, 3) triangles to a binary STL file. The normals are calculated from the triangles.
+	"""
+	normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+	lengths = np.linalg.norm(normals, axis=1)
+	lengths[lengths == 0] = 1.0
+	records = np.zeros(len(triangles), dtype=[('normal', '<f4', 3), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+	records['normal'] = normals / lengths[:, np.newaxis]
+	records['vertices'] = triangles
+	with open(file_path, 'wb') as data_file:
+		data_file.write(b'PracedruDesign'.ljust(80, b' '))
+		data_file.write(np.uint32(len(records)).tobytes())
+		data_file.write(records.tobytes())
+
+
+def export_stl(doc, output_dir):
+	"""
+	Exports every part of the document to <document>-<part>.stl in output_dir.
+	:return: the number of files written
+	"""
+	base_name = os.path.splitext(doc.name)[0]
+	count = 0
+	for part in doc.get_geometries().get_parts():
+		if len(part.get_surfaces()) == 0:
+			part.update_geometry()
+		file_name = "%s-%s%s" % (base_name, part.name, stl_format_ending)
+		write_stl(os.path.join(output_dir, file_name), get_part_triangles(part))
+		count += 1
+	return count
+
+
+def save_as(doc, output_dir, file_format):
+	"""
+	Saves the document in output_dir, or where it was loaded from, as a text (.jadoc) or stream (.padoc) document.
+	"""
+	if output_dir is not None:
+		doc.path = output_dir
+	if file_format is not None:
+		endings = {'jadoc': text_format_ending, 'padoc': Data.DocumentStream.stream_format_ending}
+		doc.name = os.path.splitext(doc.name)[0] + endings[file_format]
+	Business.save_document(doc)
+
+
+def process_file(file_path, options):
+	"""
+	Loads one document and runs the steps chosen in options on it.
+	:return: dict with the file, the timings of the steps and the error if one happened
+	"""
+	result = {'file': file_path, 'timings': [], 'error': None}
+	try:
+		start = time.perf_counter()
+		doc = Business.load_document(file_path)
+		result['timings'].append(('load', time.perf_counter() - start))
+		steps = []
+		if options.resolve:
+			steps.append(('resolve', resolve_proformers, ()))
+		if options.regenerate:
+			steps.append(('regenerate', regenerate_parts, ()))
+		if options.stl is not None:
+			steps.append(('stl', export_stl, (options.stl,)))
+		if options.save or options.output_dir is not None or options.format is not None:
+			steps.append(('save', save_as, (options.output_dir, options.format)))
+		for name, step, args in steps:
+			start = time.perf_counter()
+			step(doc, *args)
+			result['timings'].append((name, time.perf_counter() - start))
+	except Exception as e:
+		result['error'] = "%s: %s" % (type(e).__name__, str(e))
+	return result
+
+
+def format_result(result):
+	timings = " ".join("%s %.3fs" % timing for timing in result['timings'])
+	total = sum(timing[1] for timing in result['timings'])
+	if result['error'] is not None:
+		return "FAILED %s (%s) %s" % (result['file'], result['error'], timings)
+	return "ok %s %.3fs [%s]" % (result['file'], total, timings)
+
+
+def process_files(file_paths, options, jobs=None):
+	"""
+	Processes the documents in a pool of jobs processes, or in this process when jobs is 1. The results are yielded in
+	the order the files are given.
+	"""
+	if jobs == 1 or len(file_paths) < 2:
+		for file_path in file_paths:
+			yield process_file(file_path, options)
+		return
+	with ProcessPoolExecutor(max_workers=jobs) as executor:
+		for result in executor.map(process_file, file_paths, [options] * len(file_paths)):
+			yield result
+
+
+def create_argument_parser():
+	parser = argparse.ArgumentParser(prog="python -m Business.batch", description="Processes documents without a display.")
+	parser.add_argument('files', nargs='+', help="documents to process (.jadoc or .padoc)")
+	parser.add_argument('--resolve', action='store_true', help="resolve all proformers again")
+	parser.add_argument('--regenerate', action='store_true', help="regenerate the surfaces of all parts")
+	parser.add_argument('--stl', metavar='DIR', help="export every part as binary STL to DIR")
+	parser.add_argument('--save', action='store_true', help="save the documents after processing")
+	parser.add_argument('--output-dir', metavar='DIR', help="save the documents to DIR instead of over the originals")
+	parser.add_argument('--format', choices=['jadoc', 'padoc'], help="save the documents in this format")
+	parser.add_argument('-j', '--jobs', type=int, default=None, help="number of processes, default is one per cpu")
+	return parser
+
+
+def main(args=None):
+	options = create_argument_parser().parse_args(args)
+	for directory in (options.stl, options.output_dir):
+		if directory is not None:
+			os.makedirs(directory, exist_ok=True)
+	start = time.perf_counter()
+	failed = 0
+	for result in process_files(options.files, options, options.jobs):
+		print(format_result(result), flush=True)
+		if result['error'] is not None:
+			failed += 1
+	count = len(options.files)
+	print("%d of %d documents processed in %.3fs" % (count - failed, count, time.perf_counter() - start))
+	return 1 if failed > 0 else 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
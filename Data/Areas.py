@@ -1,9 +1,12 @@
 from math import pi, cos, sin, tan
 
+import numpy as np
+
 from Data import get_uids
 from Data.Edges import *
 from Data.Events import ChangeEvent
 from Data.Objects import IdObject, NamedObservableObject
+from Data.PlanarGraph import get_edge_points, points_in_polygon
 from Data.Point3d import KeyPoint
 from Data.Vertex import Vertex
 
@@ -96,6 +99,8 @@ class EdgeLoopArea(Area):
 		Area.__init__(self, sketch)
 		self._edge_uids = []
 		self._key_points = None
+		self._polygon = None
+		self._bounds = None
 		self._type = AreaType.EdgeLoop
 		self._change_events_initalized = True
 
@@ -103,25 +108,56 @@ class EdgeLoopArea(Area):
 		return self._sketch.get_edge(self._edge_uids[index])
 
 	def inside(self, point):
-		anglesum = 0.0
-		last_point = None
-		if self.get_edge_by_index(0).type == EdgeType.CircleEdge:
-			kp = self.get_edge_by_index(0).get_keypoints()[0]
-			r = self.get_edge_by_index(0).get_meta_data('r')
-			if r > kp.distance(point):
-				return True
-			return False
-		else:
-			for pnt in self.get_inside_key_points():
-				if last_point is not None:
-					angle = point.angle_between(last_point, pnt)
-					if angle > pi:
-						angle = -(2 * pi - angle)
-					anglesum += angle
-				last_point = pnt
-			if abs(anglesum) > pi:
-				return True
-			return False
+		return bool(self.inside_points(np.array([[point.x, point.y]]))[0])
+
+	def inside_points(self, points):
+		"""
+		Classifies an (n, 2) array of sketch points against the polygon of this area with a crossing number test.
+		:return: (n,) boolean array
+		"""
+		points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+		x1, y1, x2, y2 = self.get_bounds()
+		inside = (points[:, 0] >= x1) & (points[:, 0] <= x2) & (points[:, 1] >= y1) & (points[:, 1] <= y2)
+		if np.any(inside):
+			inside[inside] = points_in_polygon(points[inside], self.get_polygon())
+		return inside
+
+	def get_polygon(self):
+		"""
+		Returns the outline of this area as an (n, 2) array with arcs and circles tessellated. The polygon is cached
+		until the edges of the area change.
+		"""
+		if self._polygon is None:
+			edges = [edge for edge in self.get_edges() if edge.type != EdgeType.FilletLineEdge]
+			if len(edges) == 0:
+				self._polygon = np.zeros((0, 2))
+			elif edges[0].type == EdgeType.CircleEdge:
+				self._polygon = get_edge_points(edges[0], None)
+			else:
+				kps = edges[0].get_end_key_points()
+				this_kp = kps[0]
+				if len(edges) > 1 and this_kp in edges[1].get_end_key_points():
+					this_kp = kps[1]
+				parts = []
+				for edge in edges:
+					parts.append(get_edge_points(edge, this_kp)[:-1])
+					this_kp = edge.get_other_kp(this_kp)
+				self._polygon = np.vstack(parts)
+		return self._polygon
+
+	def get_bounds(self):
+		if self._bounds is None:
+			polygon = self.get_polygon()
+			if len(polygon) == 0:
+				self._bounds = (np.inf, np.inf, -np.inf, -np.inf)
+			else:
+				self._bounds = tuple(np.concatenate((polygon.min(axis=0), polygon.max(axis=0))).tolist())
+		return self._bounds
+
+	def invalidate(self):
+		self._key_points = None
+		self._polygon = None
+		self._bounds = None
 
 	def get_intersecting_edges(self, kp, gamma):
 		intersecting_edges = []
@@ -171,17 +207,19 @@ class EdgeLoopArea(Area):
 		else:
 			self._edge_uids.append(edge.uid)
 		edge.add_change_handler(self.on_edge_changed)
-		self._key_points = None
+		self.invalidate()
 
 	def add_edge(self, edge):
 		self._edge_uids.append(edge.uid)
 		edge.add_change_handler(self.on_edge_changed)
-		self._key_points = None
+		self.invalidate()
 
 	def delete(self):
 		self.changed(ChangeEvent(self, ChangeEvent.Deleted, self))
 
 	def on_edge_changed(self, event: ChangeEvent):
+		self._polygon = None
+		self._bounds = None
 		if event.type == ChangeEvent.Deleted:
 			if type(event.object) is Edge:
 				if event.object.type != EdgeType.FilletLineEdge:
@@ -190,7 +228,7 @@ class EdgeLoopArea(Area):
 					fillet_edge = event.object
 					self._edge_uids.remove(fillet_edge.uid)
 					fillet_edge.remove_change_handler(self.on_edge_changed)
-					self._key_points = None
+					self.invalidate()
 			if type(event.object) is KeyPoint:
 				self.changed(ChangeEvent(self, ChangeEvent.Deleted, self))
 
@@ -295,6 +333,7 @@ class EdgeLoopArea(Area):
 		Area.deserialize_data(self, data['area'])
 		self._edge_uids = data['edges']
 		self._change_events_initalized = False
+		self.invalidate()
 
 
 class CompositeArea(Area):
@@ -339,6 +378,15 @@ class CompositeArea(Area):
 				if area.inside(vertex):
 					return False
 			return True
+		return False
+
+	def inside_points(self, points):
+		inside = self._base_area.inside_points(points)
+		for area in self.subtracted_areas:
+			if not np.any(inside):
+				break
+			inside &= ~area.inside_points(points)
+		return inside
 
 	def get_edges(self):
 		edges = list(self.base_area.get_edges())
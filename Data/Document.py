@@ -9,7 +9,7 @@ from Data.Events import ChangeEvent
 from Data.Margins import Margins
 from Data.Materials import Materials
 from Data.Mesh import Mesh
-from Data.Objects import ObservableObject, IdObject
+from Data.Objects import ObservableObject, IdObject, ChangeBatch
 from Data.Parameters import Parameters
 from Data.Style import Styles
 
@@ -67,9 +67,32 @@ class Document(IdObject, Parameters):
 	def redo_stack(self):
 		return self._redo_stack
 
+	def batch(self):
+		"""
+		Returns a context in which change events are collected and delivered coalesced when it is left.
+		Usage: with document.batch(): ...
+		"""
+		return ChangeBatch()
+
 	def add_late_init_object(self, obj):
 		self._late_initializing_object.append(obj)
 
+	def run_late_init(self, create):
+		"""
+		Calls create and late initializes only the objects it registers, also while the document is being deserialized.
+		:return: the result of create
+		"""
+		pending = self._late_initializing_object
+		self._late_initializing_object = []
+		try:
+			with self.batch():
+				result = create()
+				for late_init_obj in self._late_initializing_object:
+					late_init_obj.late_init()
+		finally:
+			self._late_initializing_object = pending
+		return result
+
 	def get_axes(self):
 		return self._axes
 
@@ -188,35 +211,36 @@ class Document(IdObject, Parameters):
 			}
 
 	@staticmethod
-	def deserialize(data, ignore_version=False):
+	def deserialize(data, ignore_version=False, lazy=False):
 		if data.get('version', [0,0,0,0]) != pracedru_design_version:
 			if ignore_version:
 				print("Document saved in different version of PracedruDesign.")
 			else:
 				raise Exception("Document saved in different version of PracedruDesign.")
 		doc = Document()
-		doc.deserialize_data(data)
+		doc.deserialize_data(data, lazy)
 		return doc
 
-	def deserialize_data(self, data):
-		IdObject.deserialize_data(self, data['uid'])
-		Parameters.deserialize_data(self, data.get('params', None))
-
-		self._styles = Styles.deserialize(data.get('styles', None))
-		self._geometries = Geometries.deserialize(data.get('geoms', None), self)
-		for axis_tuple in data.get('axes', {}).items():
-			axis = Axis.deserialize(axis_tuple[1], self)
-			self._axes[axis.uid] = axis
-		self._materials = Materials.deserialize(data.get('materials'), self)
-		self._components = Components.deserialize(data.get('components'), self)
-		self._margins = Margins.deserialize(data.get('margins'), self)
-		self._mesh = Mesh.deserialize(data.get('mesh'), self)
-		self._sweeps = Sweeps.deserialize(data.get('sweeps'), self)
-		self._drawings = Drawings.deserialize(data.get('drawings', None), self)
-		self._analyses = Analyses.deserialize(data.get('analysees', None), self)
-		self.name = data.get('name', "missing")
-		self.path = data.get('path', "missing")
-		self.init_change_handlers()
-		for late_init_obj in self._late_initializing_object:
-			late_init_obj.late_init()
-		self._late_initializing_object = []
+	def deserialize_data(self, data, lazy=False):
+		with self.batch():
+			IdObject.deserialize_data(self, data['uid'])
+			Parameters.deserialize_data(self, data.get('params', None))
+
+			self._styles = Styles.deserialize(data.get('styles', None))
+			self._geometries = Geometries.deserialize(data.get('geoms', None), self, lazy)
+			for axis_tuple in data.get('axes', {}).items():
+				axis = Axis.deserialize(axis_tuple[1], self)
+				self._axes[axis.uid] = axis
+			self._materials = Materials.deserialize(data.get('materials'), self)
+			self._components = Components.deserialize(data.get('components'), self)
+			self._margins = Margins.deserialize(data.get('margins'), self)
+			self._mesh = Mesh.deserialize(data.get('mesh'), self)
+			self._sweeps = Sweeps.deserialize(data.get('sweeps'), self)
+			self._drawings = Drawings.deserialize(data.get('drawings', None), self)
+			self._analyses = Analyses.deserialize(data.get('analysees', None), self)
+			self.name = data.get('name', "missing")
+			self.path = data.get('path', "missing")
+			self.init_change_handlers()
+			for late_init_obj in self._late_initializing_object:
+				late_init_obj.late_init()
+			self._late_initializing_object = []
@@ -0,0 +1,279 @@
+import json
+import os
+import struct
+import zlib
+from collections.abc import Mapping
+
+import numpy as np
+
+from Data import complex_handler
+from Data.Geometry import Geometry
+
+__author__ = 'mamj'
+
+stream_format_ending = '.padoc'
+
+stream_format_magic = b'PADOC\x01'
+
+block_size = 1 << 20
+
+ChunkJson = 0
+ChunkFloats = 1
+
+_chunk_header = struct.Struct('<HBQ')
+
+
+def is_stream_file(file_path):
+	try:
+		with open(file_path, 'rb') as data_file:
+			return data_file.read(len(stream_format_magic)) == stream_format_magic
+	except OSError:
+		return False
+
+
+class ChunkWriter(object):
+	"""
+	Writes named chunks to a file. Each section and geometry is encoded on its own and compressed with its own zlib
+	stream, so the complete document never exists as one string in memory.
+	"""
+	def __init__(self, data_file):
+		self._file = data_file
+		self._file.write(stream_format_magic)
+
+	def write_chunk(self, name, kind, pieces):
+		name_bytes = name.encode('UTF-8')
+		header_position = self._file.tell()
+		self._file.write(_chunk_header.pack(len(name_bytes), kind, 0))
+		self._file.write(name_bytes)
+		compressor = zlib.compressobj()
+		size = 0
+		for piece in pieces:
+			code = compressor.compress(piece)
+			size += len(code)
+			self._file.write(code)
+		code = compressor.flush()
+		size += len(code)
+		self._file.write(code)
+		end_position = self._file.tell()
+		self._file.seek(header_position)
+		self._file.write(_chunk_header.pack(len(name_bytes), kind, size))
+		self._file.seek(end_position)
+
+	def write_json(self, name, data):
+		# json.dumps encodes in one go with the C encoder, which is much faster than iterencode
+		encoded = json.dumps(data, default=complex_handler).encode('UTF-8')
+		self.write_chunk(name, ChunkJson, iter_blocks(encoded))
+
+	def write_floats(self, name, values):
+		array = np.asarray(values, dtype='<f8')
+		self.write_chunk(name, ChunkFloats, [array.tobytes()])
+
+
+def iter_blocks(data):
+	view = memoryview(data)
+	for start in range(0, len(view), block_size):
+		yield view[start:start + block_size]
+
+
+class ChunkReader(object):
+	"""
+	Reads the chunk directory of a stream file. The chunk data is only read and decompressed when a chunk is asked for.
+	If the file has been replaced since, as when the document is saved over it, the directory is read again.
+	"""
+	def __init__(self, file_path):
+		self._file_path = file_path
+		self._chunks = {}
+		self._file_state = None
+		self.read_directory()
+
+	def get_file_state(self):
+		stat = os.stat(self._file_path)
+		return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+	def read_directory(self):
+		self._chunks = {}
+		self._file_state = self.get_file_state()
+		with open(self._file_path, 'rb') as data_file:
+			if data_file.read(len(stream_format_magic)) != stream_format_magic:
+				raise ValueError("Not a stream document: " + self._file_path)
+			while True:
+				header = data_file.read(_chunk_header.size)
+				if len(header) < _chunk_header.size:
+					break
+				name_length, kind, size = _chunk_header.unpack(header)
+				name = data_file.read(name_length).decode('UTF-8')
+				self._chunks[name] = (kind, data_file.tell(), size)
+				data_file.seek(size, 1)
+
+	@property
+	def chunk_names(self):
+		return list(self._chunks.keys())
+
+	def has_chunk(self, name):
+		return name in self._chunks
+
+	def read_bytes(self, name):
+		if self.get_file_state() != self._file_state:
+			self.read_directory()
+		kind, position, size = self._chunks[name]
+		decompressor = zlib.decompressobj()
+		pieces = []
+		with open(self._file_path, 'rb') as data_file:
+			data_file.seek(position)
+			while size > 0:
+				code = data_file.read(min(size, block_size))
+				if len(code) == 0:
+					break
+				size -= len(code)
+				pieces.append(decompressor.decompress(code))
+		pieces.append(decompressor.flush())
+		return b''.join(pieces)
+
+	def read_chunk(self, name):
+		kind = self._chunks[name][0]
+		data = self.read_bytes(name)
+		if kind == ChunkFloats:
+			return np.frombuffer(data, dtype='<f8')
+		return json.loads(data.decode('UTF-8'))
+
+
+class LazySections(Mapping):
+	"""
+	Read only mapping over the chunks with a common prefix. Membership is answered from the directory without decoding.
+	With memoize a section is decoded once and kept as long as the mapping, otherwise it is decoded every time it is
+	looked up and is not kept, so the holders of large sections like the geometries decide how long they live. The
+	headers are small dicts kept per key in the directory of the file, they can be read without decoding the section.
+	"""
+	def __init__(self, reader, prefix, keys, decode=None, headers=None, memoize=False):
+		self._reader = reader
+		self._prefix = prefix
+		self._keys = dict.fromkeys(keys)
+		self._decode = decode
+		self._headers = headers if headers is not None else {}
+		self._memo = {} if memoize else None
+
+	def get_header(self, key):
+		return self._headers.get(key, None)
+
+	def __getitem__(self, key):
+		if key not in self._keys:
+			raise KeyError(key)
+		if self._memo is not None and key in self._memo:
+			return self._memo[key]
+		data = self._reader.read_chunk(self._prefix + key)
+		if self._decode is not None:
+			data = self._decode(self._prefix + key, data)
+		if self._memo is not None:
+			self._memo[key] = data
+		return data
+
+	def __contains__(self, key):
+		return key in self._keys
+
+	def __iter__(self):
+		return iter(self._keys)
+
+	def __len__(self):
+		return len(self._keys)
+
+
+def pack_key_points(geometry_data):
+	"""
+	Moves the coordinates of the key points out of their dicts into one flat list of x, y, z values. The key points
+	are either objects or, for geometries that were never loaded, already serialized.
+	:return: tuple of the new geometry data and the coordinate list
+	"""
+	coords = []
+	key_points = {}
+	for uid, key_point in geometry_data['key_points'].items():
+		kp_data = dict(key_point if isinstance(key_point, dict) else key_point.serialize_json())
+		p3d = dict(kp_data['p3d'])
+		coords.extend(p3d.pop('v')['xyz'])
+		kp_data['p3d'] = p3d
+		key_points[uid] = kp_data
+	geometry_data = dict(geometry_data)
+	geometry_data['key_points'] = key_points
+	return geometry_data, coords
+
+
+def unpack_key_points(geometry_data, coords):
+	index = 0
+	for kp_data in geometry_data['key_points'].values():
+		kp_data['p3d']['v'] = {'xyz': coords[index:index + 3].tolist()}
+		index += 3
+
+
+class DocumentSections(Mapping):
+	"""
+	The document level mapping with the lazily decoded geometries under 'geoms'.
+	"""
+	def __init__(self, sections, extra):
+		self._sections = sections
+		self._extra = extra
+
+	def __getitem__(self, key):
+		if key in self._extra:
+			return self._extra[key]
+		return self._sections[key]
+
+	def __contains__(self, key):
+		return key in self._extra or key in self._sections
+
+	def __iter__(self):
+		yield from self._extra
+		yield from self._sections
+
+	def __len__(self):
+		return len(self._extra) + len(self._sections)
+
+
+def get_geometry_header(geometry):
+	return {'type': geometry.geometry_type, 'name': geometry.name}
+
+
+def write_document(file_path, doc):
+	"""
+	Writes the document to a new file that then replaces file_path, so geometries that are not loaded yet can still be
+	read from the old file while it is written.
+	"""
+	temp_path = file_path + '.saving'
+	try:
+		with open(temp_path, 'wb') as data_file:
+			writer = ChunkWriter(data_file)
+			data = doc.serialize_json()
+			geometries = data.pop('geoms').serialize_json()['geoms']
+			writer.write_json('sections', list(data.keys()))
+			writer.write_json('geoms', {uid: get_geometry_header(geometry) for uid, geometry in geometries.items()})
+			for key, value in data.items():
+				writer.write_json('doc/' + key, value)
+			for uid, geometry in geometries.items():
+				geometry_data = geometry.serialize_json()
+				if geometry_data['type'] == Geometry.Sketch:
+					geometry_data, coords = pack_key_points(geometry_data)
+					writer.write_floats('geoms/' + uid + '/xyz', coords)
+				writer.write_json('geoms/' + uid, geometry_data)
+	except Exception:
+		if os.path.exists(temp_path):
+			os.remove(temp_path)
+		raise
+	os.replace(temp_path, file_path)
+
+
+def read_document_data(file_path):
+	"""
+	Opens a stream document and returns its data as a mapping that can be passed to Document.deserialize.
+	The sections are decoded when the deserialization gets to them.
+	"""
+	reader = ChunkReader(file_path)
+
+	def decode_geometry(name, geometry_data):
+		if reader.has_chunk(name + '/xyz'):
+			unpack_key_points(geometry_data, reader.read_chunk(name + '/xyz'))
+		return geometry_data
+
+	data = LazySections(reader, 'doc/', reader.read_chunk('sections'), memoize=True)
+	# Files written before the directory held the geometry headers only have the list of uids
+	directory = reader.read_chunk('geoms')
+	headers = directory if isinstance(directory, dict) else None
+	geometries = LazySections(reader, 'geoms/', directory, decode_geometry, headers)
+	return DocumentSections(data, {'geoms': {'geoms': geometries}})
@@ -8,7 +8,7 @@ from Data.Events import ChangeEvent
 from Data.Objects import IdObject
 from Data.Objects import NamedObservableObject
 from Data.Plane import Plane
-from Data.Vertex import Vertex
+from Data.Vertex import Vector3, VertexArray
 try:
 	import NurbSurfer as ns
 except ImportError as e:
@@ -142,6 +142,7 @@ class Edge(IdObject, NamedObservableObject):
 		if self._type == EdgeType.ArcEdge:
 			ckp = self._geometry.get_keypoint(self._key_points[0])
 			self.update_linked_kps(ckp)
+		self.changed(ChangeEvent(self, ChangeEvent.ObjectChanged, self))
 
 	def get_keypoints(self):
 		if not self._change_events_initalized:
@@ -327,7 +328,7 @@ class Edge(IdObject, NamedObservableObject):
 			draw_data = self.get_draw_data(instance)
 			if 'rect' in draw_data:
 				rect = draw_data['rect']
-				center = Vertex(rect[0] + rect[2] / 2, rect[1] - rect[3] / 2)
+				center = Vector3(rect[0] + rect[2] / 2, rect[1] - rect[3] / 2)
 				dist = abs(center.distance(point) - radius)
 				sa = draw_data['sa']
 				ea = sa + draw_data['span']
@@ -392,7 +393,7 @@ class Edge(IdObject, NamedObservableObject):
 			x2 = (key_points[1].get_instance_x(instance) + fillet_offset_x)
 			y2 = (key_points[1].get_instance_y(instance) + fillet_offset_y)
 			edge_data["type"] = EdgeDrawDataType.Line
-			edge_data["coords"] = [Vertex(x1, y1), Vertex(x2, y2)]
+			edge_data["coords"] = [Vector3(x1, y1), Vector3(x2, y2)]
 		elif self.type == EdgeType.ArcEdge:
 			kp = key_points[0]
 			cx = kp.get_instance_x(instance)
@@ -410,7 +411,7 @@ class Edge(IdObject, NamedObservableObject):
 			edge_data["sa"] = start_angle
 			edge_data["span"] = span
 			edge_data["r"] = radius
-			edge_data["c"] = Vertex(cx, cy, cz)
+			edge_data["c"] = Vector3(cx, cy, cz)
 		elif self.type == EdgeType.FilletLineEdge:
 			kp = key_points[0]
 			edges_list = kp.get_edges()
@@ -462,7 +463,7 @@ class Edge(IdObject, NamedObservableObject):
 				edge_data["sa"] = start_angle
 				edge_data["span"] = span
 				edge_data["r"] = radius
-				edge_data["c"] = Vertex(cx, cy)
+				edge_data["c"] = Vector3(cx, cy)
 		elif self.type == EdgeType.CircleEdge:
 			kp = key_points[0]
 			cx = kp.get_instance_x(instance)
@@ -472,7 +473,7 @@ class Edge(IdObject, NamedObservableObject):
 			edge_data["type"] = EdgeDrawDataType.Circle
 			edge_data["rect"] = rect
 			edge_data["r"] = radius
-			edge_data["c"] = Vertex(cx, cy)
+			edge_data["c"] = Vector3(cx, cy)
 		elif self.type == EdgeType.NurbsEdge:
 			instance_name = instance
 			if instance is None:
@@ -484,7 +485,6 @@ class Edge(IdObject, NamedObservableObject):
 				nurbs = ns.Nurbs()
 				nurbs.set_degree(self.get_meta_data("n"))
 				controls = []
-				coords = []
 				for i in range(0, len(kps)):
 					kp = kps[i]
 					v = kp.get_instance_xyz(instance)
@@ -492,11 +492,9 @@ class Edge(IdObject, NamedObservableObject):
 				if len(controls) > 2:
 					nurbs.set_controls(controls)
 					divs = len(controls) * 20
-					for vert in nurbs.range(divs):
-						coords.append(Vertex.from_xyz(vert.get_xyz()))
+					coords = VertexArray([vert.get_xyz() for vert in nurbs.range(divs)])
 				else:
-					for kp in kps:
-						coords.append(Vertex.from_xyz(kp.get_instance_xyz(instance)))
+					coords = VertexArray([kp.get_instance_xyz(instance) for kp in kps])
 				edge_data["type"] = EdgeDrawDataType.Lines
 				edge_data["coords"] = coords
 				self._draw_datas[instance_name] = edge_data
@@ -90,6 +90,9 @@ class Feature(NamedObservableObject, IdObject):
 			return self._vertexes[key]
 		return None
 
+	def get_vertexes(self):
+		return self._vertexes
+
 	def add_axis(self, axis):
 		self._axis_uids.append(axis.uid)
 		axis.add_change_handler(self.on_axis_changed)
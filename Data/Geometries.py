@@ -5,6 +5,38 @@ from Data.Part import Part
 from Data.Sketch import Sketch
 
 
+class GeometryStub(object):
+	"""
+	Placeholder for a geometry that is not yet deserialized. Holds the type and name of the geometry and the mapping
+	its serialized data is in, the data is only looked up, and for stream documents decoded, when it is needed.
+	"""
+	def __init__(self, uid, geometry_type, name, source):
+		self.uid = uid
+		self.geometry_type = geometry_type
+		self.name = name
+		self._source = source
+
+	def get_data(self):
+		return self._source[self.uid]
+
+	def serialize_json(self):
+		return self.get_data()
+
+
+def get_geometry_header(geometries_data, uid):
+	"""
+	Returns the type and name of a serialized geometry. They are taken from the directory of a stream document when it
+	has them, so the geometry is not decoded.
+	"""
+	header = None
+	if hasattr(geometries_data, 'get_header'):
+		header = geometries_data.get_header(uid)
+	if header is None:
+		geometry_data = geometries_data[uid]
+		header = {'type': geometry_data['type'], 'name': geometry_data.get('parameters', {}).get('name', None)}
+	return header
+
+
 class Geometries(ObservableObject):
 	def __init__(self, document):
 		ObservableObject.__init__(self)
@@ -30,9 +62,28 @@ class Geometries(ObservableObject):
 
 	def get_geometry(self, uid):
 		if uid in self._geometries:
-			return self._geometries[uid]
+			geometry = self._geometries[uid]
+			if type(geometry) is GeometryStub:
+				geometry = self.materialize(geometry)
+			return geometry
 		return None
 
+	def is_loaded(self, uid):
+		return type(self._geometries.get(uid, None)) is not GeometryStub
+
+	def materialize(self, stub):
+		geometry = self._doc.run_late_init(lambda: self.create_geometry(stub.get_data()))
+		if geometry is None:
+			self._geometries.pop(stub.uid)
+		else:
+			self._geometries[stub.uid] = geometry
+		return geometry
+
+	def materialize_all(self):
+		for geometry in list(self._geometries.values()):
+			if type(geometry) is GeometryStub:
+				self.materialize(geometry)
+
 	def get_edge(self, uid):
 		for geometry in self._geometries:
 			if type(geometry) is Sketch:
@@ -42,6 +93,7 @@ class Geometries(ObservableObject):
 		return None
 
 	def get_area(self, uid):
+		self.materialize_all()
 		for geometry in self._geometries.values():
 			if type(geometry) is Sketch:
 				area = geometry.get_area(uid)
@@ -50,6 +102,7 @@ class Geometries(ObservableObject):
 		return None
 
 	def get_sketches(self):
+		self.materialize_all()
 		sketches = []
 		for geometry in self._geometries.values():
 			if type(geometry) is Sketch:
@@ -57,25 +110,30 @@ class Geometries(ObservableObject):
 		return sketches
 
 	def get_parts(self):
+		self.materialize_all()
 		parts = []
 		for geometry in self._geometries.values():
 			if type(geometry) is Part:
 				parts.append(geometry)
 		return parts
 
-	def get_sketch_by_name(self, name):
-		for sketch in self.get_sketches():
-			if sketch.name == name:
-				return sketch
+	def get_geometry_by_name(self, name, geometry_type):
+		for geometry in list(self._geometries.values()):
+			if type(geometry) is GeometryStub:
+				if geometry.geometry_type == geometry_type and geometry.name == name:
+					return self.materialize(geometry)
+			elif geometry.geometry_type == geometry_type and geometry.name == name:
+				return geometry
 		return None
 
+	def get_sketch_by_name(self, name):
+		return self.get_geometry_by_name(name, Geometry.Sketch)
+
 	def get_part_by_name(self, name):
-		for part in self.get_parts():
-			if part.name == name:
-				return part
-		return None
+		return self.get_geometry_by_name(name, Geometry.Part)
 
 	def items(self):
+		self.materialize_all()
 		return self._geometries.values()
 
 	def serialize_json(self):
@@ -83,21 +141,30 @@ class Geometries(ObservableObject):
 			'geoms': self._geometries
 		}
 
+	def create_geometry(self, geometry_data):
+		geometry = None
+		if geometry_data['type'] == Geometry.Sketch:
+			geometry = Sketch.deserialize(geometry_data, self._doc.get_parameters())
+			geometry.add_change_handler(self.geometry_changed)
+		if geometry_data['type'] == Geometry.Part:
+			geometry = Part.deserialize(geometry_data, self._doc.get_parameters())
+		return geometry
+
 	@staticmethod
-	def deserialize(data, document):
+	def deserialize(data, document, lazy=False):
 		geometries = Geometries(document)
-		geometries.deserialize_data(data, document)
+		geometries.deserialize_data(data, document, lazy)
 		return geometries
 
-	def deserialize_data(self, data, document):
-		for geometry_uid in data['geoms']:
-			geometry_data = data['geoms'][geometry_uid]
-			geometry = None
-			if geometry_data['type'] == Geometry.Sketch:
-				geometry = Sketch.deserialize(geometry_data, document.get_parameters())
-				geometry.add_change_handler(self.geometry_changed)
-			if geometry_data['type'] == Geometry.Part:
-				geometry = Part.deserialize(geometry_data, document.get_parameters())
+	def deserialize_data(self, data, document, lazy=False):
+		geometries_data = data['geoms']
+		for geometry_uid in geometries_data:
+			if lazy:
+				header = get_geometry_header(geometries_data, geometry_uid)
+				if header['type'] in (Geometry.Sketch, Geometry.Part):
+					self._geometries[geometry_uid] = GeometryStub(geometry_uid, header['type'], header['name'], geometries_data)
+				continue
+			geometry = self.create_geometry(geometries_data[geometry_uid])
 			if geometry is not None:
 				self._geometries[geometry.uid] = geometry
 		# for child_id in data.get("children", []):
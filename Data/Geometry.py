@@ -14,3 +14,7 @@ class Geometry(Parameters, IdObject):
 		Parameters.__init__(self, name, parent)
 		self._parent = parent
 		self._geometry_type = geometry_type
+
+	@property
+	def geometry_type(self):
+		return self._geometry_type
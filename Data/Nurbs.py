@@ -1,17 +1,70 @@
 import numpy as np
 from Data.Vertex import Vertex
 
+end_parameter = 0.999999999
+
+
+def control_array(controls):
+	"""
+	Converts controls given as Vertex objects or xyz sequences to a float array with the xyz in the last axis.
+	"""
+	if isinstance(controls, np.ndarray):
+		return controls.astype(float)
+	return np.array([control_array(c) if isinstance(c, (list, tuple)) else np.asarray(getattr(c, 'xyz', c), dtype=float) for c in controls])
+
+
+def basis_matrix(knots, degree, us, count):
+	"""
+	Evaluates the Cox-de Boor recursion bottom up for all parameter values at once.
+	:param knots: knot vector
+	:param degree: degree of the basis functions
+	:param us: array of parameter values
+	:param count: number of basis functions (controls)
+	:return: array of shape (len(us), count) with N[i, n](u) in row u column i
+	"""
+	knots = np.asarray(knots, dtype=float)
+	us = np.asarray(us, dtype=float)[:, None]
+	k = len(knots)
+	n = ((knots[:-1] <= us) & (us < knots[1:])).astype(float)
+	if k > 1:
+		n[:, k - 2] = np.where(us[:, 0] == knots[k - 1], 1.0, n[:, k - 2])
+	with np.errstate(divide='ignore', invalid='ignore'):
+		for d in range(1, degree + 1):
+			if k - 1 - d <= 0:
+				n = np.zeros((len(us), 0))
+				break
+			left_denom = knots[d:k - 1] - knots[:k - 1 - d]
+			right_denom = knots[d + 1:k] - knots[1:k - d]
+			left = np.where(left_denom != 0.0, (us - knots[:k - 1 - d]) / left_denom, 0.0)
+			right = np.where(right_denom != 0.0, (knots[d + 1:k] - us) / right_denom, 0.0)
+			n = left * n[:, :k - 1 - d] + right * n[:, 1:k - d]
+	if n.shape[1] < count:
+		n = np.hstack((n, np.zeros((len(us), count - n.shape[1]))))
+	return n[:, :count]
+
+
 class Nurbs(object):
 	def __init__(self):
 		self._knots = [0.0, 0.0, 0.0, 1.0, 1.0, 1.0]
 		self._weights = []
 		self._controls = []
 		self._degree = 2
-		self._ntable = []
 
 	def set_degree(self, value):
 		self._degree = value
 
+	@property
+	def degree(self):
+		return self._degree
+
+	@property
+	def knots(self):
+		return self._knots
+
+	@property
+	def weights(self):
+		return self._weights
+
 	@property
 	def controls(self):
 		return self._controls
@@ -29,7 +82,6 @@ class Nurbs(object):
 			self._weights = weights
 		else:
 			self.create_weights(len(controls))
-		self._ntable = []
 
 	def create_knots(self, control_count):
 		self._knots.clear()
@@ -50,78 +102,47 @@ class Nurbs(object):
 		for i in range(control_count):
 			self._weights.append(1.0)
 
-	def g(self, i, n, u):
-		num = self._knots[i + n] - u
-		denom = self._knots[i + n] - self._knots[i]
-		if denom == 0.0:
-			denom = 1.0e-30
-		return num / denom
-
-	def f(self, i, n, u):
-		num = u - self._knots[i]
-		denom = self._knots[i + n] - self._knots[i]
-		if denom == 0.0:
-			denom = 1.0e-30
-		return num / denom
-
-	def lookup(self, i, n):
-		if len(self._ntable) < i + 1:
-			self._ntable.append({})
-			return None
-		else:
-			if n in self._ntable[i]:
-				return self._ntable[i][n]
-			else:
-				return None
+	def basis(self, us, n=None, count=None):
+		"""
+		Basis functions of degree n for all controls, one row per parameter value in us.
+		"""
+		if n is None:
+			n = self._degree
+		if count is None:
+			count = len(self._controls)
+		return basis_matrix(self._knots, n, us, count)
+
+	def rational_basis(self, us, n=None):
+		basis = self.basis(us, n)
+		if self._weights is None:
+			return basis
+		basis = basis * np.asarray(self._weights, dtype=float)
+		denom = basis.sum(axis=1)
+		denom[denom == 0.0] = 1e-99
+		return basis / denom[:, None]
 
 	def N(self, i, n, u):
-		if n == self._degree:
-			lu = self.lookup(i, u)
-			if lu is not None:
-				return lu
-		if n == 0:
-			if self._knots[i] <= u < self._knots[i + 1]:
-				return 1.0
-			elif u == self._knots[i + 1] and i + 2 == len(self._knots):
-				return 1.0
-			return 0.0
-		retval = self.f(i, n, u) * self.N(i, n - 1, u) + self.g(i + 1, n, u) * self.N(i + 1, n - 1, u)
-		if n == self._degree:
-			self._ntable[i][u] = retval
-		return retval
+		return self.basis([u], n, max(i + 1, len(self._controls)))[0, i]
 
 	def R(self, i, n, u):
-		if self._weights is None:
-			return self.N(i, n, u)
-		else:
-			num = self.N(i, n, u) * self._weights[i]
-			denom = 0.0
-			for j in range(len(self._controls)):
-				denom += self.N(j, n, u) * self._weights[j]
-			if denom == 0.0:
-				denom = 1e-99
-			return num / denom
+		return self.rational_basis([u], n)[0, i]
+
+	def evaluate(self, us):
+		"""
+		Evaluates the curve for an array of parameter values.
+		:return: array of shape (len(us), 3)
+		"""
+		us = np.minimum(np.asarray(us, dtype=float), end_parameter)
+		return self.rational_basis(us).dot(control_array(self._controls))
 
 	def C(self, u):
-		c = Vertex()
-		n = self._degree
-		if u == 1:
-			u = 0.999999999
-		for i in range(len(self._controls)):
-			P = self._controls[i]
-			c += P * self.R(i, n, u)
-		return c
+		return Vertex.from_xyz(self.evaluate([u])[0])
 
 	def range(self, divs):
 		verts = []
-
-		numerator = float(divs) - 1.0;
-		for i in range(divs):
-			c = i / numerator;
-			verts.append(self.C(c))
-
-		return verts;
-
+		for xyz in self.evaluate(np.linspace(0.0, 1.0, divs)):
+			verts.append(Vertex.from_xyz(xyz))
+		return verts
 
 
 class NurbsSurface(object):
@@ -132,37 +153,54 @@ class NurbsSurface(object):
 		self._weights = None
 		self._degree = 2
 
+	@property
+	def degree(self):
+		return self._degree
+
+	@property
+	def controls(self):
+		return self._controls
+
+	@property
+	def weights(self):
+		return self._weights
+
+	@property
+	def curves(self):
+		return self._n1, self._n2
+
 	def set_controls(self, controls):
 		self._controls = controls
 		self._n1.create_knots(len(controls))
 		self._n2.create_knots(len(controls[0]))
 
 	def R(self, i, j, n, u, v):
+		nu = self._n1.basis([u], n, len(self._controls))[0]
+		nv = self._n2.basis([v], n, len(self._controls[0]))[0]
 		if self._weights is None:
-			return self._n1.N(i, n, u) * self._n2.N(j, n, v)
-		else:
-			num = self._n1.N(i, n, u) * self._n2.N(j, n, v) * self._weights[i][j]
-			denom = 0.0
-			for p in range(self._controls):
-				for q in range(self._controls[0]):
-					denom += self._n1.N(p, n, u) * self._n2.N(q, n, v) * self._weights[p][q]
-			return num / denom
+			return nu[i] * nv[j]
+		weights = np.asarray(self._weights, dtype=float)
+		return nu[i] * nv[j] * weights[i][j] / nu.dot(weights).dot(nv)
+
+	def evaluate_grid(self, us, vs):
+		"""
+		Evaluates the surface for every combination of the parameter values in us and vs.
+		:return: array of shape (len(us), len(vs), 3)
+		"""
+		us = np.minimum(np.asarray(us, dtype=float), end_parameter)
+		vs = np.minimum(np.asarray(vs, dtype=float), end_parameter)
+		controls = control_array(self._controls)
+		nu = self._n1.basis(us, self._degree, controls.shape[0])
+		nv = self._n2.basis(vs, self._degree, controls.shape[1])
+		if self._weights is None:
+			return np.einsum('ai,bj,ijk->abk', nu, nv, controls)
+		weights = np.asarray(self._weights, dtype=float)
+		num = np.einsum('ai,bj,ijk->abk', nu, nv, controls * weights[:, :, None])
+		denom = np.einsum('ai,bj,ij->ab', nu, nv, weights)
+		return num / denom[:, :, None]
 
 	def S(self, u, v):
-		s = None
-		n = self._degree
-		if u == 1:
-			u = 0.999999999
-		if v == 1:
-			v = 0.999999999
-		for i in range(len(self._controls)):
-			for j in range(len(self._controls[0])):
-				P = self._controls[i][j]
-				if s is None:
-					s = self.R(i, j, n, u, v) * P
-				else:
-					s += self.R(i, j, n, u, v) * P
-		return s
+		return self.evaluate_grid([u], [v])[0, 0]
 
 
 def example_surface():
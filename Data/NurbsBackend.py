@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+
+from Data import read_text_from_disk
+from Data.Nurbs import control_array, end_parameter
+
+try:
+	import pyopencl as cl
+except ImportError:
+	cl = None
+
+max_kernel_degree = 8
+
+
+class NumpyNurbsBackend(object):
+	name = "numpy"
+
+	def evaluate_surface_grid(self, surface, us, vs):
+		return surface.evaluate_grid(us, vs)
+
+
+class OpenCLNurbsBackend(object):
+	"""
+	Evaluates nurbs surface grids with the nurbs_surface kernel in Data/opencl/nurbs.cl on a CPU OpenCL device.
+	Surfaces the kernel can not handle are passed on to the fallback backend.
+	"""
+	name = "opencl"
+
+	def __init__(self, fallback):
+		self._fallback = fallback
+		self._context = None
+		self._queue = None
+		self._program = None
+		platforms = cl.get_platforms()
+		for platform in platforms:
+			devices = platform.get_devices(device_type=cl.device_type.CPU)
+			if len(devices) > 0:
+				self._context = cl.Context(devices[:1])
+				break
+		if self._context is None:
+			raise RuntimeError("No CPU OpenCL device found")
+		self._queue = cl.CommandQueue(self._context)
+		kernel_path = os.path.join(os.path.dirname(__file__), "opencl", "nurbs.cl")
+		self._program = cl.Program(self._context, read_text_from_disk(kernel_path)).build()
+
+	def evaluate_surface_grid(self, surface, us, vs):
+		controls = control_array(surface.controls)
+		n1, n2 = surface.curves
+		degree = surface.degree
+		count1 = controls.shape[0]
+		count2 = controls.shape[1]
+		if degree > max_kernel_degree or count1 <= degree or count2 <= degree or \
+				len(n1.knots) != count1 + degree + 1 or len(n2.knots) != count2 + degree + 1:
+			return self._fallback.evaluate_surface_grid(surface, us, vs)
+		if surface.weights is None:
+			weights = np.ones((count1, count2))
+		else:
+			weights = np.asarray(surface.weights, dtype=np.float64)
+		us = np.minimum(np.asarray(us, dtype=np.float64), end_parameter)
+		vs = np.minimum(np.asarray(vs, dtype=np.float64), end_parameter)
+		mf = cl.mem_flags
+		context = self._context
+
+		def buffer(array):
+			return cl.Buffer(context, mf.READ_ONLY | mf.COPY_HOST_PTR, hostbuf=np.ascontiguousarray(array, dtype=np.float64))
+
+		result = np.empty((len(us), len(vs), 3), dtype=np.float64)
+		result_buffer = cl.Buffer(context, mf.WRITE_ONLY, result.nbytes)
+		self._program.nurbs_surface(
+			self._queue, (len(us), len(vs)), None,
+			buffer(n1.knots), buffer(n2.knots), np.int32(degree),
+			buffer(controls), buffer(weights), np.int32(count1), np.int32(count2),
+			buffer(us), buffer(vs), result_buffer)
+		cl.enqueue_copy(self._queue, result, result_buffer)
+		return result
+
+
+_backend = None
+
+
+def get_nurbs_backend():
+	"""
+	Returns the backend used for evaluating nurbs surface grids. The OpenCL backend is used if pyopencl is installed
+	and a CPU device can build the kernel, otherwise the grids are evaluated with numpy.
+	"""
+	global _backend
+	if _backend is None:
+		_backend = NumpyNurbsBackend()
+		if cl is not None:
+			try:
+				_backend = OpenCLNurbsBackend(_backend)
+			except Exception as e:
+				print("Falling back to numpy nurbs evaluation: " + str(e))
+	return _backend
+
+
+def set_nurbs_backend(backend):
+	global _backend
+	_backend = backend
@@ -1,6 +1,8 @@
+import copy
 import uuid
 
 from Data.Events import ValueChangeEvent, ChangeEvent
+from Data.Profiler import EventProfiler
 
 __author__ = 'mamj'
 
@@ -21,6 +23,90 @@ class IdObject(object):
 		self._uid = data['uid']
 
 
+class ChangeBatch(object):
+	"""
+	Defers change events of all observable objects until the outermost batch is left. Value and object change
+	events are coalesced per object, event type and changed item, a value change keeps the old value of the first
+	event it replaces. Structural events (before added/removed, added, removed, before cleared, cleared) are deferred
+	too and delivered in the order they were raised, so list models still see every before event ahead of its after
+	event. Deleted events are delivered at once, after the pending events of their sender, since the owners of the
+	deleted object drop their references on them. Code that needs the structure of an object to be current inside a
+	batch, like the spatial index of a sketch, has the pending events of that object delivered with deliver. Events
+	raised by handlers while the batch is delivered are coalesced the same way until the cascade has settled.
+	"""
+	current = None
+	coalesced_types = {ChangeEvent.ValueChanged, ChangeEvent.ObjectChanged, ChangeEvent.HiddenChanged}
+
+	def __init__(self):
+		self._events = {}
+		self._sender_keys = {}
+		self._counter = 0
+
+	@staticmethod
+	def event_key(observable, event):
+		if type(event.object) is dict:
+			detail = (event.object.get('instance', None), event.object.get('name', None))
+		elif type(event.object) is str:
+			detail = event.object
+		else:
+			detail = id(event.object)
+		return id(observable), event.type, detail
+
+	def add(self, observable, event):
+		if event.type == ChangeEvent.Deleted:
+			self.deliver(observable)
+			observable.notify(event)
+			return
+		if event.type not in ChangeBatch.coalesced_types:
+			self._counter += 1
+			key = (id(observable), self._counter)
+		else:
+			key = ChangeBatch.event_key(observable, event)
+			previous = self._events.get(key, None)
+			if previous is not None and hasattr(previous[1], 'old_value') and hasattr(event, 'old_value'):
+				event = copy.copy(event)
+				event.old_value = previous[1].old_value
+		self._events[key] = (observable, event)
+		sender_keys = self._sender_keys.get(id(observable), None)
+		if sender_keys is None:
+			sender_keys = {}
+			self._sender_keys[id(observable)] = sender_keys
+		sender_keys[key] = None
+
+	def deliver(self, observable):
+		"""
+		Delivers the pending events of the observable now, in the order they were raised.
+		"""
+		sender_keys = self._sender_keys.pop(id(observable), None)
+		while sender_keys is not None:
+			for key in sender_keys:
+				observable_tuple = self._events.pop(key, None)
+				if observable_tuple is not None:
+					observable.notify(observable_tuple[1])
+			sender_keys = self._sender_keys.pop(id(observable), None)
+
+	def commit(self):
+		while len(self._events) > 0:
+			events = self._events
+			self._events = {}
+			self._sender_keys = {}
+			for observable_tuple in events.values():
+				observable_tuple[0].notify(observable_tuple[1])
+
+	def __enter__(self):
+		if ChangeBatch.current is None:
+			ChangeBatch.current = self
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		if ChangeBatch.current is self:
+			try:
+				self.commit()
+			finally:
+				ChangeBatch.current = None
+		return False
+
+
 class ObservableObject(object):
 	def __init__(self):
 		self._change_handlers = set()
@@ -28,8 +114,16 @@ class ObservableObject(object):
 
 	def changed(self, event):
 		self._is_modified = True
+		if ChangeBatch.current is not None:
+			ChangeBatch.current.add(self, event)
+		else:
+			self.notify(event)
+
+	def notify(self, event):
+		if EventProfiler.current is not None:
+			EventProfiler.current.notify(self, event, list(self._change_handlers))
+			return
 		for handler in list(self._change_handlers):
-			# print(str(handler))
 			handler(event)
 
 	@property
@@ -1,9 +1,12 @@
 from Data.Events import ChangeEvent, ValueChangeEvent
 from Data.Objects import IdObject, ObservableObject, NamedObservableObject
+from Data.Profiler import probe
 import ast
+import numbers
 import operator as op
 import re
 import math
+from collections import deque
 
 __author__ = 'mamj'
 
@@ -62,12 +65,189 @@ def eval_(node):
 		raise TypeError(node)
 
 
+def compile_(node, slots):
+	if isinstance(node, ast.Num):  # <number>
+		number = node.n
+		return lambda values: number
+	elif isinstance(node, ast.Name) and node.id in slots:  # {uid} placeholder
+		index = slots[node.id]
+		return lambda values: values[index]
+	elif isinstance(node, ast.BinOp):  # <left> <operator> <right>
+		operator = operators[type(node.op)]
+		left = compile_(node.left, slots)
+		right = compile_(node.right, slots)
+		return lambda values: operator(left(values), right(values))
+	elif isinstance(node, ast.UnaryOp):  # <operator> <operand> e.g., -1
+		operator = operators[type(node.op)]
+		operand = compile_(node.operand, slots)
+		return lambda values: operator(operand(values))
+	elif isinstance(node, ast.Call):
+		if node.func.id in funcs:
+			func = funcs[node.func.id]
+			if len(node.args) == 1:
+				arg1 = compile_(node.args[0], slots)
+				return lambda values: func(arg1(values))
+			elif len(node.args) == 2:
+				arg1 = compile_(node.args[0], slots)
+				arg2 = compile_(node.args[1], slots)
+				return lambda values: func(arg1(values), arg2(values))
+			else:
+				return lambda values: func()
+		return lambda values: None
+	else:
+		raise TypeError(node)
+
+
+def is_number(value):
+	return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+class CompiledFormula(object):
+	"""
+	An internal formula ('{uid}' references) parsed once into a closure over the referenced parameter values.
+	Formulas that can not be evaluated numerically (text values) keep the string substitution behaviour.
+	"""
+	def __init__(self, formula):
+		self._formula = formula
+		self._uids = []
+		slots = {}
+		for uid in re.findall("{(.*?)}", formula):
+			if uid not in slots:
+				slots[uid] = len(self._uids)
+				self._uids.append(uid)
+		self._func = None
+		if formula != "":
+			expr = re.sub("{(.*?)}", lambda m: "_p%d" % slots[m.group(1)], formula)
+			placeholders = {"_p%d" % i: i for i in range(len(self._uids))}
+			try:
+				self._func = compile_(ast.parse(expr, mode='eval').body, placeholders)
+			except (TypeError, SyntaxError):
+				self._func = None
+
+	@property
+	def formula(self):
+		return self._formula
+
+	@property
+	def uids(self):
+		return self._uids
+
+	def substitute(self, values):
+		expr = self._formula
+		for i in range(len(self._uids)):
+			expr = expr.replace('{' + self._uids[i] + '}', str(values[i]))
+		return expr
+
+	def evaluate(self, values):
+		if self._func is not None and all(is_number(value) for value in values):
+			try:
+				return self._func(values)
+			except TypeError:
+				pass
+		expr = self.substitute(values)
+		try:
+			return eval_expr(expr)
+		except (TypeError):
+			return expr
+
+
+formula_cache = {}
+formula_cache_limit = 10000
+
+
+def compile_formula(formula):
+	compiled = formula_cache.get(formula, None)
+	if compiled is None:
+		if len(formula_cache) >= formula_cache_limit:
+			formula_cache.clear()
+		compiled = CompiledFormula(formula)
+		formula_cache[formula] = compiled
+	return compiled
+
+
+def dependency_order(parameters):
+	"""
+	Returns the given parameters and everything depending on them, sorted so each parameter comes after all
+	the parameters its formula references. Parameters in a reference cycle are appended last.
+	"""
+	closure = []
+	visited = set()
+	stack = list(parameters)
+	while len(stack) > 0:
+		param = stack.pop()
+		if param not in visited:
+			visited.add(param)
+			closure.append(param)
+			stack.extend(param.dependents)
+	in_degree = dict.fromkeys(closure, 0)
+	for param in closure:
+		for dependent in param.dependents:
+			in_degree[dependent] += 1
+	queue = deque(param for param in closure if in_degree[param] == 0)
+	order = []
+	while len(queue) > 0:
+		param = queue.popleft()
+		order.append(param)
+		for dependent in param.dependents:
+			in_degree[dependent] -= 1
+			if in_degree[dependent] == 0:
+				queue.append(dependent)
+	if len(order) < len(closure):
+		ordered = set(order)
+		order.extend(param for param in closure if param not in ordered)
+	return order
+
+
+class ParameterPropagation(object):
+	"""
+	Active while a parameter change is being delivered. Dependent parameters only mark themselves dirty when
+	notified and are re-evaluated afterwards, once each, in dependency order.
+	"""
+	current = None
+
+	def __init__(self, root, instance_uid):
+		self._pending = {}
+		self._evaluated = {(root, instance_uid)}
+
+	def mark(self, param, instance_uid, sender_uid):
+		if (param, instance_uid) in self._evaluated:
+			return
+		instances = self._pending.setdefault(param, {})
+		instances.setdefault(instance_uid, set()).add(sender_uid)
+
+	@probe('ParameterPropagation.run')
+	def run(self):
+		while len(self._pending) > 0:
+			for param in dependency_order(list(self._pending.keys())):
+				instances = self._pending.pop(param, None)
+				if instances is None:
+					continue
+				for instance_tuple in instances.items():
+					self._evaluated.add((param, instance_tuple[0]))
+					param.update_from_senders(instance_tuple[0], instance_tuple[1])
+
+
 def insert_spaces(formula):
 	for key in operator_keys:
 		formula = formula.replace(key, " " + key + " ")
 	return formula
 
 
+def get_name_tokens(scope):
+	"""
+	Splits the names of a scope in formula tokens, names may contain spaces.
+	:return: dict from the first token of a name to a list of (tokens, parameter), longest names first
+	"""
+	name_tokens = {}
+	for name, param in scope.items():
+		tokens = tuple(insert_spaces(name).split())
+		if len(tokens) > 0:
+			name_tokens.setdefault(tokens[0], []).append((tokens, param))
+	for candidates in name_tokens.values():
+		candidates.sort(key=lambda candidate: len(candidate[0]), reverse=True)
+	return name_tokens
+
+
 class Parameter(IdObject, ObservableObject):
 	def __init__(self, parent, name='new parameter', value=0.0):
 		IdObject.__init__(self)
@@ -80,6 +260,7 @@ class Parameter(IdObject, ObservableObject):
 		self._formula = str(value)
 		self._change_senders = []
 		self._instance_change_senders = {}
+		self._dependents = set()
 		self._hidden = False
 		self._arguments = []
 		self._base_unit = False
@@ -120,6 +301,10 @@ class Parameter(IdObject, ObservableObject):
 	def parent(self):
 		return self._parent
 
+	@property
+	def dependents(self):
+		return self._dependents
+
 	@property
 	def locked(self):
 		return self._locked
@@ -160,6 +345,9 @@ class Parameter(IdObject, ObservableObject):
 			return self._instance_values[instance_uid]
 		return self._value
 
+	def has_instance_value(self, instance_uid):
+		return instance_uid in self._instance_values
+
 	def create_value_change_object(self, new_value, old_value, old_formula, instance_uid):
 		change_object = {
 			'new value': new_value,
@@ -185,15 +373,30 @@ class Parameter(IdObject, ObservableObject):
 		else:
 			self.clear_change_handler(instance_uid)
 			if isinstance(value, str):
-				formula = " " + insert_spaces(value) + " "
-				params = self._parent.get_all_parameters()
-				for param in params:
-					if " " + param.name + " " in formula:
-						if param is self:
-							raise Exception("Formula may not reference it self.")
-						formula = formula.replace(" " + param.name + " ", '{' + param.uid + '}')
-						param.add_change_handler(self.on_parameter_changed)
-						self._change_senders.append(param)
+				name_tokens = self._parent.get_scope_tokens()
+				tokens = insert_spaces(value).split()
+				senders = set()
+				parts = []
+				index = 0
+				while index < len(tokens):
+					param = None
+					# The longest name matching the tokens from here wins
+					for candidate_tokens, candidate in name_tokens.get(tokens[index], ()):
+						if tuple(tokens[index:index + len(candidate_tokens)]) == candidate_tokens:
+							param = candidate
+							index += len(candidate_tokens)
+							break
+					if param is None:
+						parts.append(tokens[index])
+						index += 1
+						continue
+					if param is self:
+						raise Exception("Formula may not reference it self.")
+					parts.append('{' + param.uid + '}')
+					if param not in senders:
+						senders.add(param)
+						self.add_change_sender(param)
+				formula = "".join(parts)
 				if instance_uid is None:
 					self._formula = formula.replace(' ', '')
 					new_value = self.evaluate(instance_uid)
@@ -233,10 +436,9 @@ class Parameter(IdObject, ObservableObject):
 				formula = self._instance_formula[instance_uid]
 			else:
 				formula = self._formula
-		uids = re.findall("{(.*?)}", formula)
 		expr = formula
 		if formula != "":
-			for uid in uids:
+			for uid in compile_formula(formula).uids:
 				param = self._parent.get_parameter_by_uid(uid)
 				expr = expr.replace('{' + uid + '}', param.name)
 		return expr
@@ -326,16 +528,14 @@ class Parameter(IdObject, ObservableObject):
 					pass
 			else:
 				expr += "{" + sets[i] + "}"
-		uids = re.findall("{(.*?)}", self._formula)
-		for uid in uids:
+		for uid in compile_formula(self._formula).uids:
 			param = self._parent.get_parameter_by_uid(uid)
 			expr = expr.replace('{' + uid + '}', param.name)
 		return expr
 
 	def get_depend_params(self):
 		depends = []
-		uids = re.findall("{(.*?)}", self._formula)
-		for uid in uids:
+		for uid in compile_formula(self._formula).uids:
 			param = self._parent.get_parameter_by_uid(uid)
 			sub_params = param.get_depend_params()
 			for sub_param in sub_params:
@@ -343,6 +543,7 @@ class Parameter(IdObject, ObservableObject):
 			depends.append(param)
 		return depends
 
+	@probe('Parameter.evaluate')
 	def evaluate(self, instance_uid=None):
 		if instance_uid is None:
 			formula = self._formula
@@ -351,43 +552,70 @@ class Parameter(IdObject, ObservableObject):
 				formula = self._instance_formula[instance_uid]
 			else:
 				formula = self._formula
-		uids = re.findall("{(.*?)}", formula)
-		expr = formula
-		for uid in uids:
+		compiled = compile_formula(formula)
+		values = []
+		for uid in compiled.uids:
 			param = self._parent.get_parameter_by_uid(uid)
-			expr = expr.replace('{' + uid + '}', str(param.get_instance_value(instance_uid)))
-		try:
-			return eval_expr(expr)
-		except (TypeError):
-			return expr
+			values.append(param.get_instance_value(instance_uid))
+		return compiled.evaluate(values)
+
+	def add_change_sender(self, param):
+		param.add_change_handler(self.on_parameter_changed)
+		param.dependents.add(self)
+		self._change_senders.append(param)
 
 	def clear_change_handler(self, instance_uid):
 		if instance_uid is None:
 			for param in self._change_senders:
 				param.remove_change_handler(self.on_parameter_changed)
+				param.dependents.discard(self)
 			self._change_senders = []
 		else:
 			if instance_uid in self._instance_change_senders:
 				for param in self._instance_change_senders[instance_uid]:
 					param.remove_change_handler(self.on_parameter_changed)
+					param.dependents.discard(self)
 				self._instance_change_senders[instance_uid] = []
 
+	def changed(self, event):
+		# Parameter changes are not deferred by change batches, dependents are kept consistent by propagation
+		self.is_modified = True
+		if ParameterPropagation.current is not None:
+			self.notify(event)
+			return
+		instance_uid = None
+		if type(event.object) is dict:
+			instance_uid = event.object.get('instance', None)
+		propagation = ParameterPropagation(self, instance_uid)
+		ParameterPropagation.current = propagation
+		try:
+			self.notify(event)
+			propagation.run()
+		finally:
+			ParameterPropagation.current = None
+
 	def on_parameter_changed(self, event):
 		if event.type == ChangeEvent.Deleted:
 			self._formula = self._formula.replace('{' + event.object.uid + '}', event.object.name)
-		if 'instance' in event.object:
-			instance_uid = event.object['instance']
+		instance_uid = None
+		if type(event.object) is dict:
+			instance_uid = event.object.get('instance', None)
+		if ParameterPropagation.current is not None:
+			ParameterPropagation.current.mark(self, instance_uid, event.sender.uid)
 		else:
-			instance_uid = None
+			self.update_from_senders(instance_uid, [event.sender.uid])
 
+	def update_from_senders(self, instance_uid, sender_uids):
 		if instance_uid is None:
 			old_value = self._value
 			self._value = self.evaluate(instance_uid)
 			new_value = self._value
-			for formula_tuple in self._instance_formula.items():
+			for formula_tuple in list(self._instance_formula.items()):
 				uid = formula_tuple[0]
-				if event.sender.uid in formula_tuple[1]:
-					self.set_instance_internal_value(uid, self.evaluate(uid))
+				for sender_uid in sender_uids:
+					if sender_uid in formula_tuple[1]:
+						self.set_instance_internal_value(uid, self.evaluate(uid))
+						break
 		else:
 			old_value = self.get_instance_value(instance_uid)
 			new_value = self.evaluate(instance_uid)
@@ -436,6 +664,11 @@ class Parameters(ParametersBase):
 		ParametersBase.__init__(self, name)
 		self._parameter_list = []
 		self._params = {}
+		self._names = {}
+		self._names_version = 0
+		self._scope = None
+		self._scope_tokens = None
+		self._scope_key = None
 		self._parent = parent
 		self._custom_name_getter = None
 		self._standards = {}
@@ -530,11 +763,55 @@ class Parameters(ParametersBase):
 		self.changed(ChangeEvent(self, ChangeEvent.BeforeObjectAdded, param))
 		self._params[param.uid] = param
 		self._parameter_list.append(param.uid)
+		self._index_name(param, param.name)
 		self.changed(ChangeEvent(self, ChangeEvent.ObjectAdded, param))
 
 	def _remove_parameter_object(self, uid):
 		if uid in self._params:
-			self._params.pop(uid)
+			param = self._params.pop(uid)
+			self._unindex_name(param, param.name)
+
+	def _index_name(self, param, name):
+		self._names[name] = param
+		self._names_version += 1
+
+	def _unindex_name(self, param, name):
+		if self._names.get(name, None) is param:
+			self._names.pop(name)
+			# Among parameters sharing a name the last one added is found
+			for prm in self._params.values():
+				if prm.name == name and prm is not param:
+					self._names[name] = prm
+			self._names_version += 1
+
+	def get_scope_key(self):
+		key = (self._names_version,)
+		if isinstance(self._parent, Parameters):
+			key += self._parent.get_scope_key()
+		return key
+
+	def get_scope(self):
+		"""
+		Returns a dict from name to parameter of all the parameters visible from here, where the names in this scope
+		hide the names of the parent scopes. The dict is kept until a name changes in this or a parent scope.
+		"""
+		key = self.get_scope_key()
+		if self._scope_key != key:
+			if isinstance(self._parent, Parameters):
+				self._scope = dict(self._parent.get_scope())
+				self._scope.update(self._names)
+			else:
+				self._scope = dict(self._names)
+			self._scope_tokens = get_name_tokens(self._scope)
+			self._scope_key = key
+		return self._scope
+
+	def get_scope_tokens(self):
+		"""
+		Returns the names of the scope split in formula tokens, see get_name_tokens.
+		"""
+		self.get_scope()
+		return self._scope_tokens
 
 	def get_parameter_by_uid(self, uid) -> Parameter:
 		if uid in self._params:
@@ -545,10 +822,7 @@ class Parameters(ParametersBase):
 			return None
 
 	def get_parameter_by_name(self, name) -> Parameter:
-		param = None
-		for prm in self._params.values():
-			if prm.name == name:
-				param = prm
+		param = self._names.get(name, None)
 		if param is None and self._custom_name_getter is not None:
 			param = self._custom_name_getter(name)
 		if param is None and self._parent is not None:
@@ -576,6 +850,25 @@ class Parameters(ParametersBase):
 		self._add_parameter_object(param)
 		return param
 
+	def create_parameters(self, name_values, hidden=False):
+		"""
+		Creates a parameter for each (name, value) pair. The parameters are announced with one ObjectChanged event
+		instead of an added event pair per parameter.
+		:return: list of the new parameters
+		"""
+		params = []
+		for name, value in name_values:
+			param = Parameter(self, name, value)
+			param._hidden = hidden
+			param.add_change_handler(self.on_parameter_changed)
+			self._params[param.uid] = param
+			self._parameter_list.append(param.uid)
+			self._index_name(param, name)
+			params.append(param)
+		if len(params) > 0:
+			self.changed(ChangeEvent(self, ChangeEvent.ObjectChanged, self))
+		return params
+
 	def delete_parameter(self, uid):
 		param = self.get_parameter_by_uid(uid)
 		if param is not None:
@@ -593,6 +886,10 @@ class Parameters(ParametersBase):
 
 	def on_parameter_changed(self, event):
 		param = event.sender
+		if event.type == ChangeEvent.ValueChanged and type(event.object) is dict and 'new_name' in event.object:
+			if param.uid in self._params:
+				self._unindex_name(param, event.object['old_name'])
+				self._index_name(param, param.name)
 		self.changed(ChangeEvent(self, event.type, event.sender))
 		if self._current_type is not None and param.uid in self._params:
 			if 'instance' in event.object and 'new formula' in event.object:
@@ -657,6 +954,7 @@ class Parameters(ParametersBase):
 		for param_data in data.get('params', {}).items():
 			param = Parameter.deserialize(param_data[1], self)
 			self._params[param.uid] = param
+			self._index_name(param, param.name)
 			param.add_change_handler(self.on_parameter_changed)
 
 		for param_tuple in self._params.items():
@@ -762,7 +1060,17 @@ class ParametersInstance(IdObject, ParametersBase):
 	def get_parameter_by_name(self, name) -> Parameter:
 		if self._parameters is None:
 			return None
-		return self._parameters.get_parameter_by_name()
+		return self._parameters.get_parameter_by_name(name)
+
+	def get_scope(self):
+		if self._parameters is None:
+			return {}
+		return self._parameters.get_scope()
+
+	def get_scope_tokens(self):
+		if self._parameters is None:
+			return {}
+		return self._parameters.get_scope_tokens()
 
 	def get_all_local_parameters(self):
 		if self._parameters is None:
@@ -3,7 +3,7 @@ from math import *
 import numpy as np
 
 from Data.Axis import Axis
-from Data.Edges import Edge, EdgeType, EdgeDrawDataType
+from Data.Edges import Edge, EdgeType
 from Data.Events import ChangeEvent, ValueChangeEvent
 from Data.Feature import *
 from Data.Geometry import Geometry
@@ -11,9 +11,40 @@ from Data.Objects import IdObject, NamedObservableObject, ObservableObject
 from Data.Parameters import Parameters
 from Data.Plane import Plane
 from Data.Point3d import KeyPoint
+from Data.Profiler import probe
 from Data.Sketch import Sketch
 from Data.Surface import Surface
-from Data.Vertex import Vertex
+from Data.Tessellation import tessellate_draw_data, tessellate_edge, pack_segments
+from Data.Vertex import Vertex, Vector3, VertexArray
+
+
+def flatten_values(value, values):
+	if isinstance(value, (Vertex, Vector3, VertexArray)):
+		values.extend(value.xyz.tolist())
+	elif isinstance(value, np.ndarray):
+		values.extend(value.flatten().tolist())
+	elif isinstance(value, dict):
+		for key in sorted(value.keys()):
+			values.append(key)
+			flatten_values(value[key], values)
+	elif isinstance(value, (list, tuple)):
+		for item in value:
+			flatten_values(item, values)
+	else:
+		values.append(value)
+	return values
+
+
+class FeatureGeometry(object):
+	"""
+	The surfaces, edges and key points generated by one feature and the hash of the inputs they were generated from.
+	"""
+	def __init__(self, inputs_hash):
+		self.inputs_hash = inputs_hash
+		self.surfaces = []
+		self.edges = {}
+		self.keypoints = {}
+		self.limits = None
 
 
 class Part(Geometry):
@@ -27,6 +58,9 @@ class Part(Geometry):
 		self._keypoints = {}
 		self._edges = {}
 		self._surfaces = {}
+		self._feature_geometries = {}
+		self._feature_geometry = None
+		self._sketch_feature_limits = {}
 		self._color = [180, 180, 180, 255]
 		self._specular = 0.5
 
@@ -180,8 +214,15 @@ class Part(Geometry):
 		if key_point is None:
 			key_point = KeyPoint(self, x, y, z)
 			self._keypoints[key_point.uid] = key_point
+		if self._feature_geometry is not None:
+			self._feature_geometry.keypoints[key_point.uid] = key_point
 		return key_point
 
+	def _add_edge(self, edge):
+		self._edges[edge.uid] = edge
+		if self._feature_geometry is not None:
+			self._feature_geometry.edges[edge.uid] = edge
+
 	def create_arc_edge(self, center, r, sa, span, plane):
 		arc_edge = Edge(self, EdgeType.ArcEdge, plane=plane)
 		arc_edge.name = "edge"
@@ -189,7 +230,7 @@ class Part(Geometry):
 		arc_edge.set_meta_data('sa', sa)
 		arc_edge.set_meta_data('ea', sa + span)
 		arc_edge.set_meta_data('r', r)
-		self._edges[arc_edge.uid] = arc_edge
+		self._add_edge(arc_edge)
 		return arc_edge
 
 	def create_line_edge(self, key_point1, key_point2):
@@ -197,14 +238,14 @@ class Part(Geometry):
 		line_edge.name = "Edge"
 		line_edge.add_key_point(key_point1)
 		line_edge.add_key_point(key_point2)
-		self._edges[line_edge.uid] = line_edge
+		self._add_edge(line_edge)
 		return line_edge
 
 	def create_nurbs_edge(self, kp):
 		nurbs_edge = Edge(self, EdgeType.NurbsEdge)
 		nurbs_edge.name = "Edge"
 		nurbs_edge.add_key_point(kp)
-		self._edges[nurbs_edge.uid] = nurbs_edge
+		self._add_edge(nurbs_edge)
 		return nurbs_edge
 
 	def create_surfaces_from_revolve(self, feature):
@@ -447,24 +488,78 @@ class Part(Geometry):
 		surface.set_main_edges(edges)
 		return surface
 
+	def get_feature_inputs_hash(self, feature):
+		"""
+		Hash of everything the surfaces of the feature are generated from: the values of the feature and the features it
+		is based on, the edges of its areas, its axes and the key points of its nurbs edges.
+		"""
+		values = [feature.feature_type.value]
+		features = [feature]
+		while len(features) > 0:
+			based_on = features.pop()
+			if based_on is None:
+				continue
+			flatten_values(based_on.get_vertexes(), values)
+			features.extend(based_on.get_features())
+		if feature.feature_type == FeatureType.NurbsSurfaceFeature:
+			sketch = feature.get_features()[0].get_sketches()[0]
+			for order_item in feature.get_order_items():
+				values.append(order_item)
+				for kp in sketch.get_edge(order_item).get_keypoints():
+					flatten_values(kp, values)
+		else:
+			for area in feature.get_areas():
+				for edge in area.get_edges():
+					values.append(edge.type)
+					flatten_values(edge.get_draw_data(), values)
+			for axis in feature.get_axes():
+				flatten_values([axis.origo, axis.direction], values)
+		return hash(tuple(values))
+
+	def get_feature_geometry(self, uid):
+		return self._feature_geometries.get(uid, None)
+
+	def create_feature_geometry(self, feature, inputs_hash):
+		feature_geometry = FeatureGeometry(inputs_hash)
+		self._feature_geometry = feature_geometry
+		try:
+			if feature.feature_type == FeatureType.ExtrudeFeature:
+				feature_geometry.surfaces = self.create_surfaces_from_extrude(feature)
+			elif feature.feature_type == FeatureType.RevolveFeature:
+				feature_geometry.surfaces = self.create_surfaces_from_revolve(feature)
+			elif feature.feature_type == FeatureType.NurbsSurfaceFeature:
+				feature_geometry.surfaces = [self.create_surface_from_nurbs_feature(feature)]
+		finally:
+			self._feature_geometry = None
+		return feature_geometry
+
+	@probe('Part.update_geometry')
 	def update_geometry(self):
+		"""
+		Regenerates the surfaces of the features. Features are taken in progression order and the geometry of a
+		feature is reused as long as neither its inputs nor any feature before it has changed.
+		"""
 		self._surfaces.clear()
 		self._edges.clear()
 		self._keypoints.clear()
-		self._surfaces.clear()
+		feature_geometries = {}
+		regenerate = False
 		for feature_key in self._feature_progression:
 			feature = self._features[feature_key]
-			if feature.feature_type == FeatureType.ExtrudeFeature:
-				surfaces = self.create_surfaces_from_extrude(feature)
-				for surface in surfaces:
-					self._surfaces[surface.uid] = surface
-			elif feature.feature_type == FeatureType.RevolveFeature:
-				surfaces = self.create_surfaces_from_revolve(feature)
-				for surface in surfaces:
-					self._surfaces[surface.uid] = surface
-			elif feature.feature_type == FeatureType.NurbsSurfaceFeature:
-				surface = self.create_surface_from_nurbs_feature(feature)
+			if feature.feature_type not in (FeatureType.ExtrudeFeature, FeatureType.RevolveFeature, FeatureType.NurbsSurfaceFeature):
+				continue
+			inputs_hash = self.get_feature_inputs_hash(feature)
+			feature_geometry = self._feature_geometries.get(feature_key, None)
+			if regenerate or feature_geometry is None or feature_geometry.inputs_hash != inputs_hash:
+				regenerate = True
+				feature_geometry = self.create_feature_geometry(feature, inputs_hash)
+			else:
+				self._keypoints.update(feature_geometry.keypoints)
+				self._edges.update(feature_geometry.edges)
+			for surface in feature_geometry.surfaces:
 				self._surfaces[surface.uid] = surface
+			feature_geometries[feature_key] = feature_geometry
+		self._feature_geometries = feature_geometries
 		self._cal_limits()
 		self._update_needed = False
 
@@ -514,15 +609,23 @@ class Part(Geometry):
 		return features
 
 	def _cal_limits(self):
+		"""
+		Combines the cached bounds of the sketch features and the generated feature geometries.
+		"""
 		limits = [Vertex(-0.001, -0.001, -0.001), Vertex(0.001, 0.001, 0.001)]
-		lines = self.get_lines()
-		for line in lines:
-			limits[0].x = min(limits[0].x, line[0])
-			limits[0].y = min(limits[0].y, line[1])
-			limits[0].z = min(limits[0].z, line[2])
-			limits[1].x = max(limits[1].x, line[0])
-			limits[1].y = max(limits[1].y, line[1])
-			limits[1].z = max(limits[1].z, line[2])
+		bounds = []
+		for sketch_feature in self.get_sketch_features():
+			bounds.append(self.get_sketch_feature_limits(sketch_feature))
+		for feature_geometry in self._feature_geometries.values():
+			bounds.append(self.get_feature_geometry_limits(feature_geometry))
+		for bound in bounds:
+			if bound is not None:
+				limits[0].x = min(limits[0].x, bound[0][0])
+				limits[0].y = min(limits[0].y, bound[0][1])
+				limits[0].z = min(limits[0].z, bound[0][2])
+				limits[1].x = max(limits[1].x, bound[1][0])
+				limits[1].y = max(limits[1].y, bound[1][1])
+				limits[1].z = max(limits[1].z, bound[1][2])
 		self._limits = limits
 
 	def get_limits(self):
@@ -530,81 +633,55 @@ class Part(Geometry):
 			self._cal_limits()
 		return self._limits
 
+	@staticmethod
+	def get_lines_bounds(lines):
+		if len(lines) == 0:
+			return None
+		return lines.min(axis=0), lines.max(axis=0)
+
+	def get_sketch_feature_limits(self, sketch_feature):
+		"""
+		Returns the bounds of the lines of a sketch feature. The bounds are kept until the sketch feature changes.
+		"""
+		if sketch_feature.uid not in self._sketch_feature_limits:
+			self._sketch_feature_limits[sketch_feature.uid] = self.get_lines_bounds(self.get_sketch_feature_lines(sketch_feature))
+		return self._sketch_feature_limits[sketch_feature.uid]
+
+	def get_feature_geometry_limits(self, feature_geometry):
+		"""
+		Returns the bounds of the edges generated by a feature. Generated geometry is never changed, so the bounds are
+		kept with it.
+		"""
+		if feature_geometry.limits is None:
+			lines = pack_segments([tessellate_edge(edge) for edge in feature_geometry.edges.values()])
+			feature_geometry.limits = self.get_lines_bounds(lines)
+		return feature_geometry.limits
+
 	def get_lines(self):
-		lines = []
+		"""
+		Returns the lines of the sketch features and the generated edges as one (n, 3) float32 array, where every
+		pair of points is a line segment.
+		"""
+		segments = []
 		for sketch_feature in self.get_sketch_features():
-			plane_feature = sketch_feature.get_features()[0]
-			p = plane_feature.get_vertex('p')
-			xd = plane_feature.get_vertex('xd')
-			yd = plane_feature.get_vertex('yd')
-			cp = np.cross(xd.xyz, yd.xyz)
-			n = cp / np.linalg.norm(cp)
-			pm = np.array([xd.xyz, yd.xyz, n]).transpose()
-			sketch = sketch_feature.get_sketches()[0]
-			for edge in sketch.get_edges():
-				draw_data = edge.get_draw_data()
-				if draw_data['type'] == EdgeDrawDataType.Line:
-					c = draw_data['coords']
-					c1 = p.xyz + pm.dot(c[0].xyz)
-					c2 = p.xyz + pm.dot(c[1].xyz)
-					lines.append(c1)
-					lines.append(c2)
-				elif draw_data['type'] == EdgeDrawDataType.Arc:
-					start_angle = draw_data["sa"] * pi / (180 * 16)
-					span = draw_data["span"] * pi / (180 * 16)
-					radius = draw_data["r"]
-					c = draw_data["c"]
-					divisions = abs(int(span * 10))
-					for i in range(divisions):
-						cx = c.x + cos(start_angle + span * i / divisions) * radius
-						cy = c.y + sin(start_angle + span * i / divisions) * radius
-						lines.append(p.xyz + pm.dot(np.array([cx, cy, 0])))
-						cx = c.x + cos(start_angle + span * (i + 1) / divisions) * radius
-						cy = c.y + sin(start_angle + span * (i + 1) / divisions) * radius
-						lines.append(p.xyz + pm.dot(np.array([cx, cy, 0])))
-				elif draw_data['type'] == EdgeDrawDataType.Circle:
-					radius = draw_data["r"]
-					c = draw_data["c"]
-					divisions = int(2 * pi * 10)
-					for i in range(divisions):
-						cx = c.x + cos(2 * pi * i / divisions) * radius
-						cy = c.y + sin(2 * pi * i / divisions) * radius
-						lines.append(p.xyz + pm.dot(np.array([cx, cy, 0])))
-						cx = c.x + cos(2 * pi * (i + 1) / divisions) * radius
-						cy = c.y + sin(2 * pi * (i + 1) / divisions) * radius
-						lines.append(p.xyz + pm.dot(np.array([cx, cy, 0])))
-				elif draw_data['type'] == EdgeDrawDataType.Lines:
-					coords = draw_data['coords']
-					c1 = None
-					for c in coords:
-						c2 = p.xyz + pm.dot(c.xyz)
-						if c1 is not None:
-							lines.append(c1)
-							lines.append(c2)
-						c1 = c2
-		for edge_tuple in self._edges.items():
-			edge = edge_tuple[1]
-			kps = edge.get_end_key_points()
-			if edge.type == EdgeType.LineEdge:
-				lines.append(kps[0].xyz)
-				lines.append(kps[1].xyz)
-			if edge.type == EdgeType.ArcEdge:
-				radius = edge.get_meta_data("r")
-				c = edge.get_keypoints()[0]
-				start_angle = edge.get_meta_data("sa")
-				end_angle = edge.get_meta_data("ea")
-				span = end_angle - start_angle
-				pm = edge.plane.get_global_projection_matrix()
-				divisions = abs(int(span * 10))
-				for i in range(divisions):
-					cx = cos(start_angle + span * i / divisions) * radius
-					cy = sin(start_angle + span * i / divisions) * radius
-					lines.append(c.xyz + pm.dot(np.array([cx, cy, 0])))
-					cx = cos(start_angle + span * (i + 1) / divisions) * radius
-					cy = sin(start_angle + span * (i + 1) / divisions) * radius
-					lines.append(c.xyz + pm.dot(np.array([cx, cy, 0])))
-
-		return lines
+			segments.append(self.get_sketch_feature_lines(sketch_feature))
+		for edge in self._edges.values():
+			segments.append(tessellate_edge(edge))
+		return pack_segments(segments)
+
+	def get_sketch_feature_lines(self, sketch_feature):
+		plane_feature = sketch_feature.get_features()[0]
+		p = plane_feature.get_vertex('p')
+		xd = plane_feature.get_vertex('xd')
+		yd = plane_feature.get_vertex('yd')
+		cp = np.cross(xd.xyz, yd.xyz)
+		n = cp / np.linalg.norm(cp)
+		pm = np.array([xd.xyz, yd.xyz, n]).transpose()
+		sketch = sketch_feature.get_sketches()[0]
+		segments = []
+		for edge in sketch.get_edges():
+			segments.append(tessellate_draw_data(edge.get_draw_data(), p.xyz, pm))
+		return pack_segments(segments)
 
 	def on_plane_feature_changed(self, event):
 		self.changed(ChangeEvent(self, ChangeEvent.ObjectChanged, event.sender))
@@ -635,6 +712,7 @@ class Part(Geometry):
 
 	def on_sketch_feature_changed(self, event):
 		self.changed(ChangeEvent(self, ChangeEvent.ObjectChanged, event.sender))
+		self._sketch_feature_limits.pop(event.sender.uid, None)
 		if event.type == ChangeEvent.Deleted:
 			self.changed(ChangeEvent(self, ChangeEvent.BeforeObjectRemoved, event.sender))
 			self._features.pop(event.sender.uid)
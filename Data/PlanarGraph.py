@@ -0,0 +1,239 @@
+from math import pi
+
+import numpy as np
+
+from Data.Edges import EdgeType
+from Data.Tessellation import get_arc_points
+from Data.Triangulation import signed_area
+
+__author__ = 'mamj'
+
+epsilon = 1e-12
+angle_decimals = 9
+
+
+def points_in_polygon(points, polygon):
+	"""
+	Vectorized even odd test of which of the (n, 2) points are inside the (m, 2) polygon.
+	:return: (n,) boolean array
+	"""
+	points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+	polygon = np.asarray(polygon, dtype=np.float64)
+	if len(polygon) < 3 or len(points) == 0:
+		return np.zeros(len(points), dtype=bool)
+	x = points[:, 0][:, None]
+	y = points[:, 1][:, None]
+	a = polygon
+	b = np.roll(polygon, -1, axis=0)
+	crosses = (a[:, 1] > y) != (b[:, 1] > y)
+	dy = b[:, 1] - a[:, 1]
+	dy[dy == 0] = epsilon
+	xs = a[:, 0] + (y - a[:, 1]) * (b[:, 0] - a[:, 0]) / dy
+	return np.count_nonzero(crosses & (x < xs), axis=1) % 2 == 1
+
+
+def get_edge_points(edge, start_kp):
+	"""
+	Returns an (n, 2) array of sketch points along the edge, starting in start_kp.
+	"""
+	if edge.type == EdgeType.ArcEdge:
+		c = edge.get_keypoints()[0]
+		sa = edge.get_meta_data('sa')
+		span = edge.get_meta_data('ea') - sa
+		if span < 0:
+			span += 2 * pi
+		points = get_arc_points([c.x, c.y, 0], edge.get_meta_data('r'), sa, span)[:, :2]
+	elif edge.type == EdgeType.CircleEdge:
+		c = edge.get_keypoints()[0]
+		return get_arc_points([c.x, c.y, 0], edge.get_meta_data('r'), 0, 2 * pi)[:-1, :2]
+	elif edge.type == EdgeType.NurbsEdge:
+		# The key points of a nurbs edge are its controls, the curve is the tessellation in its draw data
+		points = edge.get_draw_data()['coords'].xyz[:, :2]
+	else:
+		points = np.array([[kp.x, kp.y] for kp in edge.get_keypoints()])
+	if edge.get_end_key_points()[0] is not start_kp:
+		points = points[::-1]
+	return points
+
+
+def get_edge_direction(edge, start_kp):
+	"""
+	Returns the angle of the tangent where the edge leaves start_kp and the signed curvature it leaves with. The
+	curvature orders edges leaving in the same direction, an edge turning left comes after one going straight.
+	"""
+	kps = edge.get_end_key_points()
+	forward = kps[0] is start_kp
+	if edge.type == EdgeType.ArcEdge:
+		curvature = 1 / edge.get_meta_data('r')
+		if forward:
+			return edge.get_meta_data('sa') + pi / 2, curvature
+		return edge.get_meta_data('ea') - pi / 2, -curvature
+	points = get_edge_points(edge, start_kp)
+	delta = points[1] - points[0]
+	return np.arctan2(delta[1], delta[0]), 0.0
+
+
+def find_faces(edges):
+	"""
+	Finds the faces of the planar graph made by the edges. Every edge is split into two opposite half edges, the half
+	edges leaving each key point are sorted by angle and every face is found by walking from a half edge to the one
+	before its twin in the angular order at its end. This visits every half edge once, so the cost is bound by the
+	sort, O(E log E). Fillet edges are not part of the graph, circles are faces of their own.
+	:return: list of faces. A face is a dict with the loop 'edges', the polygon 'points', the signed 'area', the
+	connected 'component' it belongs to, 'enclosed' which is true for faces with an inside and 'boundary' which is
+	true for the face around the outside of a component when its edges are one simple loop.
+	"""
+	graph_edges = []
+	circles = []
+	for edge in edges:
+		if edge.type == EdgeType.FilletLineEdge:
+			continue
+		if edge.type == EdgeType.CircleEdge:
+			circles.append(edge)
+			continue
+		kps = edge.get_end_key_points()
+		if kps[0] is kps[1]:
+			continue
+		graph_edges.append(edge)
+
+	count = len(graph_edges)
+	vertexes = {}
+	key_points = []
+	origin = np.empty(2 * count, dtype=np.int64)
+	angle = np.empty(2 * count)
+	curvature = np.empty(2 * count)
+	for i, edge in enumerate(graph_edges):
+		for side, kp in enumerate(edge.get_end_key_points()):
+			h = 2 * i + side
+			if kp.uid not in vertexes:
+				vertexes[kp.uid] = len(key_points)
+				key_points.append(kp)
+			origin[h] = vertexes[kp.uid]
+			angle[h], curvature[h] = get_edge_direction(edge, kp)
+	angle = np.round(np.mod(angle, 2 * pi), angle_decimals)
+
+	# Half edge h goes from its origin to the origin of its twin h ^ 1
+	order = np.lexsort((curvature, angle, origin))
+	position = np.empty(2 * count, dtype=np.int64)
+	position[order] = np.arange(2 * count)
+	sorted_origin = origin[order]
+	group_start = np.searchsorted(sorted_origin, sorted_origin, side='left')
+	group_end = np.searchsorted(sorted_origin, sorted_origin, side='right')
+	twin_position = position[np.arange(2 * count) ^ 1]
+	before = twin_position - 1
+	wrap = before < group_start[twin_position]
+	before[wrap] = group_end[twin_position][wrap] - 1
+	next = order[before]
+
+	# Key points connected by edges share component
+	component = np.arange(len(key_points))
+
+	def find(v):
+		while component[v] != v:
+			component[v] = component[component[v]]
+			v = component[v]
+		return v
+
+	for i in range(count):
+		a, b = find(origin[2 * i]), find(origin[2 * i + 1])
+		if a != b:
+			component[a] = b
+
+	faces = []
+	face_of = np.full(2 * count, -1, dtype=np.int64)
+	for start in range(2 * count):
+		if face_of[start] >= 0:
+			continue
+		half_edges = []
+		h = start
+		while face_of[h] < 0:
+			face_of[h] = len(faces)
+			half_edges.append(h)
+			h = next[h]
+		points = np.vstack([get_edge_points(graph_edges[h // 2], key_points[origin[h]])[:-1] for h in half_edges])
+		area = signed_area(points) if len(points) > 2 else 0.0
+		faces.append({
+			'half_edges': half_edges,
+			'points': points,
+			'area': area,
+			'component': int(find(origin[start])),
+			'enclosed': area > epsilon
+		})
+
+	# Edges with the same face on both sides are bridges or dangling edges and not part of the face loop
+	for face in faces:
+		face_index = face_of[face['half_edges'][0]]
+		face['edges'] = [graph_edges[h // 2] for h in face.pop('half_edges') if face_of[h ^ 1] != face_index]
+		face['boundary'] = face['area'] < -epsilon and is_simple_loop(face['edges'])
+
+	for i, circle in enumerate(circles):
+		points = get_edge_points(circle, None)
+		faces.append({
+			'edges': [circle],
+			'points': points,
+			'area': signed_area(points),
+			'component': len(key_points) + i,
+			'enclosed': True,
+			'boundary': False
+		})
+	return faces
+
+
+def is_simple_loop(edges):
+	"""
+	Returns true if the edges make one closed loop that does not touch itself.
+	"""
+	if len(edges) < 2:
+		return False
+	kp_edges = {}
+	for edge in edges:
+		for kp in edge.get_end_key_points():
+			kp_edges.setdefault(kp.uid, []).append(edge)
+	if any(len(connected) != 2 for connected in kp_edges.values()):
+		return False
+	edge = edges[0]
+	kp = edge.get_end_key_points()[1]
+	visited = 1
+	while True:
+		connected = kp_edges[kp.uid]
+		edge = connected[1] if connected[0] is edge else connected[0]
+		if edge is edges[0]:
+			break
+		visited += 1
+		kps = edge.get_end_key_points()
+		kp = kps[1] if kps[0] is kp else kps[0]
+	return visited == len(edges)
+
+
+def find_holes(faces):
+	"""
+	Finds the faces that have other parts of the graph inside them. A connected part of the graph is inside the
+	smallest enclosed face of another part that contains one of its points.
+	:return: dict from face index to the indexes of the enclosed faces of the parts directly inside it
+	"""
+	components = {}
+	for index, face in enumerate(faces):
+		components.setdefault(face['component'], []).append(index)
+	if len(components) < 2:
+		return {}
+	component_ids = list(components.keys())
+	probes = np.array([faces[components[c][0]]['points'][0] for c in component_ids])
+	probe_component = np.array(component_ids)
+	best_face = np.full(len(component_ids), -1, dtype=np.int64)
+	best_area = np.full(len(component_ids), np.inf)
+	for index, face in enumerate(faces):
+		if not face['enclosed']:
+			continue
+		inside = points_in_polygon(probes, face['points'])
+		inside &= probe_component != face['component']
+		inside &= face['area'] < best_area
+		best_face[inside] = index
+		best_area[inside] = face['area']
+	holes = {}
+	for c, parent in zip(component_ids, best_face):
+		if parent < 0:
+			continue
+		enclosed = [index for index in components[c] if faces[index]['enclosed']]
+		if len(enclosed) > 0:
+			holes.setdefault(int(parent), []).extend(enclosed)
+	return holes
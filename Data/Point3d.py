@@ -1,3 +1,7 @@
+from types import MappingProxyType
+
+import numpy as np
+
 from Data import Parameters
 from Data.Events import ChangeEvent
 from Data.Vertex import Vertex
@@ -7,6 +11,10 @@ __author__ = 'mamj'
 
 components = "xyz"
 
+# Shared by the key points without instance values or component parameters until they get their own
+no_instances = MappingProxyType({})
+no_component_parameters = (None, None, None)
+
 class Point3d(Vertex, IdObject):
 	def __init__(self, x=0.0, y=0.0, z=0.0):
 		Vertex.__init__(self, x, y, z)
@@ -33,19 +41,143 @@ class Point3d(Vertex, IdObject):
 		Vertex.deserialize_data(self, data['v'])
 
 
+class KeyPointArray(object):
+	"""
+	Contiguous (n, 3) array with the coordinates of the key points of a sketch. An attached key point reads and writes
+	its coordinates in its own row, so limits, transforms and snapping can work on all the key points at once. Rows of
+	detached key points are reused.
+	"""
+	def __init__(self, capacity=64):
+		self._coordinates = np.zeros((capacity, 3))
+		self._active = np.zeros(capacity, dtype=bool)
+		self._key_points = [None] * capacity
+		self._free = []
+		self._used = 0
+
+	def __len__(self):
+		return self._used - len(self._free)
+
+	def attach(self, key_point):
+		if key_point._array is self:
+			return
+		xyz = np.array(key_point.xyz)
+		key_point.detach()
+		if len(self._free) > 0:
+			row = self._free.pop()
+		else:
+			if self._used == len(self._key_points):
+				self._grow()
+			row = self._used
+			self._used += 1
+		self._coordinates[row] = xyz
+		self._active[row] = True
+		self._key_points[row] = key_point
+		key_point._array = self
+		key_point._row = row
+		key_point._xyz = None
+
+	def detach(self, key_point):
+		if key_point._array is not self:
+			return
+		row = key_point._row
+		key_point._xyz = self._coordinates[row].copy()
+		key_point._array = None
+		key_point._row = None
+		self._active[row] = False
+		self._key_points[row] = None
+		self._free.append(row)
+
+	def _grow(self):
+		capacity = 2 * len(self._key_points)
+		coordinates = np.zeros((capacity, 3))
+		coordinates[:self._used] = self._coordinates[:self._used]
+		active = np.zeros(capacity, dtype=bool)
+		active[:self._used] = self._active[:self._used]
+		self._coordinates = coordinates
+		self._active = active
+		self._key_points.extend([None] * (capacity - len(self._key_points)))
+
+	def get_rows(self):
+		return np.flatnonzero(self._active[:self._used])
+
+	def get_key_points(self, rows=None):
+		if rows is None:
+			rows = self.get_rows()
+		return [self._key_points[row] for row in rows]
+
+	def get_coordinates(self, rows=None):
+		"""
+		Returns a copy of the coordinates of the attached key points as an (n, 3) array, in the order of get_key_points.
+		"""
+		if rows is None:
+			rows = self.get_rows()
+		return self._coordinates[rows]
+
+	def get_bounds(self):
+		"""
+		Returns [x min, y min, x max, y max] of the attached key points or None if there are none.
+		"""
+		rows = self.get_rows()
+		if len(rows) == 0:
+			return None
+		coordinates = self._coordinates[rows, :2]
+		return np.concatenate((coordinates.min(axis=0), coordinates.max(axis=0))).tolist()
+
+	def find_key_points_near(self, x, y, distance):
+		"""
+		Returns the attached key points within distance of (x, y), closest first.
+		"""
+		rows = self.get_rows()
+		delta = self._coordinates[rows, :2] - (x, y)
+		distances = np.hypot(delta[:, 0], delta[:, 1])
+		near = np.flatnonzero(distances <= distance)
+		near = near[np.argsort(distances[near], kind='stable')]
+		return self.get_key_points(rows[near])
+
+
 class KeyPoint(Point3d, NamedObservableObject):
+	"""
+	A point of a sketch. The coordinates of an attached key point are a row of the KeyPointArray of the sketch. The
+	class is not slotted, since it shares its bases with objects that rely on their instance dict and Python allows
+	only one of several bases to have slots. Instead the instance values and component parameters, which most key
+	points never get, are shared empty containers until the first one is set.
+	"""
+	component_change_handler_names = ('on_x_param_changed', 'on_y_param_changed', 'on_z_param_changed')
+
 	def __init__(self, parameters: Parameters, x=0.0, y=0.0, z=0.0, name="Keypoint"):
+		self._array = None
+		self._row = None
+		self._xyz = None
 		Point3d.__init__(self, x, y, z)
 		NamedObservableObject.__init__(self, name)
-		self._component_parameters = [None, None, None]
-		self._instances = {}
+		self._component_parameters = no_component_parameters
+		self._instances = no_instances
 		self._parameters = parameters
 		self._edges = []
 		self.editable = True
-		self._component_change_handlers = []
-		self._component_change_handlers.append(self.on_x_param_changed)
-		self._component_change_handlers.append(self.on_y_param_changed)
-		self._component_change_handlers.append(self.on_z_param_changed)
+
+	@property
+	def xyz(self):
+		if self._array is None:
+			return self._xyz
+		return self._array._coordinates[self._row]
+
+	@xyz.setter
+	def xyz(self, value):
+		if self._array is None:
+			self._xyz = np.array(value, dtype=np.float64)
+		else:
+			self._array._coordinates[self._row] = value
+
+	def detach(self):
+		"""
+		Moves the coordinates of this key point out of the key point array it is attached to, if any.
+		"""
+		if self._array is not None:
+			self._array.detach(self)
+
+	def get_component_change_handler(self, component):
+		return getattr(self, KeyPoint.component_change_handler_names[component])
 
 	@property
 	def instances(self):
@@ -57,6 +189,7 @@ class KeyPoint(Point3d, NamedObservableObject):
 
 	def delete(self):
 		self.changed(ChangeEvent(self, ChangeEvent.Deleted, self))
+		self.detach()
 
 	def get_edges(self):
 		return list(self._edges)
@@ -111,6 +244,8 @@ class KeyPoint(Point3d, NamedObservableObject):
 				if value != self.xyz[component]:
 					instance_vertice = Vertex(self.x, self.y, self.z)
 					instance_vertice.xyz[component] = value
+					if self._instances is no_instances:
+						self._instances = {}
 					self._instances[instance_uid] = instance_vertice
 					changed = True
 		if changed:
@@ -156,15 +291,21 @@ class KeyPoint(Point3d, NamedObservableObject):
 
 	@property
 	def x(self):
-		return self.xyz[0]
+		if self._array is None:
+			return self._xyz[0]
+		return self._array._coordinates[self._row, 0]
 
 	@property
 	def y(self):
-		return self.xyz[1]
+		if self._array is None:
+			return self._xyz[1]
+		return self._array._coordinates[self._row, 1]
 
 	@property
 	def z(self):
-		return self.xyz[2]
+		if self._array is None:
+			return self._xyz[2]
+		return self._array._coordinates[self._row, 2]
 
 	@x.setter
 	def x(self, value):
@@ -181,16 +322,18 @@ class KeyPoint(Point3d, NamedObservableObject):
 	def set_parameter_generic(self, param_uid, component):
 		old_value = self.get_instance_generic(None, component)
 		if self._component_parameters[component] is not None:
-			self._component_parameters[component].remove_change_handler(self._component_change_handlers[component])
+			self._component_parameters[component].remove_change_handler(self.get_component_change_handler(component))
 			self._component_parameters[component] = None
 		if param_uid is not None:
 			param =  self._parameters.get_parameter_by_uid(param_uid)
+			if self._component_parameters is no_component_parameters:
+				self._component_parameters = list(no_component_parameters)
 			self._component_parameters[component] = param
 			if param is not None:
 				new_value = self.get_instance_generic(None, component)
-				param.add_change_handler(self._component_change_handlers[component])
+				param.add_change_handler(self.get_component_change_handler(component))
 				change_object = self.create_value_change_object(new_value, old_value, component, None)
-				self._component_change_handlers[component](ChangeEvent(self, ChangeEvent.ValueChanged, change_object))
+				self.get_component_change_handler(component)(ChangeEvent(self, ChangeEvent.ValueChanged, change_object))
 
 	def set_x_parameter(self, param_uid):
 		self.set_parameter_generic(param_uid, 0)
@@ -209,7 +352,7 @@ class KeyPoint(Point3d, NamedObservableObject):
 		new_value = float(self._component_parameters[component].evaluate(instance))
 		self.set_instance_generic(instance, new_value, component)
 		if event.type == ChangeEvent.Deleted:
-			event.object.remove_change_handler(self._component_change_handlers[component])
+			event.object.remove_change_handler(self.get_component_change_handler(component))
 			self._component_parameters[component] = None
 		change_object = self.create_value_change_object(new_value, old_value, component, instance)
 		self.changed(ChangeEvent(self, ChangeEvent.ValueChanged, change_object))
@@ -234,7 +377,7 @@ class KeyPoint(Point3d, NamedObservableObject):
 			{
 				'p3d': Point3d.serialize_json(self),
 				'no': NamedObservableObject.serialize_json(self),
-				'instances': self._instances,
+				'instances': dict(self._instances),
 				'x_param_uid': self.get_param_uid(self._component_parameters[0]),
 				'y_param_uid': self.get_param_uid(self._component_parameters[1]),
 				'z_param_uid': self.get_param_uid(self._component_parameters[2])
@@ -255,6 +398,8 @@ class KeyPoint(Point3d, NamedObservableObject):
 		for instance_tuple in data.get('instances', {}).items():
 			instance_uid = instance_tuple[0]
 			vertex = Vertex.deserialize(instance_tuple[1])
+			if self._instances is no_instances:
+				self._instances = {}
 			self._instances[instance_uid] = vertex
 		self.set_parameter_generic(data['x_param_uid'], 0)
 		self.set_parameter_generic(data['y_param_uid'], 1)
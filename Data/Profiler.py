@@ -0,0 +1,205 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+from Data.Events import ChangeEvent
+
+__author__ = 'mamj'
+
+event_type_names = {value: name for name, value in vars(ChangeEvent).items() if type(value) is int}
+
+max_trace_events = 1000000
+
+
+def get_handler_name(handler):
+	name = getattr(handler, '__qualname__', None)
+	if name is None:
+		name = getattr(getattr(handler, 'func', None), '__qualname__', type(handler).__name__)
+	return name
+
+
+class ProfileNode(object):
+	"""
+	A node of the fan out tree: a change event sent by a type of object, a handler it was delivered to or a probe. The
+	children are what happened while the node was running.
+	"""
+	def __init__(self, name, category, depth):
+		self.name = name
+		self.category = category
+		self.depth = depth
+		self.count = 0
+		self.time = 0.0
+		self.children = {}
+
+	def get_child(self, name, category):
+		child = self.children.get((category, name), None)
+		if child is None:
+			child = ProfileNode(name, category, self.depth + 1)
+			self.children[(category, name)] = child
+		return child
+
+	def get_self_time(self):
+		return self.time - sum(child.time for child in self.children.values())
+
+
+class EventProfiler(object):
+	"""
+	Records the cascades of change events while it is active. Every event delivered by ObservableObject.notify is
+	added to a tree under whatever handler or probe was running when it was sent, with the count and cumulative time
+	of the event and of each of its handlers. The tree can be shown as a report and all deliveries can be exported as
+	a Chrome trace (chrome://tracing or Perfetto).
+
+		with EventProfiler() as profiler:
+			parameter.value = 2.0
+		print(profiler.get_report())
+	"""
+	current = None
+
+	def __init__(self, trace=True):
+		self.root = ProfileNode('root', 'root', -1)
+		self._stack = [self.root]
+		self._trace = trace
+		self._trace_events = []
+		self._start = time.perf_counter()
+		self._pid = os.getpid()
+		self._thread = threading.get_ident()
+
+	def start(self):
+		EventProfiler.current = self
+		return self
+
+	def stop(self):
+		if EventProfiler.current is self:
+			EventProfiler.current = None
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.stop()
+		return False
+
+	def enter(self, name, category):
+		node = self._stack[-1].get_child(name, category)
+		self._stack.append(node)
+		return node, time.perf_counter()
+
+	def leave(self, node, start, args=None):
+		end = time.perf_counter()
+		self._stack.pop()
+		node.count += 1
+		node.time += end - start
+		if self._trace and len(self._trace_events) < max_trace_events:
+			trace_event = {
+				'name': node.name,
+				'cat': node.category,
+				'ph': 'X',
+				'ts': (start - self._start) * 1e6,
+				'dur': (end - start) * 1e6,
+				'pid': self._pid,
+				'tid': self._thread
+			}
+			if args is not None:
+				trace_event['args'] = args
+			self._trace_events.append(trace_event)
+
+	def notify(self, observable, event, handlers):
+		"""
+		Delivers the event to the handlers like ObservableObject.notify and records it.
+		"""
+		event_name = "%s %s" % (type(observable).__name__, event_type_names.get(event.type, str(event.type)))
+		event_node, event_start = self.enter(event_name, 'event')
+		try:
+			for handler in handlers:
+				handler_node, handler_start = self.enter(get_handler_name(handler), 'handler')
+				try:
+					handler(event)
+				finally:
+					self.leave(handler_node, handler_start)
+		finally:
+			self.leave(event_node, event_start, {'handlers': len(handlers)})
+
+	def measure(self, name):
+		return ProfileProbe(self, name)
+
+	def get_report(self, min_fraction=0.001):
+		"""
+		Returns the fan out tree as text, with the children of each node ordered by cumulative time. Nodes that took
+		less than min_fraction of the total time are left out.
+		"""
+		total = sum(child.time for child in self.root.children.values())
+		lines = ["%10s %12s %12s  %s" % ("count", "total ms", "self ms", "event / handler / probe")]
+
+		def add_lines(node):
+			for child in sorted(node.children.values(), key=lambda n: n.time, reverse=True):
+				if total > 0 and child.time < total * min_fraction:
+					continue
+				label = child.name if child.category != 'probe' else "[%s]" % child.name
+				lines.append("%10d %12.3f %12.3f  %s%s" % (
+					child.count, child.time * 1000, child.get_self_time() * 1000, "  " * child.depth, label))
+				add_lines(child)
+
+		add_lines(self.root)
+		lines.append("%10s %12.3f %12s  total" % ("", total * 1000, ""))
+		return "\n".join(lines)
+
+	def get_chrome_trace(self):
+		return {'traceEvents': self._trace_events, 'displayTimeUnit': 'ms'}
+
+	def export_chrome_trace(self, file_path):
+		with open(file_path, 'w') as data_file:
+			json.dump(self.get_chrome_trace(), data_file)
+
+
+class ProfileProbe(object):
+	def __init__(self, profiler, name):
+		self._profiler = profiler
+		self._name = name
+		self._node = None
+		self._start = None
+
+	def __enter__(self):
+		self._node, self._start = self._profiler.enter(self._name, 'probe')
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self._profiler.leave(self._node, self._start)
+		return False
+
+
+def probe(name):
+	"""
+	Decorator that records calls of the function as a probe named name while a profiler is active.
+	"""
+	def decorator(function):
+		@functools.wraps(function)
+		def wrapper(*args, **kwargs):
+			profiler = EventProfiler.current
+			if profiler is None:
+				return function(*args, **kwargs)
+			with ProfileProbe(profiler, name):
+				return function(*args, **kwargs)
+		return wrapper
+	return decorator
+
+
+def start_from_environment(variable='PRACEDRU_PROFILE'):
+	"""
+	Starts a profiler when the environment variable is set. At exit the report is printed and the Chrome trace is
+	written to the file the variable names.
+	"""
+	file_path = os.environ.get(variable, None)
+	if not file_path:
+		return None
+	profiler = EventProfiler().start()
+
+	def write_profile():
+		profiler.stop()
+		print(profiler.get_report())
+		profiler.export_chrome_trace(file_path)
+
+	atexit.register(write_profile)
+	return profiler
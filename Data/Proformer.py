@@ -1,5 +1,7 @@
 from enum import Enum
-from math import cos, sin, pi, floor
+from math import cos, sin, atan2
+
+import numpy as np
 
 from Data import get_uids
 from Data.Areas import CompositeArea, EdgeLoopArea, AreaType, Edge
@@ -8,7 +10,7 @@ from Data.Events import ChangeEvent
 from Data.Objects import IdObject, NamedObservableObject, MetaDataObject
 from Data.Parameters import Parameters
 from Data.Point3d import KeyPoint
-from Data.Vertex import Vertex
+from Data.Profiler import probe
 
 
 class ProformerType(Enum):
@@ -23,6 +25,75 @@ class ProformerType(Enum):
 	MirrorXY = 8
 
 
+class ProformerCopy(object):
+	"""
+	A key point, edge or area of a copy made by a proformer, given by the base item and the index of the copy. The
+	copy is only created as an object by materialize, which is left to explicit references like selecting or
+	connecting to the copy. A copy of a key point has the position of a key point.
+	"""
+	__slots__ = ('proformer', 'base', 'index')
+
+	def __init__(self, proformer, base, index):
+		self.proformer = proformer
+		self.base = base
+		self.index = index
+
+	def __eq__(self, other):
+		return type(other) is ProformerCopy and self.proformer is other.proformer and self.base is other.base and self.index == other.index
+
+	def __hash__(self):
+		return hash((id(self.proformer), id(self.base), self.index))
+
+	@property
+	def uid(self):
+		return self.proformer.get_copy_uid(self.base.uid, self.index)
+
+	def is_current(self):
+		return self.proformer.is_pending_copy(self.base, self.index)
+
+	def get_base_point(self, x, y):
+		"""
+		Returns the point of the base item that the copy places in (x, y).
+		"""
+		return self.proformer.get_base_coordinate(x, y, self.index)
+
+	def get_transform(self):
+		return self.proformer.get_transforms()[self.index]
+
+	def get_instance_point(self, instance):
+		return self.proformer.get_coordinate(self.base.get_instance_x(instance), self.base.get_instance_y(instance), self.index)
+
+	def get_instance_x(self, instance):
+		return self.get_instance_point(instance)[0]
+
+	def get_instance_y(self, instance):
+		return self.get_instance_point(instance)[1]
+
+	@property
+	def x(self):
+		return self.get_instance_x(None)
+
+	@property
+	def y(self):
+		return self.get_instance_y(None)
+
+	@property
+	def name(self):
+		return self.base.name
+
+	def materialize(self):
+		return self.proformer.get_copy_item(self.base, self.index)
+
+
+def materialize_item(item):
+	"""
+	Returns the created item for a ProformerCopy, creating it if needed, and any other item as it is.
+	"""
+	if isinstance(item, ProformerCopy):
+		return item.materialize()
+	return item
+
+
 class Proformer(IdObject, Parameters, MetaDataObject):
 	def __init__(self, sketch, type=ProformerType.Circular, name="New proformation"):
 		IdObject.__init__(self)
@@ -38,10 +109,12 @@ class Proformer(IdObject, Parameters, MetaDataObject):
 		self._result_kps = {}
 		self._result_edges = {}
 		self._result_areas = {}
-		self._lookups_kps = []
-		self._lookups_edges = []
-		self._lookups_areas = []
-
+		self._lookups_kps = {}
+		self._lookups_edges = {}
+		self._lookups_areas = {}
+		self._base_areas = []
+		self._transforms = None
+		self._generated = False
 
 	def remove_change_handlers(self):
 		for kp in self._control_kps:
@@ -52,6 +125,8 @@ class Proformer(IdObject, Parameters, MetaDataObject):
 			edge.remove_change_handler(self.edge_changed)
 		for area in self._areas:
 			area.remove_change_handler(self.area_changed)
+		for area in self._base_areas:
+			area.remove_change_handler(self.area_changed)
 
 	def delete(self):
 		self.clear_all()
@@ -74,9 +149,9 @@ class Proformer(IdObject, Parameters, MetaDataObject):
 			self._kps.add(kp)
 
 	def get_keypoint(self, uid):
-		if uid in self._result_kps:
-			return self._result_kps[uid]
-		return None
+		if uid not in self._result_kps:
+			self.materialize_uid(uid, self._kps)
+		return self._result_kps.get(uid, None)
 
 	@property
 	def base_edges(self):
@@ -89,9 +164,9 @@ class Proformer(IdObject, Parameters, MetaDataObject):
 			self._edges.add(edge)
 
 	def get_edge(self, uid):
-		if uid in self._result_edges:
-			return self._result_edges[uid]
-		return None
+		if uid not in self._result_edges:
+			self.materialize_uid(uid, self._edges)
+		return self._result_edges.get(uid, None)
 
 	@property
 	def base_areas(self):
@@ -104,12 +179,15 @@ class Proformer(IdObject, Parameters, MetaDataObject):
 			self._areas.add(area)
 
 	def get_area(self, uid):
-		if uid in self._result_areas:
-			return self._result_areas[uid]
-		return None
+		if uid not in self._result_areas:
+			self.materialize_uid(uid, self._base_areas)
+		return self._result_areas.get(uid, None)
 
 	@property
 	def result_keypoints(self):
+		"""
+		The key points of the copies that have been created, the others are only given by the transforms.
+		"""
 		return self._result_kps.values()
 
 	@property
@@ -120,19 +198,79 @@ class Proformer(IdObject, Parameters, MetaDataObject):
 	def result_areas(self):
 		return self._result_areas.values()
 
+	@property
+	def pending_key_point_count(self):
+		return (self.get_copy_count() - len(self._lookups_kps)) * len(self._kps)
+
+	@property
+	def pending_edge_count(self):
+		return (self.get_copy_count() - len(self._lookups_edges)) * len(self._edges)
+
+	def get_base_items(self):
+		"""
+		Returns the key points, edges and areas that are copied, the areas used by other areas first.
+		"""
+		return list(self._kps) + list(self._edges) + list(self._base_areas)
+
+	def get_pending_indexes(self):
+		"""
+		Returns the indexes of the copies that have not been created as objects.
+		"""
+		return [i for i in range(self.get_copy_count()) if i not in self._lookups_kps]
+
+	def is_pending_copy(self, base, index):
+		if index in self._lookups_kps or index >= self.get_copy_count():
+			return False
+		return base in self._kps or base in self._edges or base in self._base_areas
+
+	def get_pending_copies(self):
+		"""
+		Returns the key points, edges and areas of the copies that have not been created, as ProformerCopy items.
+		"""
+		copies = []
+		indexes = self.get_pending_indexes()
+		for base_items in (self._kps, self._edges, self._base_areas):
+			for base in base_items:
+				copies.extend(ProformerCopy(self, base, i) for i in indexes)
+		return copies
+
+	def get_copy_uid(self, base_uid, index):
+		return base_uid + "-" + self._type.name + str(index)
+
+	def get_copy_item(self, base, index):
+		"""
+		Returns the copy of the base key point, edge or area in copy index. The copy is created if it is pending.
+		"""
+		self.materialize_copy(index)
+		for lookups in (self._lookups_kps, self._lookups_edges, self._lookups_areas):
+			lookup = lookups.get(index, None)
+			if lookup is not None and base.uid in lookup:
+				return lookup[base.uid]
+		return None
+
+	def materialize_uid(self, uid, base_items):
+		"""
+		Creates the copy that the uid belongs to, if the uid is the uid of a copy of one of the base_items.
+		"""
+		base_uid, separator, index = uid.rpartition("-" + self._type.name)
+		if separator == "" or not index.isdigit():
+			return
+		index = int(index)
+		if index < self.get_copy_count() and any(base.uid == base_uid for base in base_items):
+			self.materialize_copy(index)
+
 	def on_meta_param_changed(self, event: ChangeEvent):
 		if event.type == ChangeEvent.ValueChanged:
 			if 'param_change_event' in event.object:
 				if 'count' in event.object['name']:
 					self.resolve()
 				else:
-					if 'param_change_event' in event.object:
-						for kp in self._kps:
-							self.update_kp(kp, event.object['param_change_event'])
+					self._transforms = None
+					self.update_coordinates()
 
 	def on_control_kp_changed(self, event: ChangeEvent):
-		for kp in self._kps:
-			self.update_kp(kp, event)
+		self._transforms = None
+		self.update_coordinates()
 
 	def kp_changed(self, event: ChangeEvent):
 		self.update_kp(event.sender, event)
@@ -159,12 +297,93 @@ class Proformer(IdObject, Parameters, MetaDataObject):
 		self._result_kps = {}
 		self._result_edges = {}
 		self._result_areas = {}
-		self._lookups_kps = []
-		self._lookups_edges = []
-		self._lookups_areas = []
+		self._lookups_kps = {}
+		self._lookups_edges = {}
+		self._lookups_areas = {}
+		self._transforms = None
+		self._generated = False
 		for parameter in self.get_all_parameters():
 			parameter.delete()
 
+	def get_copy_count(self):
+		if self._type == ProformerType.MirrorX or self._type == ProformerType.MirrorY or self._type == ProformerType.Mirror:
+			return 1
+		elif self._type == ProformerType.MirrorXY:
+			return 3
+		elif self._type == ProformerType.Circular:
+			return max(int(self._meta_data['count'] - 1), 0)
+		else:
+			count1 = int(self._meta_data['count1'])
+			count2 = int(self._meta_data['count2'])
+			return max(count1 * count2 - 1, 0)
+
+	def get_transforms(self):
+		"""
+		Returns the affine transforms placing the copies as an (n, 2, 3) array, one [A | t] matrix per copy so a copied
+		point is A.p + t.
+		"""
+		if self._transforms is None:
+			self._transforms = self.calculate_transforms()
+		return self._transforms
+
+	def calculate_transforms(self):
+		count = self.get_copy_count()
+		transforms = np.zeros((count, 2, 3))
+		transforms[:, 0, 0] = 1.0
+		transforms[:, 1, 1] = 1.0
+		if self._type == ProformerType.MirrorX:
+			transforms[:, 1, 1] = -1.0
+		elif self._type == ProformerType.MirrorY:
+			transforms[:, 0, 0] = -1.0
+		elif self._type == ProformerType.MirrorXY:
+			transforms[:, 0, 0] = [1.0, -1.0, -1.0]
+			transforms[:, 1, 1] = [-1.0, 1.0, -1.0]
+		elif self._type == ProformerType.Circular:
+			angles = (1 + np.arange(count)) * float(self._meta_data["dim"])
+			c_kp = self._control_kps[0]
+			center = np.array([c_kp.x, c_kp.y])
+			transforms[:, 0, 0] = np.cos(angles)
+			transforms[:, 0, 1] = -np.sin(angles)
+			transforms[:, 1, 0] = np.sin(angles)
+			transforms[:, 1, 1] = np.cos(angles)
+			transforms[:, :, 2] = center - transforms[:, :, :2].dot(center)
+		elif self._type == ProformerType.Rectangular or self._type == ProformerType.Square or self._type == ProformerType.Diamond or self._type == ProformerType.Triangular:
+			count1 = int(self._meta_data['count1'])
+			length = self._meta_data['length']
+			angle = self._meta_data['angle']
+			indexes = np.arange(1, count + 1)
+			index1 = indexes % count1
+			index2 = indexes // count1
+			transforms[:, 0, 2] = index1 * length * cos(angle) - index2 * length * sin(angle)
+			transforms[:, 1, 2] = index1 * length * sin(angle) + index2 * length * cos(angle)
+		# todo: line mirror needs implementation, it is left as the identity
+		return transforms
+
+	def transform_points(self, points):
+		"""
+		Places (m, 2) points in all copies with one broadcast.
+		:return: (n, m, 2) array with the points of every copy
+		"""
+		transforms = self.get_transforms()
+		points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+		return np.einsum('nij,mj->nmi', transforms[:, :, :2], points) + transforms[:, None, :, 2]
+
+	def transform_angle(self, angle, p_index):
+		linear = self.get_transforms()[p_index, :, :2]
+		direction = linear.dot([cos(angle), sin(angle)])
+		return atan2(direction[1], direction[0])
+
+	def is_reflection(self, p_index):
+		return np.linalg.det(self.get_transforms()[p_index, :, :2]) < 0
+
+	def get_coordinate(self, x, y, p_index):
+		transform = self.get_transforms()[p_index]
+		return list(transform[:, :2].dot([x, y]) + transform[:, 2])
+
+	def get_base_coordinate(self, x, y, p_index):
+		transform = self.get_transforms()[p_index]
+		return list(np.linalg.solve(transform[:, :2], [x - transform[0, 2], y - transform[1, 2]]))
+
 	def update_kp(self, kp, event = None):
 		if event is not None:
 			if event.type == ChangeEvent.Deleted:
@@ -172,7 +391,7 @@ class Proformer(IdObject, Parameters, MetaDataObject):
 				kp.remove_change_handler(self.kp_changed)
 				if kp in self._kps:
 					self._kps.remove(kp)
-				for lookup_kps in self._lookups_kps:
+				for lookup_kps in self._lookups_kps.values():
 					if kp.uid in lookup_kps:
 						new_kp = lookup_kps[kp.uid]
 						self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.BeforeObjectRemoved, new_kp))
@@ -182,89 +401,39 @@ class Proformer(IdObject, Parameters, MetaDataObject):
 						new_kp.delete()
 						self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.ObjectRemoved, new_kp))
 				return
-		if self._type == ProformerType.MirrorX or self._type == ProformerType.MirrorY or self._type == ProformerType.Mirror:
-			self.update_kp_index(kp, event, 0)
-		elif self._type == ProformerType.MirrorXY:
-			self.update_kp_index(kp, event, 0)
-			self.update_kp_index(kp, event, 1)
-			self.update_kp_index(kp, event, 2)
-		else:
-			if self._type == ProformerType.Circular:
-				count = int(self._meta_data['count']-1)
-				for i in range(count):
-					self.update_kp_index(kp, event, i)
-
-			elif self._type == ProformerType.Square or self._type == ProformerType.Rectangular or self._type == ProformerType.Diamond or self._type == ProformerType.Triangular:
-				count1 = self._meta_data['count1']
-				count2 = self._meta_data['count2']
-				count = int(count1 * count2) - 1
-				for i in range(count):
-					self.update_kp_index(kp, event, i)
-
-
-	def update_kp_index(self, kp, event, p_index):
-		if event is None:
-			new_kp = self._lookups_kps[p_index][kp.uid]
-			coord = self.get_coordinate(kp.x, kp.y, p_index)
-			new_kp.x = coord[0]
-			new_kp.y = coord[1]
-			for vertext_instance_tuple in kp.instances:
-				coord = self.get_coordinate(vertext_instance_tuple[1].x, vertext_instance_tuple[1].y, p_index)
-				new_kp.set_instance_x(vertext_instance_tuple[0], coord[0])
-				new_kp.set_instance_y(vertext_instance_tuple[0], coord[1])
-		else:
-			if 'instance' in event.object:
-				instance = event.object['instance']
-				new_kp = self._lookups_kps[p_index][kp.uid]
-				coord = self.get_coordinate(kp.get_instance_x(instance), kp.get_instance_y(instance), p_index)
-				new_kp.set_instance_x(instance, coord[0])
-				new_kp.set_instance_y(instance, coord[1])
-
-
-	def get_coordinate(self, x, y, p_index):
-		coord = [0.0, 0.0]
-		if self._type == ProformerType.MirrorX:
-			coord[0] = x
-			coord[1] = -y
-		elif self._type == ProformerType.MirrorY:
-			coord[0] = -x
-			coord[1] = y
-		elif self._type == ProformerType.MirrorXY:
-			if p_index == 0:
-				coord[0] = x
-				coord[1] = -y
-			elif p_index == 1:
-				coord[0] = -x
-				coord[1] = y
-			elif p_index == 2:
-				coord[0] = -x
-				coord[1] = -y
-		elif self._type == ProformerType.Circular:
-			angle_increment = float(self._meta_data["dim"])
-			angle = (1+p_index)*angle_increment
-			c_kp = self._control_kps[0]
-			v = Vertex(x, y)
-			dist = c_kp.distance(v)
-			new_angle = c_kp.angle2d(v) + angle
-			coord[0] = c_kp.x + cos(new_angle)*dist
-			coord[1] = c_kp.y + sin(new_angle)*dist
-		elif self._type == ProformerType.Rectangular or self._type == ProformerType.Square or self._type == ProformerType.Diamond or self._type == ProformerType.Triangular:
-			count1 = self._meta_data['count1']
-			count2 = self._meta_data['count2']
-			length = self._meta_data['length']
-			angle = self._meta_data['angle']
-			count = int(count1 * count2) - 1
-			index1 = (p_index + 1) % count1
-			index2 =  floor ((p_index+1)/count1)
-
-			if self._type == ProformerType.Square:
-				coord[0] = x + index1 * length * cos(angle) - index2 * length * sin(angle)
-				coord[1] = y + index1 * length * sin(angle) + index2 * length * cos(angle)
-		else:
-			# todo: line mirror needs implementation
-			coord[0] = x
-			coord[1] = y
-		return coord
+			if type(event.object) is dict and 'instance' in event.object:
+				self.place_copies([kp], event.object['instance'])
+				self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.ObjectChanged, self))
+			return
+		self.update_coordinates([kp])
+
+	def update_coordinates(self, kps=None):
+		"""
+		Moves the created copies of the key points, and of their instance positions, to where the transforms place
+		them. The sketch is told with one event, as the pending copies follow the transforms by themselves.
+		"""
+		if kps is None:
+			kps = list(self._kps)
+		self.place_copies(kps, None)
+		instance_uids = set()
+		for kp in kps:
+			for instance_tuple in kp.instances:
+				instance_uids.add(instance_tuple[0])
+		for instance_uid in instance_uids:
+			self.place_copies(kps, instance_uid)
+		self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.ObjectChanged, self))
+
+	def place_copies(self, kps, instance_uid):
+		if len(self._lookups_kps) == 0 or len(kps) == 0:
+			return
+		points = [[kp.get_instance_x(instance_uid), kp.get_instance_y(instance_uid)] for kp in kps]
+		coords = self.transform_points(points)
+		for i, lookup_kps in self._lookups_kps.items():
+			for j in range(len(kps)):
+				new_kp = lookup_kps.get(kps[j].uid, None)
+				if new_kp is not None:
+					new_kp.set_instance_x(instance_uid, float(coords[i, j, 0]))
+					new_kp.set_instance_y(instance_uid, float(coords[i, j, 1]))
 
 	def update_edge(self, edge, event=None):
 		if event is None:
@@ -274,7 +443,7 @@ class Proformer(IdObject, Parameters, MetaDataObject):
 				edge.remove_change_handler(self.edge_changed)
 				if edge in self._edges:
 					self._edges.remove(edge)
-				for lookup_edges in self._lookups_edges:
+				for lookup_edges in self._lookups_edges.values():
 					if edge.uid in lookup_edges:
 						new_edge = lookup_edges[edge.uid]
 						self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.BeforeObjectRemoved, new_edge))
@@ -293,7 +462,7 @@ class Proformer(IdObject, Parameters, MetaDataObject):
 				area.remove_change_handler(self.area_changed)
 				if area in self._areas:
 					self._areas.remove(area)
-				for lookup_areas in self._lookups_areas:
+				for lookup_areas in self._lookups_areas.values():
 					if area.uid in lookup_areas:
 						new_area = lookup_areas[area.uid]
 						self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.BeforeObjectRemoved, new_area))
@@ -303,52 +472,28 @@ class Proformer(IdObject, Parameters, MetaDataObject):
 						new_area.delete()
 						self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.ObjectRemoved, new_area))
 				return
-		i = 0
-		for lookup_areas in self._lookups_areas:
+		for i, lookup_areas in self._lookups_areas.items():
 			if area.uid in lookup_areas:
 				new_area = lookup_areas[area.uid]
 				new_area.name = area.name + self._type.name + str(i)
 				new_area.brush_name = area.brush_name
 				new_area.brush_rotation = area.brush_rotation
-			i += 1
 
-	def generate_kp(self, kp):
-		if self._type == ProformerType.MirrorX or self._type == ProformerType.MirrorY:
-			count = 1
-		elif self._type == ProformerType.MirrorXY:
-			count = 3
-		elif self._type == ProformerType.Circular:
-			count = int(self._meta_data['count']-1)
-		elif self._type == ProformerType.Rectangular or self._type == ProformerType.Square or self._type == ProformerType.Diamond:
-			count1 = self._meta_data['count1']
-			count2 = self._meta_data['count2']
-			count = int(count1 * count2) - 1
-		for i in range(count):
-			kp.add_change_handler(self.kp_changed)
-			new_kp = KeyPoint(self._sketch, name=kp.name+self._type.name+str(i))
-			self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.BeforeObjectAdded, new_kp))
-			new_kp._uid = kp.uid + "-" + self._type.name + str(i)
+	def generate_kp(self, kp, coords, indexes):
+		for i, coord in zip(indexes, coords):
+			new_kp = KeyPoint(self._sketch, float(coord[0]), float(coord[1]), kp.z, name=kp.name+self._type.name+str(i))
+			new_kp._uid = self.get_copy_uid(kp.uid, i)
 			new_kp.editable = False
+			self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.BeforeObjectAdded, new_kp))
+			self._sketch.key_point_array.attach(new_kp)
 			self._result_kps[new_kp.uid] = new_kp
 			self._lookups_kps[i][kp.uid] = new_kp
 			self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.ObjectAdded, new_kp))
 
-	def generate_edge(self, edge):
-		if self._type == ProformerType.MirrorX or self._type == ProformerType.MirrorY:
-			count = 1
-		elif self._type == ProformerType.MirrorXY:
-			count = 3
-		elif self._type == ProformerType.Circular:
-			count = int(self._meta_data['count']-1)
-		elif self._type == ProformerType.Rectangular or self._type == ProformerType.Square or self._type == ProformerType.Diamond:
-			count1 = self._meta_data['count1']
-			count2 = self._meta_data['count2']
-			count = int(count1 * count2) - 1
-		for i in range(count):
-			edge.add_change_handler(self.edge_changed)
+	def generate_edge(self, edge, indexes):
+		for i in indexes:
 			new_edge = Edge(self._sketch, edge.type, edge.name+self._type.name + str(i))
-			self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.BeforeObjectAdded, new_edge))
-			new_edge._uid = edge.uid + "-" + self._type.name + str(i)
+			new_edge._uid = self.get_copy_uid(edge.uid, i)
 			new_edge.style_name = edge.style_name
 			for kp in edge.get_keypoints():
 				new_edge.add_key_point(self._lookups_kps[i][kp.uid])
@@ -356,41 +501,34 @@ class Proformer(IdObject, Parameters, MetaDataObject):
 				r = edge.get_meta_data('r', None)
 				new_edge.set_meta_data('r', r)
 				r_param = edge.get_meta_data_parameter('r')
-				new_edge.set_meta_data_parameter('r', r_param)
+				if r_param is not None:
+					new_edge.set_meta_data_parameter('r', r_param)
 			elif edge.type == EdgeType.NurbsEdge:
 				n = edge.get_meta_data('n', 2)
 				new_edge.set_meta_data('n', n)
 			if edge.type == EdgeType.ArcEdge:
-				sa = edge.get_meta_data('sa', None)
+				# The arc ends are placed by the transform, a reflection turns the arc so its ends trade places
+				sa = self.transform_angle(edge.get_meta_data('sa', None), i)
+				ea = self.transform_angle(edge.get_meta_data('ea', None), i)
+				end_kps = edge.get_end_key_points()
+				if self.is_reflection(i):
+					sa, ea = ea, sa
+					end_kps = [end_kps[1], end_kps[0]]
 				new_edge.set_meta_data('sa', sa)
-				#sa_param = edge.get_meta_data_parameter('sa')
-				#new_edge.set_meta_data_parameter('sa', sa_param)
-				ea = edge.get_meta_data('ea', None)
 				new_edge.set_meta_data('ea', ea)
-				#ea_param = edge.get_meta_data_parameter('ea')
-				#new_edge.set_meta_data_parameter('ea', ea_param)
+				new_edge.set_meta_data('start_kp', self._lookups_kps[i][end_kps[0].uid].uid)
+				new_edge.set_meta_data('end_kp', self._lookups_kps[i][end_kps[1].uid].uid)
 			new_edge.editable = False
+			self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.BeforeObjectAdded, new_edge))
 			self._result_edges[new_edge.uid] = new_edge
 			self._lookups_edges[i][edge.uid] = new_edge
 			self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.ObjectAdded, new_edge))
 
-	def generate_area(self, area):
-		if self._type == ProformerType.MirrorX or self._type == ProformerType.MirrorY:
-			count = 1
-		elif self._type == ProformerType.MirrorXY:
-			count = 3
-		elif self._type == ProformerType.Circular:
-			count = int(self._meta_data['count']-1)
-		elif self._type == ProformerType.Rectangular or self._type == ProformerType.Square or self._type == ProformerType.Diamond:
-			count1 = self._meta_data['count1']
-			count2 = self._meta_data['count2']
-			count = int(count1 * count2) - 1
-		for i in range(count):
+	def generate_area(self, area, indexes):
+		for i in indexes:
 			if issubclass(type(area), CompositeArea):
-				area.add_change_handler(self.area_changed)
 				new_area = CompositeArea(self._sketch)
-				new_area._uid = area.uid + "-" + self._type.name + str(i)
-				self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.BeforeObjectAdded, new_area))
+				new_area._uid = self.get_copy_uid(area.uid, i)
 				new_base_area = self._lookups_areas[i][area.base_area.uid]
 				new_area.base_area = new_base_area
 				for subtracted_area in area.subtracted_areas:
@@ -398,24 +536,28 @@ class Proformer(IdObject, Parameters, MetaDataObject):
 					new_area.add_subtract_area(new_subtracted_area)
 				new_area.brush_name = area.brush_name
 				new_area.name = area.name + self._type.name + str(i)
-				self._result_areas[new_area.uid] = new_area
-				self._lookups_areas[i][area.uid] = new_area
+				self.add_result_area(area, new_area, i)
 			else:
-				area.add_change_handler(self.area_changed)
 				new_area = EdgeLoopArea(self._sketch)
-				new_area._uid = area.uid + "-" + self._type.name + str(i)
-				self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.BeforeObjectAdded, new_area))
+				new_area._uid = self.get_copy_uid(area.uid, i)
 				for edge in area.get_edges():
 					new_edge = self._lookups_edges[i][edge.uid]
 					new_area.add_edge(new_edge)
 				new_area.name = area.name + self._type.name + str(i)
-				self._result_areas[new_area.uid] = new_area
-				self._lookups_areas[i][area.uid] = new_area
 				new_area.brush_name = area.brush_name
-
-			self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.ObjectAdded, new_area))
-
-	def generate_all(self):
+				self.add_result_area(area, new_area, i)
+
+	def add_result_area(self, area, new_area, i):
+		self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.BeforeObjectAdded, new_area))
+		self._result_areas[new_area.uid] = new_area
+		self._lookups_areas[i][area.uid] = new_area
+		self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.ObjectAdded, new_area))
+
+	def get_base_geometry(self):
+		"""
+		Returns the key points, edges and areas the copies are made of. Areas used by the selected composite areas
+		come first, so their copies exist when the composite copies are made.
+		"""
 		base_areas = []
 		for area in self._areas:
 			if area.type == AreaType.Composite:
@@ -427,51 +569,101 @@ class Proformer(IdObject, Parameters, MetaDataObject):
 		for area in self._areas:
 			if area not in base_areas:
 				base_areas.append(area)
+		base_areas = [area for area in base_areas if area]
+		edges = set(self._edges)
 		for area in base_areas:
-			if area:
-				for edge in area.get_edges():
-					self._edges.add(edge)
-		for edge in self._edges:
-			for kp in edge.get_keypoints():
-				if kp not in self._kps:
-					self._kps.add(kp)
+			for edge in area.get_edges():
+				edges.add(edge)
+		kps = set(self._kps)
+		for edge in edges:
+			kps.update(edge.get_keypoints())
+			if edge.type == EdgeType.ArcEdge:
+				kps.update(edge.get_end_key_points())
+		return kps, edges, base_areas
 
-		if self._type == ProformerType.MirrorX or self._type == ProformerType.MirrorY or self._type == ProformerType.Mirror:
-			self._lookups_kps.append({})
-			self._lookups_edges.append({})
-			self._lookups_areas.append({})
-		elif self._type == ProformerType.MirrorXY:
-			for i in range(3):
-				self._lookups_kps.append({})
-				self._lookups_edges.append({})
-				self._lookups_areas.append({})
-		elif self._type == ProformerType.Circular:
-			count = int(self._meta_data['count'])
-			for i in range(count):
-				self._lookups_kps.append({})
-				self._lookups_edges.append({})
-				self._lookups_areas.append({})
-		elif self._type == ProformerType.Square or self._type == ProformerType.Rectangular or self._type == ProformerType.Diamond or self._type == ProformerType.Triangular:
-			count1 = self._meta_data['count1']
-			count2 = self._meta_data['count2']
-			count = int(count1 * count2)-1
-			for i in range(count):
-				self._lookups_kps.append({})
-				self._lookups_edges.append({})
-				self._lookups_areas.append({})
+	def generate_all(self):
+		"""
+		Gathers the base geometry of the pattern. The copies are not created here, they are given by the transforms
+		until one of them is asked for by its uid. The sketch is told about the new pattern with one event.
+		"""
+		self._kps, self._edges, self._base_areas = self.get_base_geometry()
+		self._generated = True
 		for kp in self._kps:
-			self.generate_kp(kp)
-			self.update_kp(kp)
+			kp.add_change_handler(self.kp_changed)
 		for edge in self._edges:
-			self.generate_edge(edge)
-			self.update_edge(edge)
-		for area in base_areas:
-			self.generate_area(area)
+			edge.add_change_handler(self.edge_changed)
+		for area in self._base_areas:
+			area.add_change_handler(self.area_changed)
+		self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.ObjectChanged, self))
+
+	@probe('Proformer.materialize')
+	def materialize(self):
+		"""
+		Creates the key points, edges and areas of all the pending copies, for when every copy is needed as an object.
+		"""
+		with self._sketch.document.batch():
+			for i in self.get_pending_indexes():
+				self.materialize_copy(i)
+
+	def materialize_copy(self, i):
+		"""
+		Creates the key points, edges and areas of copy i, if it is pending. The sketch is told about each of them like
+		when they are removed again.
+		"""
+		if i in self._lookups_kps or i >= self.get_copy_count():
+			return
+		self._lookups_kps[i] = {}
+		self._lookups_edges[i] = {}
+		self._lookups_areas[i] = {}
+		kps = list(self._kps)
+		if len(kps) > 0:
+			coords = self.transform_points([[kp.x, kp.y] for kp in kps])[i:i + 1]
+			for j in range(len(kps)):
+				self.generate_kp(kps[j], coords[:, j], [i])
+			for instance_uid in set(instance_tuple[0] for kp in kps for instance_tuple in kp.instances):
+				self.place_copies(kps, instance_uid)
+		for edge in self._edges:
+			self.generate_edge(edge, [i])
+		for area in self._base_areas:
+			self.generate_area(area, [i])
 			self.update_area(area)
 
+	def remove_copies(self, count):
+		"""
+		Removes the created copies from count and up, the copies before count are not touched.
+		"""
+		indexes = [i for i in self._lookups_kps if i >= count]
+		removed = []
+		for lookups in (self._lookups_areas, self._lookups_edges, self._lookups_kps):
+			for i in indexes:
+				removed.extend(lookups[i].values())
+		for item in removed:
+			self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.BeforeObjectRemoved, item))
+			self._result_areas.pop(item.uid, None)
+			self._result_edges.pop(item.uid, None)
+			self._result_kps.pop(item.uid, None)
+			item.delete()
+			self._sketch.changed(ChangeEvent(self._sketch, ChangeEvent.ObjectRemoved, item))
+		for i in indexes:
+			del self._lookups_kps[i]
+			del self._lookups_edges[i]
+			del self._lookups_areas[i]
+
+	@probe('Proformer.resolve')
 	def resolve(self):
-		self.clear_all()
-		self.generate_all()
+		"""
+		Brings the copies up to date. When the base geometry is the same the created copies are moved in place and
+		those beyond the number of copies are removed, so the copies keep their uids and everything referring to them
+		stays valid. Otherwise all copies are made again.
+		"""
+		with self._sketch.document.batch():
+			if self._generated and self.get_base_geometry() == (self._kps, self._edges, self._base_areas):
+				self._transforms = None
+				self.remove_copies(self.get_copy_count())
+				self.update_coordinates()
+			else:
+				self.clear_all()
+				self.generate_all()
 
 
 	def serialize_json(self):
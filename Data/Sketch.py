@@ -4,8 +4,9 @@ from Data.Events import ChangeEvent, ValueChangeEvent
 from Data.Geometry import Geometry
 from Data.Objects import IdObject, ObservableObject
 from Data.Parameters import Parameters, ParametersInstance
-from Data.Point3d import KeyPoint
+from Data.Point3d import KeyPoint, KeyPointArray
 from Data.Proformer import Proformer
+from Data.SpatialIndex import SpatialIndex
 
 __author__ = 'mamj'
 
@@ -14,6 +15,7 @@ class Sketch(Geometry):
 	def __init__(self, params_parent):
 		Geometry.__init__(self, params_parent, "New Sketch", Geometry.Sketch)
 		self._key_points = {}
+		self._key_point_array = KeyPointArray()
 		self._edges = {}
 		self._texts = {}
 		self._areas = {}
@@ -21,6 +23,8 @@ class Sketch(Geometry):
 		self._proformers = {}
 		self.threshold = 0.1
 		self.edge_naming_index = 1
+		self._spatial_index = None
+		self._instance_limits = {}
 
 	def add_edge(self, edge):
 		self.changed(ChangeEvent(self, ChangeEvent.BeforeObjectAdded, edge))
@@ -39,39 +43,76 @@ class Sketch(Geometry):
 		self.changed(ChangeEvent(self, ChangeEvent.Cleared, self))
 
 	def get_limits(self):
+		"""
+		Returns [x min, y min, x max, y max] of the key points, circles and sketch instances of the sketch. The limits
+		of the sketch itself are kept by the spatial index and the limits of the instances are memoized per instanced
+		sketch and transform.
+		"""
+		limits = list(self.get_spatial_index().get_limits())
+		sketch_limits = {}
+		for instance in self._sketch_instances.values():
+			sketch = instance.sketch
+			if sketch.uid not in sketch_limits:
+				sketch_limits[sketch.uid] = tuple(sketch.get_limits())
+			in_lim = self.get_instance_limits(instance, sketch_limits[sketch.uid])
+			limits[0] = min(in_lim[0], limits[0])
+			limits[1] = min(in_lim[1], limits[1])
+			limits[2] = max(in_lim[2], limits[2])
+			limits[3] = max(in_lim[3], limits[3])
+		return limits
+
+	def get_instance_limits(self, instance, in_lim):
+		sc = instance.scale
+		key = (instance.sketch.uid, sc, instance.offset.x, instance.offset.y, in_lim)
+		memo = self._instance_limits.get(instance.uid, None)
+		if memo is not None and memo[0] == key:
+			return memo[1]
+		limits = (in_lim[0]*sc + instance.offset.x, in_lim[1]*sc + instance.offset.y,
+							in_lim[2]*sc + instance.offset.x, in_lim[3]*sc + instance.offset.y)
+		self._instance_limits[instance.uid] = (key, limits)
+		return limits
+
+	def get_instance_values_key(self, instance_uid):
+		"""
+		Returns the values the sketch instance gives the parameters and key points of this sketch where they differ from
+		those of the sketch, as a tuple. The tuple is empty if the instance looks like the sketch itself.
+		"""
+		values = []
+		for uid, parameter in self.get_all_local_parameters():
+			if parameter.has_instance_value(instance_uid):
+				values.append((uid, parameter.get_instance_value(instance_uid)))
+		for kp in self._key_points.values():
+			instance_kp = kp.get_instance(instance_uid)
+			if instance_kp is not kp:
+				values.append((kp.uid, tuple(instance_kp.xyz)))
+		return tuple(values)
+
+	def get_limits_in_instance(self, instance_uid):
+		"""
+		Returns [x min, y min, x max, y max] of the key points and circle edges of the sketch with the values of the
+		sketch instance, in the coordinates of this sketch.
+		"""
 		limits = [1.0e16, 1.0e16, -1.0e16, -1.0e16]
-		kps = self.get_keypoints()
-		for pnt in kps:
-			limits[0] = min(pnt.x, limits[0])
-			limits[1] = min(pnt.y, limits[1])
-			limits[2] = max(pnt.x, limits[2])
-			limits[3] = max(pnt.y, limits[3])
-
-		for edge in self.get_edges():
+		for kp in self._key_points.values():
+			x = kp.get_instance_x(instance_uid)
+			y = kp.get_instance_y(instance_uid)
+			SpatialIndex.extend_limits(limits, [x, y, x, y])
+		for edge in self._edges.values():
 			if edge.type == EdgeType.CircleEdge:
-				ckp = edge.get_keypoints()[0]
-				r = edge.get_meta_data("r")
-				limits[0] = min(ckp.x-r, limits[0])
-				limits[1] = min(ckp.y-r, limits[1])
-				limits[2] = max(ckp.x+r, limits[2])
-				limits[3] = max(ckp.y+r, limits[3])
-
-		for instance in self._sketch_instances.values():
-			in_lim = instance.sketch.get_limits()
-			sc = instance.scale
-			limits[0] = min(in_lim[0]*sc + instance.offset.x, limits[0])
-			limits[1] = min(in_lim[1]*sc + instance.offset.y, limits[1])
-			limits[2] = max(in_lim[2]*sc + instance.offset.x, limits[2])
-			limits[3] = max(in_lim[3]*sc + instance.offset.y, limits[3])
+				kp = edge.get_keypoints()[0]
+				x = kp.get_instance_x(instance_uid)
+				y = kp.get_instance_y(instance_uid)
+				r = abs(edge.get_meta_data('r', instance_uid))
+				SpatialIndex.extend_limits(limits, [x - r, y - r, x + r, y + r])
 		return limits
 
 	@property
 	def key_point_count(self):
-		return len(self.get_keypoints())
+		return len(self._key_point_array) + sum(proformer.pending_key_point_count for proformer in self._proformers.values())
 
 	@property
 	def edges_count(self):
-		return len(self.get_edges())
+		return len(self.get_edges()) + sum(proformer.pending_edge_count for proformer in self._proformers.values())
 
 	@property
 	def sketch_instances(self):
@@ -138,6 +179,17 @@ class Sketch(Geometry):
 			kps.extend(proformer.result_keypoints)
 		return kps
 
+	@property
+	def key_point_array(self):
+		return self._key_point_array
+
+	def get_key_point_array(self):
+		"""
+		Returns the array with the coordinates of the key points of the sketch, with the copies the proformers have
+		created. The copies that are pending are given by Proformer.transform_points.
+		"""
+		return self._key_point_array
+
 	def get_texts(self):
 		return self._texts.values()
 
@@ -185,17 +237,20 @@ class Sketch(Geometry):
 			if kp.uid in self._key_points:
 				kp.changed(ChangeEvent(self, ChangeEvent.Deleted, kp))
 				self._key_points.pop(kp.uid)
+				kp.detach()
+
+	def get_spatial_index(self):
+		if self._spatial_index is None:
+			self._spatial_index = SpatialIndex(self)
+		return self._spatial_index
 
 	def get_keypoint_by_location(self, x, y, z, ts=None):
-		key_point = None
-		for p_tuple in self._key_points.items():
-			p = p_tuple[1]
-			if ts is None:
-				ts = self.threshold
-			if abs(p.x - x) < ts and abs(p.y - y) < ts and abs(p.z - z) < ts:
-				key_point = p
-				break
-		return key_point
+		if ts is None:
+			ts = self.threshold
+		for p in self.get_spatial_index().get_key_points_near(x, y, ts):
+			if p.uid in self._key_points and abs(p.z - z) < ts:
+				return p
+		return None
 
 	def create_keypoint(self, x, y, z):
 		key_point = KeyPoint(self, x, y, z)
@@ -205,6 +260,7 @@ class Sketch(Geometry):
 	def add_keypoint(self, key_point):
 		self.changed(ChangeEvent(self, ChangeEvent.BeforeObjectAdded, key_point))
 		self._key_points[key_point.uid] = key_point
+		self._key_point_array.attach(key_point)
 		self.changed(ChangeEvent(self, ChangeEvent.ObjectAdded, key_point))
 		key_point.add_change_handler(self.on_kp_changed)
 
@@ -223,6 +279,7 @@ class Sketch(Geometry):
 		self.changed(ChangeEvent(self, ChangeEvent.BeforeObjectAdded, sketch_instance))
 		self._sketch_instances[sketch_instance.uid] = sketch_instance
 		self.changed(ChangeEvent(self, ChangeEvent.ObjectAdded, sketch_instance))
+		sketch_instance.add_change_handler(self.on_sketch_instance_changed)
 		return sketch_instance
 
 	def create_circle_edge(self, kp, radius_param):
@@ -371,6 +428,7 @@ class Sketch(Geometry):
 			if event.sender.uid in self._key_points:
 				self.changed(ChangeEvent(self, ChangeEvent.BeforeObjectRemoved, event.sender))
 				self._key_points.pop(event.sender.uid)
+				event.sender.detach()
 				self.changed(ChangeEvent(self, ChangeEvent.ObjectRemoved, event.sender))
 			event.object.remove_change_handler(self.on_kp_changed)
 
@@ -384,6 +442,8 @@ class Sketch(Geometry):
 			event.object.remove_change_handler(self.on_text_changed)
 
 	def on_edge_changed(self, event):
+		if event.type == ChangeEvent.ObjectChanged and event.sender is event.object:
+			self.changed(ChangeEvent(self, ChangeEvent.ObjectChanged, event.sender))
 		if event.type == ChangeEvent.Deleted:
 			if event.object.uid in self._edges:
 				self.changed(ChangeEvent(self, ChangeEvent.BeforeObjectRemoved, event.sender))
@@ -405,6 +465,7 @@ class Sketch(Geometry):
 				self.changed(ChangeEvent(self, ChangeEvent.BeforeObjectRemoved, event.sender))
 				self._sketch_instances.pop(event.object.uid)
 				self.changed(ChangeEvent(self, ChangeEvent.ObjectRemoved, event.sender))
+			self._instance_limits.pop(event.object.uid, None)
 			event.object.remove_change_handler(self.on_sketch_instance_changed)
 
 	def on_proformer_changed(self, event: ChangeEvent):
@@ -449,6 +510,7 @@ class Sketch(Geometry):
 			kp_data = kp_data_tuple[1]
 			kp = KeyPoint.deserialize(kp_data, self)
 			self._key_points[kp.uid] = kp
+			self._key_point_array.attach(kp)
 			kp.add_change_handler(self.on_kp_changed)
 		for edge_data_tuple in data.get('edges', {}).items():
 			edge_data = edge_data_tuple[1]
@@ -0,0 +1,467 @@
+from math import floor, sqrt, inf
+
+import numpy as np
+
+from Data.Areas import Area
+from Data.Edges import Edge, EdgeType
+from Data.Events import ChangeEvent
+from Data.Objects import ChangeBatch
+from Data.Point3d import KeyPoint
+from Data.Proformer import Proformer, ProformerCopy
+from Data.Vertex import Vector3
+
+
+class SpatialIndex(object):
+	"""
+	Uniform grid over the xy bounding boxes of the key points, edges and areas of a sketch. The index listens to
+	the change events of the sketch, changed items are marked dirty and put in their new cells on the next query.
+	The copies of a proformer that have not been created are not in the grid, their bounds are kept per proformer in
+	one array made from the bounds of the base items and the copy transforms.
+	"""
+	max_cells_per_item = 256
+
+	def __init__(self, sketch):
+		self._sketch = sketch
+		self._cell_size = 1.0
+		self._cells = {}
+		self._item_cells = {}
+		self._bounds = {}
+		self._large_items = set()
+		self._order = {}
+		self._counter = 0
+		self._dirty = set()
+		self._edge_areas = {}
+		self._rebuild_needed = True
+		self._limits = None
+		self._patterns = {}
+		self._dirty_patterns = set()
+		self._update_handlers = []
+		sketch.add_change_handler(self.on_sketch_changed)
+
+	@property
+	def cell_size(self):
+		return self._cell_size
+
+	def add_update_handler(self, handler):
+		"""
+		The handler is called with the set of items that have changed when the index is updated, or with None when
+		the whole index has been rebuilt. Views use this to drop what they have cached for those items.
+		"""
+		self._update_handlers.append(handler)
+
+	def remove_update_handler(self, handler):
+		if handler in self._update_handlers:
+			self._update_handlers.remove(handler)
+
+	def notify_update(self, items):
+		for handler in self._update_handlers:
+			handler(items)
+
+	def on_sketch_changed(self, event: ChangeEvent):
+		if self._rebuild_needed:
+			return
+		item = event.object
+		if event.type == ChangeEvent.ObjectAdded:
+			if isinstance(item, (KeyPoint, Edge, Area)):
+				self._dirty.add(item)
+			elif isinstance(item, Proformer):
+				self._dirty_patterns.add(item)
+		elif event.type == ChangeEvent.ObjectRemoved:
+			self.remove(item)
+			self.notify_update({item})
+		elif event.type == ChangeEvent.ObjectChanged:
+			if isinstance(item, KeyPoint):
+				self.mark_key_point(item)
+			elif isinstance(item, Edge):
+				self.mark_edge(item)
+			elif isinstance(item, Proformer):
+				self._dirty.update(item.result_keypoints)
+				self._dirty.update(item.result_edges)
+				self._dirty.update(item.result_areas)
+				self._dirty_patterns.add(item)
+		elif event.type == ChangeEvent.Cleared:
+			self._rebuild_needed = True
+
+	def mark_key_point(self, kp):
+		self._dirty.add(kp)
+		for edge in kp.get_edges():
+			self.mark_edge(edge)
+			if edge.type == EdgeType.LineEdge:
+				for edge_kp in edge.get_keypoints():
+					if edge_kp is not None:
+						for other_edge in edge_kp.get_edges():
+							if other_edge.type == EdgeType.FilletLineEdge:
+								self.mark_edge(other_edge)
+
+	def mark_edge(self, edge):
+		self._dirty.add(edge)
+		self._dirty.update(self._edge_areas.get(edge, ()))
+
+	@staticmethod
+	def is_limits_item(item):
+		return isinstance(item, KeyPoint) or (isinstance(item, Edge) and item.type == EdgeType.CircleEdge)
+
+	def get_limits(self):
+		"""
+		Returns [x min, y min, x max, y max] of the key points and circle edges, including those of the copies that
+		have not been created. The limits are grown as items are inserted and only gathered again when an item on the
+		border has been moved or removed or a proformer has changed, the key points then in one pass over the key point
+		array of the sketch and the copies from the bounds arrays of the proformers.
+		"""
+		self.update()
+		if self._limits is None:
+			limits = [1.0e16, 1.0e16, -1.0e16, -1.0e16]
+			kp_limits = self._sketch.key_point_array.get_bounds()
+			if kp_limits is not None:
+				self.extend_limits(limits, kp_limits)
+			for edge in self._sketch.get_edges():
+				bounds = self._bounds.get(edge, None)
+				if bounds is not None and edge.type == EdgeType.CircleEdge:
+					self.extend_limits(limits, bounds)
+			for bases, base_set, bounds, limits_mask in self._patterns.values():
+				limits_bounds = bounds[:, limits_mask]
+				if limits_bounds.size > 0:
+					self.extend_limits(limits, [float(limits_bounds[:, :, 0].min()), float(limits_bounds[:, :, 1].min()),
+																		float(limits_bounds[:, :, 2].max()), float(limits_bounds[:, :, 3].max())])
+			self._limits = limits
+		return self._limits
+
+	@staticmethod
+	def extend_limits(limits, bounds):
+		limits[0] = min(bounds[0], limits[0])
+		limits[1] = min(bounds[1], limits[1])
+		limits[2] = max(bounds[2], limits[2])
+		limits[3] = max(bounds[3], limits[3])
+
+	def remove(self, item):
+		if isinstance(item, Proformer):
+			self._patterns.pop(item, None)
+			self._dirty_patterns.discard(item)
+			self._limits = None
+			return
+		bounds = self._bounds.get(item, None)
+		if self._limits is not None and bounds is not None and self.is_limits_item(item):
+			limits = self._limits
+			if bounds[0] <= limits[0] or bounds[1] <= limits[1] or bounds[2] >= limits[2] or bounds[3] >= limits[3]:
+				self._limits = None
+		cells = self._item_cells.pop(item, None)
+		if cells is not None:
+			for cell in cells:
+				cell_items = self._cells.get(cell, None)
+				if cell_items is not None:
+					cell_items.discard(item)
+					if len(cell_items) == 0:
+						self._cells.pop(cell)
+		self._large_items.discard(item)
+		self._bounds.pop(item, None)
+		self._order.pop(item, None)
+		self._dirty.discard(item)
+		if isinstance(item, Area):
+			for areas in self._edge_areas.values():
+				areas.discard(item)
+		elif isinstance(item, Edge):
+			self._edge_areas.pop(item, None)
+
+	def rebuild(self):
+		self._limits = None
+		self._cells = {}
+		self._item_cells = {}
+		self._bounds = {}
+		self._large_items = set()
+		self._order = {}
+		self._counter = 0
+		self._dirty = set()
+		self._edge_areas = {}
+		self._patterns = {}
+		self._dirty_patterns = set()
+		items = []
+		items.extend(self._sketch.get_keypoints())
+		items.extend(self._sketch.get_edges())
+		items.extend(self._sketch.get_areas())
+		limits = [inf, inf, -inf, -inf]
+		for item in items:
+			bounds = self.get_item_bounds(item)
+			self._bounds[item] = bounds
+			if bounds is not None:
+				limits[0] = min(limits[0], bounds[0])
+				limits[1] = min(limits[1], bounds[1])
+				limits[2] = max(limits[2], bounds[2])
+				limits[3] = max(limits[3], bounds[3])
+		extent = max(limits[2] - limits[0], limits[3] - limits[1])
+		if extent > 0 and extent != inf:
+			self._cell_size = 2 * extent / max(1.0, sqrt(len(items)))
+		else:
+			self._cell_size = 1.0
+		for item in items:
+			self.insert(item, self._bounds[item])
+		for proformer in self._sketch.proformers:
+			self.insert_pattern(proformer)
+		self._rebuild_needed = False
+		self.notify_update(None)
+
+	def update(self):
+		if ChangeBatch.current is not None:
+			# The items added to or removed from the sketch in a batch are only known from the events of the sketch
+			ChangeBatch.current.deliver(self._sketch)
+		if self._rebuild_needed:
+			self.rebuild()
+		elif len(self._dirty) > 0 or len(self._dirty_patterns) > 0:
+			dirty = self._dirty
+			self._dirty = set()
+			# areas last as their bounds are made from the bounds of their edges
+			for item in sorted(dirty, key=lambda dirty_item: isinstance(dirty_item, Area)):
+				order = self._order.get(item, None)
+				self.remove(item)
+				self.insert(item, self.get_item_bounds(item), order)
+			dirty_patterns = self._dirty_patterns
+			self._dirty_patterns = set()
+			for proformer, pattern in self._patterns.items():
+				if not pattern[1].isdisjoint(dirty):
+					dirty_patterns.add(proformer)
+			for proformer in dirty_patterns:
+				self.insert_pattern(proformer)
+			self.notify_update(dirty | dirty_patterns)
+
+	def insert_pattern(self, proformer):
+		"""
+		Keeps the bounds of the copies of the base items of the proformer as an (n, k, 4) array for n copies of k base
+		items. The corners of the bounds of every base item are placed by all copy transforms at once, so the bounds of
+		a copied edge or area hold the copy and a copied key point is a point.
+		"""
+		self._limits = None
+		self._patterns.pop(proformer, None)
+		if proformer not in self._sketch.proformers:
+			return
+		bases = []
+		corners = []
+		limits_mask = []
+		for base in proformer.get_base_items():
+			bounds = self.get_item_bounds(base)
+			if bounds is None:
+				continue
+			bases.append(base)
+			corners.append([[bounds[0], bounds[1]], [bounds[2], bounds[1]], [bounds[2], bounds[3]], [bounds[0], bounds[3]]])
+			limits_mask.append(self.is_limits_item(base))
+		if len(bases) == 0 or proformer.get_copy_count() == 0:
+			return
+		points = proformer.transform_points(np.reshape(corners, (-1, 2))).reshape(-1, len(bases), 4, 2)
+		bounds = np.concatenate((points.min(axis=2), points.max(axis=2)), axis=2)
+		self._patterns[proformer] = (bases, set(bases), bounds, np.array(limits_mask, dtype=bool))
+
+	def insert(self, item, bounds, order=None):
+		if order is None:
+			order = self._counter
+			self._counter += 1
+		self._order[item] = order
+		self._bounds[item] = bounds
+		if self._limits is not None and bounds is not None and self.is_limits_item(item):
+			self.extend_limits(self._limits, bounds)
+		if isinstance(item, Area):
+			for edge in self.get_area_edges(item):
+				self._edge_areas.setdefault(edge, set()).add(item)
+		if bounds is None:
+			self._large_items.add(item)
+			return
+		ix1, iy1 = self.get_cell(bounds[0], bounds[1])
+		ix2, iy2 = self.get_cell(bounds[2], bounds[3])
+		if (ix2 - ix1 + 1) * (iy2 - iy1 + 1) > SpatialIndex.max_cells_per_item:
+			self._large_items.add(item)
+			return
+		cells = []
+		for ix in range(ix1, ix2 + 1):
+			for iy in range(iy1, iy2 + 1):
+				self._cells.setdefault((ix, iy), set()).add(item)
+				cells.append((ix, iy))
+		self._item_cells[item] = cells
+
+	def get_cell(self, x, y):
+		return int(floor(x / self._cell_size)), int(floor(y / self._cell_size))
+
+	@staticmethod
+	def get_area_edges(area):
+		try:
+			return [edge for edge in area.get_edges() if edge is not None]
+		except (AttributeError, IndexError):
+			return []
+
+	def get_item_bounds(self, item):
+		try:
+			if isinstance(item, KeyPoint):
+				return [item.x, item.y, item.x, item.y]
+			elif isinstance(item, Edge):
+				return self.get_edge_bounds(item)
+			elif isinstance(item, Area):
+				bounds = None
+				for edge in self.get_area_edges(item):
+					edge_bounds = self._bounds.get(edge, None)
+					if edge_bounds is None:
+						edge_bounds = self.get_edge_bounds(edge)
+					if edge_bounds is None:
+						return None
+					if bounds is None:
+						bounds = list(edge_bounds)
+					else:
+						bounds = [min(bounds[0], edge_bounds[0]), min(bounds[1], edge_bounds[1]),
+											max(bounds[2], edge_bounds[2]), max(bounds[3], edge_bounds[3])]
+				return bounds
+		except (AttributeError, IndexError, KeyError, TypeError, ZeroDivisionError):
+			pass
+		return None
+
+	@staticmethod
+	def get_edge_bounds(edge):
+		kps = edge.get_keypoints()
+		if edge.type == EdgeType.ArcEdge or edge.type == EdgeType.CircleEdge:
+			r = abs(edge.get_meta_data('r'))
+			return [kps[0].x - r, kps[0].y - r, kps[0].x + r, kps[0].y + r]
+		if edge.type == EdgeType.FilletLineEdge:
+			draw_data = edge.get_draw_data()
+			if 'rect' in draw_data:
+				rect = draw_data['rect']
+				return [rect[0], rect[1] - rect[3], rect[0] + rect[2], rect[1]]
+		xs = [kp.x for kp in kps]
+		ys = [kp.y for kp in kps]
+		return [min(xs), min(ys), max(xs), max(ys)]
+
+	def get_candidates(self, x1, y1, x2, y2):
+		self.update()
+		ix1, iy1 = self.get_cell(x1, y1)
+		ix2, iy2 = self.get_cell(x2, y2)
+		if (ix2 - ix1 + 1) * (iy2 - iy1 + 1) > len(self._cells):
+			candidates = set(self._bounds.keys())
+		else:
+			candidates = set(self._large_items)
+			for ix in range(ix1, ix2 + 1):
+				for iy in range(iy1, iy2 + 1):
+					cell_items = self._cells.get((ix, iy), None)
+					if cell_items is not None:
+						candidates.update(cell_items)
+		result = []
+		for item in candidates:
+			bounds = self._bounds[item]
+			if bounds is None or (bounds[0] <= x2 and bounds[2] >= x1 and bounds[1] <= y2 and bounds[3] >= y1):
+				result.append(item)
+		result.sort(key=lambda item: self._order[item])
+		return result
+
+	def get_pattern_candidates(self, x1, y1, x2, y2):
+		"""
+		Returns the pending copies whose bounds overlap the rectangle, as ProformerCopy items.
+		"""
+		self.update()
+		copies = []
+		for proformer, (bases, base_set, bounds, limits_mask) in self._patterns.items():
+			overlap = (bounds[:, :, 0] <= x2) & (bounds[:, :, 2] >= x1) & (bounds[:, :, 1] <= y2) & (bounds[:, :, 3] >= y1)
+			for i, j in zip(*np.nonzero(overlap)):
+				copy = ProformerCopy(proformer, bases[j], int(i))
+				if copy.is_current():
+					copies.append(copy)
+		return copies
+
+	def is_current(self, item):
+		if isinstance(item, ProformerCopy):
+			return item.is_current()
+		if isinstance(item, KeyPoint):
+			return self._sketch.get_keypoint(item.uid) is item
+		elif isinstance(item, Edge):
+			return self._sketch.get_edge(item.uid) is item
+		return self._sketch.get_area(item.uid) is item
+
+	def get_items_in(self, x1, y1, x2, y2):
+		"""
+		Returns the current key points, edges and areas whose bounds overlap the rectangle, in the order they were added,
+		followed by the pending copies of proformers as ProformerCopy items.
+		"""
+		items = [item for item in self.get_candidates(x1, y1, x2, y2) if self.is_current(item)]
+		items.extend(self.get_pattern_candidates(x1, y1, x2, y2))
+		return items
+
+	@staticmethod
+	def get_copy_point(copy):
+		return copy.proformer.get_coordinate(copy.base.x, copy.base.y, copy.index)
+
+	def get_key_points_near(self, x, y, tolerance):
+		"""
+		Returns the key points within +/- tolerance of (x, y). Pending copies of key points are given as ProformerCopy
+		items, they are not created here.
+		"""
+		kps = []
+		for item in self.get_candidates(x - tolerance, y - tolerance, x + tolerance, y + tolerance):
+			if isinstance(item, KeyPoint) and abs(item.x - x) < tolerance and abs(item.y - y) < tolerance:
+				if self.is_current(item):
+					kps.append(item)
+		for copy in self.get_pattern_candidates(x - tolerance, y - tolerance, x + tolerance, y + tolerance):
+			if isinstance(copy.base, KeyPoint):
+				kps.append(copy)
+		return kps
+
+	def find_key_point(self, x, y, tolerance):
+		"""
+		Finds the key point closest to (x, y) within a square of +/- tolerance. A copy that has not been created is
+		given as a ProformerCopy, so hovering does not create it.
+		:return: the key point, a ProformerCopy or None
+		"""
+		closest_kp = None
+		smallest_dist = inf
+		for kp in self.get_key_points_near(x, y, tolerance):
+			if isinstance(kp, ProformerCopy):
+				kp_x, kp_y = self.get_copy_point(kp)
+			else:
+				kp_x, kp_y = kp.x, kp.y
+			dist = (kp_x - x) ** 2 + (kp_y - y) ** 2
+			if dist < smallest_dist:
+				smallest_dist = dist
+				closest_kp = kp
+		return closest_kp
+
+	def get_edges_near(self, x, y, distance):
+		"""
+		Returns the edges whose bounds are within distance of (x, y), the pending copies as ProformerCopy items.
+		"""
+		edges = []
+		for item in self.get_candidates(x - distance, y - distance, x + distance, y + distance):
+			if isinstance(item, Edge) and self.is_current(item):
+				edges.append(item)
+		for copy in self.get_pattern_candidates(x - distance, y - distance, x + distance, y + distance):
+			if isinstance(copy.base, Edge):
+				edges.append(copy)
+		return edges
+
+	def find_edge(self, x, y, max_distance, instance=None):
+		"""
+		Finds the edge closest to (x, y) among the edges whose bounds are within max_distance of the point. A copy
+		that has not been created is measured on its base edge, with the point moved back by the copy transform, and
+		given as a ProformerCopy.
+		:return: tuple of the edge, a ProformerCopy or None and the distance
+		"""
+		closest_edge = None
+		smallest_dist = inf
+		point = Vector3(x, y, 0)
+		for edge in self.get_edges_near(x, y, max_distance):
+			if isinstance(edge, ProformerCopy):
+				base_x, base_y = edge.get_base_point(x, y)
+				dist = edge.base.distance(Vector3(base_x, base_y, 0), instance)
+			else:
+				dist = edge.distance(point, instance)
+			if dist < smallest_dist:
+				smallest_dist = dist
+				closest_edge = edge
+		return closest_edge, smallest_dist
+
+	def get_areas_at(self, x, y):
+		"""
+		Returns the areas that (x, y) is inside. The copies that have not been created are tested on their base area
+		and given as ProformerCopy items.
+		"""
+		areas = []
+		point = Vector3(x, y, 0)
+		for item in self.get_candidates(x, y, x, y):
+			if isinstance(item, Area) and self.is_current(item):
+				if item.inside(point):
+					areas.append(item)
+		for copy in self.get_pattern_candidates(x, y, x, y):
+			if isinstance(copy.base, Area):
+				base_x, base_y = copy.get_base_point(x, y)
+				if copy.base.inside(Vector3(base_x, base_y, 0)):
+					areas.append(copy)
+		return areas
@@ -4,8 +4,9 @@ from math import *
 from Data.Edges import *
 from Data.Events import *
 from Data.Nurbs import NurbsSurface
-from Data.Vertex import Vertex
+from Data.NurbsBackend import get_nurbs_backend
 from Data.Objects import *
+from Data.Triangulation import triangulate_polygon
 
 
 def fsign(value):
@@ -82,53 +83,6 @@ class Surface(ObservableObject, IdObject):
 		self._sweep_axis = axis
 		axis.add_change_handler(self.on_edge_changed)
 
-	def find_angles(self, kps, norm):
-		angles = []
-		total_angle = 0
-		angles.append(kps[0].angle_between3d_planar(kps[1], kps[len(kps) - 1], norm))
-		if angles[0] < 0:
-			total_angle += 2 * pi + angles[0]
-		else:
-			total_angle += angles[0]
-		for i in range(1, len(kps) - 1):
-			angle = kps[i].angle_between3d_planar(kps[i + 1], kps[i - 1], norm)
-			angles.append(angle)
-			if angle < 0:
-				total_angle += 2 * pi + angle
-			else:
-				total_angle += angle
-		angle = kps[len(kps) - 1].angle_between3d_planar(kps[0], kps[len(kps) - 2], norm)
-		angles.append(angle)
-		if angle < 0:
-			total_angle += 2 * pi + angle
-		else:
-			total_angle += angle
-		sss = total_angle / (len(kps) - 2)
-		is_positive = abs(sss) - pi < 0.001
-		concaves = []
-		for i in range(len(angles)):
-			angle = angles[i]
-			is_p_a = angle >= 0
-			if is_p_a != is_positive:
-				concaves.append(i)
-		return angles, concaves, total_angle
-
-	def get_triangles_of_convex(self, kps, triangles):
-		sw = True
-		st_c = 0
-		en_c = len(kps) - 1
-		while st_c - en_c <= 1:
-			p1 = kps[st_c].xyz
-			p2 = kps[en_c].xyz
-			if sw:
-				st_c += 1
-				p3 = kps[st_c].xyz
-			else:
-				en_c -= 1
-				p3 = kps[en_c].xyz
-			sw = not sw
-			triangles.extend([p1, p2, p3])
-
 	def get_faces_normals(self):
 		if self._triangles is None:
 			if self._surface_type == Surface.FlatSurface:
@@ -222,14 +176,11 @@ class Surface(ObservableObject, IdObject):
 				cps.append(kp.xyz)
 			controls.append(cps)
 		ns.set_controls(controls)
-		verts_matrix = []
 		i_count = len(controls) * 10
 		j_count = len(controls[0]) * 10
-		for i in range(i_count):
-			verts_array = []
-			for j in range(j_count):
-				verts_array.append(ns.S(i / (i_count - 1), j / (j_count - 1)))
-			verts_matrix.append(verts_array)
+		us = np.linspace(0.0, 1.0, i_count)
+		vs = np.linspace(0.0, 1.0, j_count)
+		verts_matrix = get_nurbs_backend().evaluate_surface_grid(ns, us, vs)
 		for i in range(1, i_count):
 			for j in range(1, j_count):
 				v1 = verts_matrix[i - 1][j - 1]
@@ -332,122 +283,68 @@ class Surface(ObservableObject, IdObject):
 			n1 = n2
 		return triangles, normals
 
-	def get_flat_surface_triangles(self):
-		triangles = []
-		normals = []
-		kps = []
-		if len(self._main_edge_loop) == 0:
-			return triangles
-		remaining_edges = list(self._main_edge_loop)
-		first_edge = self._main_edge_loop[0]
-		remaining_edges.remove(first_edge)
-		first_kp = first_edge.get_end_key_points()[0]
-		next_kp = first_edge.get_end_key_points()[1]
-		kps.append(first_kp)
-		kps.append(next_kp)
+	def get_arc_points(self, edge, start_xyz):
+		"""
+		Tessellates an arc edge from the end nearest to start_xyz. The start point itself is not included.
+		"""
+		plane = edge.plane
+		r = edge.get_meta_data('r')
+		sa = edge.get_meta_data('sa')
+		ea = edge.get_meta_data('ea')
+		c = edge.get_keypoints()[0].xyz + plane.get_global_xyz(0, 0, 0)
+		pm = plane.get_global_projection_matrix()
+		ends = c + r * np.outer([cos(sa), cos(ea)], pm[:, 0]) + r * np.outer([sin(sa), sin(ea)], pm[:, 1])
+		if np.linalg.norm(start_xyz - ends[0]) > np.linalg.norm(start_xyz - ends[1]):
+			sa, ea = ea, sa
+		span = ea - sa
+		divisions = max(int(abs(span * 10)), 1)
+		angles = sa + span * np.arange(1, divisions + 1) / divisions
+		return c + r * np.outer(np.cos(angles), pm[:, 0]) + r * np.outer(np.sin(angles), pm[:, 1])
+
+	def get_loop_points(self, edges_loop):
+		"""
+		Follows the edges of a loop and returns the points around it as an (n, 3) array. Arc edges are tessellated.
+		"""
+		if len(edges_loop) == 0:
+			return np.zeros((0, 3))
+		remaining_edges = list(edges_loop)
+		first_edge = remaining_edges.pop(0)
+		ekps = first_edge.get_end_key_points()
+		first_xyz = ekps[0].xyz
+		next_xyz = ekps[1].xyz
+		points = [first_xyz[np.newaxis, :], next_xyz[np.newaxis, :]]
 		while len(remaining_edges) > 0:
-			edge_found = None
-			for edge in remaining_edges:
-				ekps = edge.get_end_key_points()
-				if abs(np.linalg.norm(ekps[0].xyz - next_kp.xyz)) < 0.000001:
-					next_kp = ekps[1]
-					edge_found = edge
+			edge = None
+			for candidate in remaining_edges:
+				ekps = candidate.get_end_key_points()
+				if np.linalg.norm(ekps[0].xyz - next_xyz) < 0.000001:
+					next_xyz = ekps[1].xyz
+					edge = candidate
 					break
-				elif abs(np.linalg.norm(ekps[1].xyz - next_kp.xyz)) < 0.000001:
-					next_kp = ekps[0]
-					edge_found = edge
+				elif np.linalg.norm(ekps[1].xyz - next_xyz) < 0.000001:
+					next_xyz = ekps[0].xyz
+					edge = candidate
 					break
-			if edge_found is None:
-				next_kp = ekps[1]
+			if edge is None:
+				edge = remaining_edges[-1]
+				next_xyz = edge.get_end_key_points()[1].xyz
 			remaining_edges.remove(edge)
 			if edge.type is EdgeType.ArcEdge:
-				plane = edge.plane
-				r = edge.get_meta_data('r')
-				sa = edge.get_meta_data('sa')
-				ea = edge.get_meta_data('ea')
-				c = edge.get_keypoints()[0]
-				cc = c.xyz + plane.get_global_xyz(cos(sa) * r, sin(sa) * r, 0)
-				ln1 = np.linalg.norm(kps[len(kps) - 1].xyz - cc)
-				cc = c.xyz + plane.get_global_xyz(cos(ea) * r, sin(ea) * r, 0)
-				ln2 = np.linalg.norm(kps[len(kps) - 1].xyz - cc)
-				if ln1 > ln2:
-					dum = ea
-					ea = sa
-					sa = dum
-				span = ea - sa
-				divisions = max(int(abs(span * 10)),1)
-				increment = span / divisions
-				for i in range(1, divisions + 1):
-					x = cos(sa + increment * i) * r
-					y = sin(sa + increment * i) * r
-					z = 0
-					cc = c.xyz + plane.get_global_xyz(x, y, z)
-					x = cc[0]
-					y = cc[1]
-					z = cc[2]
-					kps.append(Vertex(x, y, z))
-				next_kp = kps[len(kps) - 1]
-			elif abs(np.linalg.norm(next_kp.xyz - first_kp.xyz)) > 0.000001:  # next_kp is not first_kp:
-				if abs(np.linalg.norm(next_kp.xyz - kps[len(kps) - 1].xyz)) > 0.000001:
-					kps.append(next_kp)
-		v1 = kps[0].xyz - kps[1].xyz
-		try:
-			v2 = kps[2].xyz - kps[1].xyz
-		except IndexError as e:
-			print("weeeeaaaaargfh")
-		if len(kps) < 3:
-			return triangles
-		cp = np.cross(v1, v2)
-		norm = cp / np.linalg.norm(cp)
-
-		angles, concaves, total_angle = self.find_angles(kps, norm)
-
-		remaining_kps = list(kps)
-		while len(concaves) > 0 and len(remaining_kps) > 3:
-			sharpest_convex = 1e10
-			m = 0
-			for i in range(len(angles)):
-				if i not in concaves:
-					if abs(sharpest_convex) > abs(angles[i]):
-						sharpest_convex = angles[i]
-						m = i
-			p1 = remaining_kps[m].xyz
-			if m < 1:
-				o = len(remaining_kps) - 1
-			else:
-				o = m - 1
-			p2 = remaining_kps[o].xyz
-			if m + 1 >= len(remaining_kps):
-				n = 0
+				arc_points = self.get_arc_points(edge, points[-1][-1])
+				points.append(arc_points)
+				next_xyz = arc_points[-1]
 			else:
-				n = m + 1
-			p3 = remaining_kps[n].xyz
-			# if n not in concaves and o not in concaves:
-			triangles.extend([p1, p2, p3])
-			remaining_kps.pop(m)
-			angles, concaves, total_angle = self.find_angles(remaining_kps, norm)
-
-		if len(remaining_kps) > 2:
-			self.get_triangles_of_convex(remaining_kps, triangles)
-
-		v1 = triangles[0]
-		v2 = triangles[1]
-		v3 = triangles[2]
-		cp = np.cross(v2 - v1, v3 - v1)
-		nm = np.linalg.norm(cp)
-		if nm != 0:
-			n = cp / nm
-		else:
-			v1 = triangles[3]
-			v2 = triangles[4]
-			v3 = triangles[5]
-			cp = np.cross(v2 - v1, v3 - v1)
-			nm = np.linalg.norm(cp)
-			n = cp / nm
-		for i in range(0, len(triangles), 3):
-			normals.append(n)
-			normals.append(n)
-			normals.append(n)
+				points.append(next_xyz[np.newaxis, :])
+		points = np.vstack(points)
+		# Remove repeated points and the closing point that equals the first
+		keep = np.linalg.norm(points - np.roll(points, 1, axis=0), axis=1) > 0.000001
+		return points[keep]
+
+	def get_flat_surface_triangles(self):
+		outer = self.get_loop_points(self._main_edge_loop)
+		holes = [self.get_loop_points(loop) for loop in self._cutting_edges_loops]
+		triangles, normal = triangulate_polygon(outer, holes)
+		normals = np.repeat(normal[np.newaxis, :], len(triangles), axis=0)
 		return triangles, normals
 
 	def set_main_edges(self, edges_loop):
@@ -498,3 +395,6 @@ class Surface(ObservableObject, IdObject):
 
 	def add_cutting_edges_loop(self, cutting_edges_loop):
 		self._cutting_edges_loops.append(cutting_edges_loop)
+		for edge in cutting_edges_loop:
+			edge.add_change_handler(self.on_edge_changed)
+		self._triangles = None
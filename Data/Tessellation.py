@@ -0,0 +1,100 @@
+from math import acos, ceil, pi
+
+import numpy as np
+
+from Data.Edges import EdgeDrawDataType, EdgeType
+from Data.Vertex import VertexArray
+
+__author__ = 'mamj'
+
+chord_tolerance = 0.0001
+max_segments = 360
+
+
+def get_segment_count(radius, span, tolerance=chord_tolerance):
+	"""
+	Number of straight segments needed for an arc so no chord is further than tolerance from the arc.
+	"""
+	radius = abs(radius)
+	span = abs(span)
+	if radius <= tolerance or span == 0:
+		return 1
+	segment_angle = 2 * acos(1 - tolerance / radius)
+	return int(min(max(ceil(span / segment_angle), ceil(span / (pi / 2))), max_segments))
+
+
+def get_arc_points(center, radius, start_angle, span, tolerance=chord_tolerance):
+	"""
+	Returns an (n, 3) array of local points along an arc in the xy plane.
+	"""
+	count = get_segment_count(radius, span, tolerance)
+	angles = np.linspace(start_angle, start_angle + span, count + 1)
+	points = np.empty((count + 1, 3))
+	points[:, 0] = center[0] + np.cos(angles) * radius
+	points[:, 1] = center[1] + np.sin(angles) * radius
+	points[:, 2] = center[2]
+	return points
+
+
+def get_segments(points):
+	"""
+	Turns a polyline of n points into 2 * (n - 1) points, where every pair is a line segment.
+	"""
+	if len(points) < 2:
+		return np.zeros((0, 3), dtype=np.float32)
+	segments = np.empty((2 * (len(points) - 1), 3), dtype=np.float32)
+	segments[0::2] = points[:-1]
+	segments[1::2] = points[1:]
+	return segments
+
+
+def to_global(points, origin, pm):
+	return np.asarray(origin) + np.asarray(points).dot(np.asarray(pm).T)
+
+
+def tessellate_draw_data(draw_data, origin, pm, tolerance=chord_tolerance):
+	"""
+	Tessellates the draw data of a sketch edge into line segments placed with the origin and projection matrix of
+	a plane.
+	:return: (n, 3) float32 array where every pair of points is a line segment
+	"""
+	draw_type = draw_data['type']
+	if draw_type == EdgeDrawDataType.Line:
+		c = draw_data['coords']
+		points = np.array([c[0].xyz, c[1].xyz])
+	elif draw_type == EdgeDrawDataType.Arc:
+		c = draw_data['c']
+		points = get_arc_points([c.x, c.y, 0], draw_data['r'], draw_data['sa'], draw_data['span'], tolerance)
+	elif draw_type == EdgeDrawDataType.Circle:
+		c = draw_data['c']
+		points = get_arc_points([c.x, c.y, 0], draw_data['r'], 0, 2 * pi, tolerance)
+	elif draw_type == EdgeDrawDataType.Lines:
+		points = VertexArray.from_vertices(draw_data['coords']).xyz
+	else:
+		return np.zeros((0, 3), dtype=np.float32)
+	if len(points) < 2:
+		return np.zeros((0, 3), dtype=np.float32)
+	return get_segments(to_global(points, origin, pm))
+
+
+def tessellate_edge(edge, tolerance=chord_tolerance):
+	"""
+	Tessellates a three dimensional line or arc edge, like the edges generated by a part, into line segments.
+	:return: (n, 3) float32 array where every pair of points is a line segment
+	"""
+	if edge.type == EdgeType.LineEdge:
+		kps = edge.get_end_key_points()
+		return get_segments(np.array([kps[0].xyz, kps[1].xyz]))
+	if edge.type == EdgeType.ArcEdge:
+		c = edge.get_keypoints()[0]
+		start_angle = edge.get_meta_data("sa")
+		span = edge.get_meta_data("ea") - start_angle
+		points = get_arc_points([0, 0, 0], edge.get_meta_data("r"), start_angle, span, tolerance)
+		return get_segments(to_global(points, c.xyz, edge.plane.get_global_projection_matrix()))
+	return np.zeros((0, 3), dtype=np.float32)
+
+
+def pack_segments(segment_arrays):
+	if len(segment_arrays) == 0:
+		return np.zeros((0, 3), dtype=np.float32)
+	return np.concatenate(segment_arrays).astype(np.float32, copy=False)
@@ -0,0 +1,229 @@
+import numpy as np
+
+__author__ = 'mamj'
+
+epsilon = 1e-12
+
+
+def polygon_normal(points):
+	"""
+	Finds the normal of a planar polygon with Newell's method. The normal points to the side the polygon is
+	counter clockwise around.
+	"""
+	p = np.asarray(points, dtype=np.float64)
+	q = np.roll(p, -1, axis=0)
+	n = np.array([
+		np.sum((p[:, 1] - q[:, 1]) * (p[:, 2] + q[:, 2])),
+		np.sum((p[:, 2] - q[:, 2]) * (p[:, 0] + q[:, 0])),
+		np.sum((p[:, 0] - q[:, 0]) * (p[:, 1] + q[:, 1]))
+	])
+	length = np.linalg.norm(n)
+	if length == 0:
+		return n
+	return n / length
+
+
+def plane_basis(normal):
+	"""
+	Returns two unit vectors that together with the normal form a right handed coordinate system.
+	"""
+	if abs(normal[0]) < 0.9:
+		u = np.cross(normal, [1.0, 0.0, 0.0])
+	else:
+		u = np.cross(normal, [0.0, 1.0, 0.0])
+	u /= np.linalg.norm(u)
+	v = np.cross(normal, u)
+	return u, v
+
+
+def signed_area(points2d):
+	x = points2d[:, 0]
+	y = points2d[:, 1]
+	return 0.5 * np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y)
+
+
+def _cross(a, b, c):
+	return (b[..., 0] - a[..., 0]) * (c[..., 1] - a[..., 1]) - (b[..., 1] - a[..., 1]) * (c[..., 0] - a[..., 0])
+
+
+def _points_in_triangle(points, a, b, c):
+	"""
+	Vectorized test of which of the points are inside or on the border of the counter clockwise triangle a, b, c.
+	"""
+	return (_cross(a, b, points) >= -epsilon) & (_cross(b, c, points) >= -epsilon) & (_cross(c, a, points) >= -epsilon)
+
+
+def _locally_inside(prev, point, next, other):
+	"""
+	Tells if the direction from point to other is inside the corner of a counter clockwise polygon at point.
+	"""
+	left_of_next = _cross(point, next, other) >= 0
+	left_of_prev = _cross(prev, point, other) >= 0
+	if _cross(prev, point, next) > 0:
+		return left_of_next and left_of_prev
+	return left_of_next or left_of_prev
+
+
+def bridge_holes(points2d, outer, holes):
+	"""
+	Joins the holes into the outer loop with two way bridges, so the result can be triangulated as one simple polygon.
+	The outer loop must be counter clockwise and the holes clockwise. The holes are joined from the one reaching
+	furthest in the x direction.
+	:return: list of point indexes of the joined loop
+	"""
+	loop = list(outer)
+	holes = sorted(holes, key=lambda hole: -np.max(points2d[hole, 0]))
+	for hole in holes:
+		hole = list(hole)
+		m_local = int(np.argmax(points2d[hole, 0]))
+		m = hole[m_local]
+		mx, my = points2d[m]
+		loop_array = np.array(loop)
+		a = points2d[loop_array]
+		b = points2d[np.roll(loop_array, -1)]
+		# Cast a ray from m in the x direction and find the closest edge it hits
+		crosses = ((a[:, 1] <= my) & (b[:, 1] > my)) | ((b[:, 1] <= my) & (a[:, 1] > my))
+		dy = b[:, 1] - a[:, 1]
+		dy[dy == 0] = epsilon
+		xs = a[:, 0] + (my - a[:, 1]) * (b[:, 0] - a[:, 0]) / dy
+		crosses &= xs >= mx
+		if not np.any(crosses):
+			loop_index = int(np.argmin(np.sum((a - points2d[m]) ** 2, axis=1)))
+		else:
+			hits = np.flatnonzero(crosses)
+			hit = hits[np.argmin(xs[hits])]
+			hit_point = np.array([xs[hit], my])
+			if a[hit, 0] > b[hit, 0]:
+				loop_index = hit
+			else:
+				loop_index = (hit + 1) % len(loop)
+			# Any loop point inside the triangle m, hit point, candidate would block the bridge, in that case the
+			# one with the smallest angle to the ray is used
+			candidate = points2d[loop[loop_index]]
+			tri = [points2d[m], hit_point, candidate]
+			if _cross(tri[0], tri[1], tri[2]) < 0:
+				tri = [tri[0], tri[2], tri[1]]
+			inside = _points_in_triangle(a, tri[0], tri[1], tri[2])
+			inside[loop_index] = False
+			inside &= (a[:, 0] != candidate[0]) | (a[:, 1] != candidate[1])
+			if np.any(inside):
+				blocking = np.flatnonzero(inside)
+				delta = a[blocking] - points2d[m]
+				angles = np.abs(np.arctan2(delta[:, 1], delta[:, 0]))
+				loop_index = int(blocking[np.lexsort((np.sum(delta ** 2, axis=1), angles))[0]])
+		# Bridge ends can be in the loop more than once, the bridge must leave from the one it is inside the corner of
+		target = a[loop_index]
+		for index in np.flatnonzero((a[:, 0] == target[0]) & (a[:, 1] == target[1])):
+			if _locally_inside(a[index - 1], a[index], b[index], points2d[m]):
+				loop_index = int(index)
+				break
+		hole_loop = hole[m_local:] + hole[:m_local + 1]
+		loop[loop_index + 1:loop_index + 1] = hole_loop + [loop[loop_index]]
+	return loop
+
+
+def ear_clip(points2d, loop):
+	"""
+	Triangulates the counter clockwise simple polygon given by the point indexes in loop. The vertexes are kept in a
+	linked list together with the set of reflex vertexes, so only the neighbours of a clipped ear are tested again
+	and each ear test only checks the remaining reflex vertexes.
+	:return: array of counter clockwise index triangles
+	"""
+	count = len(loop)
+	if count < 3:
+		return np.zeros((0, 3), dtype=np.int64)
+	loop = np.asarray(loop)
+	pts = points2d[loop]
+	prev = np.roll(np.arange(count), 1)
+	next = np.roll(np.arange(count), -1)
+	convex = _cross(pts[prev], pts, pts[next]) > epsilon
+	reflex = set(np.flatnonzero(~convex).tolist())
+	triangles = []
+
+	def is_ear(i):
+		if not convex[i]:
+			return False
+		if len(reflex) == 0:
+			return True
+		p, n = prev[i], next[i]
+		candidates = np.fromiter(reflex, dtype=np.int64, count=len(reflex))
+		candidate_points = pts[candidates]
+		inside = _points_in_triangle(candidate_points, pts[p], pts[i], pts[n])
+		if not np.any(inside):
+			return True
+		# Points shared with the triangle corners, like the ends of hole bridges, do not block the ear
+		corners = pts[[p, i, n]]
+		shared = np.any(np.all(candidate_points[:, None, :] == corners[None, :, :], axis=2), axis=1)
+		return not np.any(inside & ~shared)
+
+	def unlink(i):
+		p, n = prev[i], next[i]
+		next[p] = n
+		prev[n] = p
+		reflex.discard(i)
+		for j in (p, n):
+			convex[j] = _cross(pts[prev[j]], pts[j], pts[next[j]]) > epsilon
+			if convex[j]:
+				reflex.discard(j)
+			else:
+				reflex.add(j)
+		return n
+
+	remaining = count
+	i = 0
+	misses = 0
+	while remaining > 3:
+		p, n = prev[i], next[i]
+		if abs(_cross(pts[p], pts[i], pts[n])) <= epsilon:
+			# Collinear vertexes are dropped without a triangle
+			i = unlink(i)
+			remaining -= 1
+			misses = 0
+		elif is_ear(i) or misses > remaining:
+			# If a whole round has passed without an ear the polygon is degenerate, the vertex is clipped anyway
+			triangles.append((loop[p], loop[i], loop[n]))
+			i = unlink(i)
+			remaining -= 1
+			misses = 0
+		else:
+			misses += 1
+			i = next[i]
+	p, n = prev[i], next[i]
+	if abs(_cross(pts[p], pts[i], pts[n])) > epsilon:
+		triangles.append((loop[p], loop[i], loop[n]))
+	if len(triangles) == 0:
+		return np.zeros((0, 3), dtype=np.int64)
+	return np.array(triangles, dtype=np.int64)
+
+
+def triangulate_polygon(outer, holes=()):
+	"""
+	Triangulates a planar polygon in 3d with optional holes.
+	:param outer: (n, 3) array with the points of the outer loop
+	:param holes: list of (m, 3) arrays with the points of the hole loops
+	:return: tuple of a (t * 3, 3) array of triangle vertexes and the (3,) normal of the polygon
+	"""
+	outer = np.asarray(outer, dtype=np.float64)
+	if len(outer) < 3:
+		return np.zeros((0, 3)), np.zeros(3)
+	normal = polygon_normal(outer)
+	if not np.any(normal):
+		return np.zeros((0, 3)), normal
+	u, v = plane_basis(normal)
+	loops = [outer] + [np.asarray(hole, dtype=np.float64) for hole in holes if len(hole) > 2]
+	points = np.vstack(loops)
+	points2d = np.column_stack((points.dot(u), points.dot(v)))
+	start = len(outer)
+	outer_indexes = list(range(start))
+	if signed_area(points2d[:start]) < 0:
+		outer_indexes.reverse()
+	hole_indexes = []
+	for hole in loops[1:]:
+		indexes = list(range(start, start + len(hole)))
+		if signed_area(points2d[start:start + len(hole)]) > 0:
+			indexes.reverse()
+		hole_indexes.append(indexes)
+		start += len(hole)
+	loop = bridge_holes(points2d, outer_indexes, hole_indexes)
+	triangles = ear_clip(points2d, loop)
+	return points[triangles.reshape(-1)], normal
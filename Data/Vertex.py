@@ -13,15 +13,17 @@ class Vertex(object):
 		return np.linalg.norm(self.xyz)
 
 	def distance(self, other):
-		return np.linalg.norm(self.xyz - other.xyz)
+		dx = other.x - self.x
+		dy = other.y - self.y
+		dz = other.z - self.z
+		return sqrt(dx * dx + dy * dy + dz * dz)
 
 	@property
 	def angle(self):
 		return Vertex().angle_between3d_p(self, Vertex(1.0))
 
 	def angle2d(self, other):
-		diff = other.xyz - self.xyz
-		return atan2(diff[1], diff[0])
+		return atan2(other.y - self.y, other.x - self.x)
 
 	def angle3d(self, other):
 		diff = other.xyz - self.xyz
@@ -29,7 +31,7 @@ class Vertex(object):
 
 	def __add__(self, other):
 		if issubclass(type(other), Vertex):
-			return Vertex.from_xyz(self.xyz + other.xyz)
+			return Vertex.from_array(self.xyz + other.xyz)
 		elif hasattr(other, "__len__"):
 			if len(other) == 3:
 				return Vertex(self.x + other[0], self.y + other[1], self.z + other[2])
@@ -39,18 +41,20 @@ class Vertex(object):
 
 	def __truediv__(self, other):
 		if type(other) is float or type(other) is int:
-			return Vertex(self.x / other, self.y / other, self.z / other)
+			return Vertex.from_array(self.xyz / other)
 		else:
 			raise TypeError("Vertex can not be diveded by: " + str(other))
 
 	def __mul__(self, other):
 		if type(other) is float or type(other) is int:
-			return Vertex(self.x * other, self.y * other, self.z * other)
+			return Vertex.from_array(self.xyz * other)
 		else:
 			raise TypeError("Vertex can not be multiplied by: " + str(other))
 
 	def __sub__(self, other):
-		return Vertex(self.x-other.x, self.y-other.y, self.y-other.y)
+		if issubclass(type(other), Vertex):
+			return Vertex.from_array(self.xyz - other.xyz)
+		return Vertex(self.x - other.x, self.y - other.y, self.z - other.z)
 
 	def equals(self, other):
 		return self.x == other.x and self.y == other.y and self.z == other.z
@@ -89,6 +93,15 @@ class Vertex(object):
 	def from_xyz(xyz):
 		return Vertex(xyz[0], xyz[1], xyz[2])
 
+	@staticmethod
+	def from_array(xyz):
+		"""
+		Makes a vertex that takes over the float array xyz without copying it.
+		"""
+		vertex = Vertex.__new__(Vertex)
+		vertex.xyz = xyz
+		return vertex
+
 	@staticmethod
 	def deserialize(data):
 		vertex = Vertex()
@@ -151,3 +164,225 @@ class Vertex(object):
 		proj = m.dot(v2)
 		angle = atan2(proj[1], proj[0])
 		return angle
+
+
+class Vector3(object):
+	"""
+	Compact vertex with the coordinates in three float fields and no array behind them. It is cheap to create and has
+	in place operations, so it suits hot loops like hit tests and draw data where many short lived points are made.
+	It has the read api of Vertex, xyz gives a new array.
+	"""
+	__slots__ = ('x', 'y', 'z')
+
+	def __init__(self, x=0.0, y=0.0, z=0.0):
+		self.x = float(x)
+		self.y = float(y)
+		self.z = float(z)
+
+	@property
+	def xyz(self):
+		return np.array([self.x, self.y, self.z])
+
+	@xyz.setter
+	def xyz(self, value):
+		self.x = float(value[0])
+		self.y = float(value[1])
+		self.z = float(value[2])
+
+	def get_xyz(self):
+		return self.xyz
+
+	@property
+	def length(self):
+		return sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+
+	def distance(self, other):
+		dx = other.x - self.x
+		dy = other.y - self.y
+		dz = other.z - self.z
+		return sqrt(dx * dx + dy * dy + dz * dz)
+
+	def distance2d(self, x, y):
+		dx = x - self.x
+		dy = y - self.y
+		return sqrt(dx * dx + dy * dy)
+
+	def set(self, x, y, z=0.0):
+		self.x = x
+		self.y = y
+		self.z = z
+		return self
+
+	def copy(self):
+		return Vector3(self.x, self.y, self.z)
+
+	def to_vertex(self):
+		return Vertex(self.x, self.y, self.z)
+
+	def __add__(self, other):
+		return Vector3(self.x + other.x, self.y + other.y, self.z + other.z)
+
+	def __sub__(self, other):
+		return Vector3(self.x - other.x, self.y - other.y, self.z - other.z)
+
+	def __mul__(self, other):
+		return Vector3(self.x * other, self.y * other, self.z * other)
+
+	def __truediv__(self, other):
+		return Vector3(self.x / other, self.y / other, self.z / other)
+
+	def __neg__(self):
+		return Vector3(-self.x, -self.y, -self.z)
+
+	def __iadd__(self, other):
+		self.x += other.x
+		self.y += other.y
+		self.z += other.z
+		return self
+
+	def __isub__(self, other):
+		self.x -= other.x
+		self.y -= other.y
+		self.z -= other.z
+		return self
+
+	def __imul__(self, other):
+		self.x *= other
+		self.y *= other
+		self.z *= other
+		return self
+
+	def __itruediv__(self, other):
+		self.x /= other
+		self.y /= other
+		self.z /= other
+		return self
+
+	def __repr__(self):
+		return "Vector3(%s, %s, %s)" % (self.x, self.y, self.z)
+
+	@staticmethod
+	def from_xyz(xyz):
+		return Vector3(xyz[0], xyz[1], xyz[2])
+
+	angle2d = Vertex.angle2d
+	equals = Vertex.equals
+	serialize_json = Vertex.serialize_json
+	angle_between_untouched = Vertex.angle_between_untouched
+	angle_between = Vertex.angle_between
+	angle_between_positive_minimized = Vertex.angle_between_positive_minimized
+	angle_between3d_p = Vertex.angle_between3d_p
+	angle_between3d_planar = Vertex.angle_between3d_planar
+
+
+class VertexArray(object):
+	"""
+	Many vertexes as one (n, 3) float array, for operations on all of them at once. Indexing and iterating give
+	Vector3 copies, so a VertexArray can be used where a list of vertexes is expected.
+	"""
+	__slots__ = ('xyz',)
+
+	def __init__(self, xyz=None):
+		if xyz is None:
+			xyz = np.zeros((0, 3))
+		self.xyz = np.asarray(xyz, dtype=np.float64).reshape(-1, 3)
+
+	@staticmethod
+	def from_vertices(vertices):
+		if isinstance(vertices, VertexArray):
+			return vertices
+		return VertexArray([(v.x, v.y, v.z) for v in vertices])
+
+	def to_vertices(self):
+		return [Vertex(xyz[0], xyz[1], xyz[2]) for xyz in self.xyz.tolist()]
+
+	def __len__(self):
+		return len(self.xyz)
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return VertexArray(self.xyz[index])
+		xyz = self.xyz[index]
+		return Vector3(xyz[0], xyz[1], xyz[2])
+
+	def __iter__(self):
+		for xyz in self.xyz.tolist():
+			yield Vector3(xyz[0], xyz[1], xyz[2])
+
+	@property
+	def x(self):
+		return self.xyz[:, 0]
+
+	@property
+	def y(self):
+		return self.xyz[:, 1]
+
+	@property
+	def z(self):
+		return self.xyz[:, 2]
+
+	@staticmethod
+	def _operand(other):
+		if isinstance(other, VertexArray):
+			return other.xyz
+		if isinstance(other, (Vertex, Vector3)):
+			return np.array([other.x, other.y, other.z])
+		return other
+
+	def __add__(self, other):
+		return VertexArray(self.xyz + VertexArray._operand(other))
+
+	def __sub__(self, other):
+		return VertexArray(self.xyz - VertexArray._operand(other))
+
+	def __mul__(self, other):
+		return VertexArray(self.xyz * VertexArray._operand(other))
+
+	def __truediv__(self, other):
+		return VertexArray(self.xyz / VertexArray._operand(other))
+
+	def __iadd__(self, other):
+		self.xyz += VertexArray._operand(other)
+		return self
+
+	def __isub__(self, other):
+		self.xyz -= VertexArray._operand(other)
+		return self
+
+	def __imul__(self, other):
+		self.xyz *= VertexArray._operand(other)
+		return self
+
+	def __itruediv__(self, other):
+		self.xyz /= VertexArray._operand(other)
+		return self
+
+	def lengths(self):
+		return np.linalg.norm(self.xyz, axis=1)
+
+	def distances(self, point):
+		return np.linalg.norm(self.xyz - VertexArray._operand(point), axis=1)
+
+	def angles2d(self, point):
+		"""
+		Angles from point to every vertex in the xy plane, like point.angle2d(vertex) for each vertex.
+		"""
+		diff = self.xyz - VertexArray._operand(point)
+		return np.arctan2(diff[:, 1], diff[:, 0])
+
+	def transform(self, matrix, offset=None):
+		"""
+		Returns the vertexes multiplied by the (3, 3) matrix, like pm.dot(xyz) for each vertex, plus the offset.
+		"""
+		xyz = self.xyz.dot(np.asarray(matrix).T)
+		if offset is not None:
+			xyz += VertexArray._operand(offset)
+		return VertexArray(xyz)
+
+	def get_bounds(self):
+		"""
+		Returns the minimum and maximum corner as two arrays or None if the array is empty.
+		"""
+		if len(self.xyz) == 0:
+			return None
+		return self.xyz.min(axis=0), self.xyz.max(axis=0)
@@ -1,59 +1,72 @@
-__global const float *kn1;    // nurbs surface knots in dim 1
-__global const float *kn2;    // nurbs surface knots in dim 2
-__global const float *ctrls;  // nurbs surface controls
+#define MAX_DEGREE 8
 
-float N(__global const float *kn, const int i, const int n, const float u, const int size){
-  if (n == 0){
-    if (kn[i] <= u < self._knots[i + 1]){
-     return 1.0f;
-    }
-    else if (u == kn[i + 1] and i + 2 == len(self._knots)){
-      return 1.0f;
-    }
-    else
-      return 0.0;
+// Index of the knot span containing u. The last span is closed so u equal to the last knot is inside.
+int find_span(__global const double *kn, const int control_count, const int degree, const double u)
+{
+  for (int i = degree; i < control_count - 1; i++){
+    if (u < kn[i + 1])
+      return i;
   }
-  return f(i, n, u) * N(i, n - 1, u, size) + g(i + 1, n, u) * N(i + 1, n - 1, u, size);
-
-}
-float R(const int i, const int j, const int n, const float u, const float v){
-
-  //if !HAS_WEIGHTS:
-    return N(kn1, i, n, u) * N(kn2, j, n, v);
-  /*else:
-    float num = self._n1.N(i, n, u) * self._n2.N(j, n, v) * self._weights[i][j];
-    float denom = 0.0f;
-    for p in range(self._controls):
-      for q in range(self._controls[0]):
-        denom += self._n1.N(p, n, u) * self._n2.N(q, n, v) * self._weights[p][q]
-    return num / denom*/
+  return control_count - 1;
 }
 
-float S(const float u, const float v, const int us, const int vs){
-  float s = 0;
-  int n = 2; //DEGREE;
-  if (u == 1)
-    u = 0.999999999
-  if (v == 1)
-    v = 0.999999999
-  for (int i = 0; i < us; i++){
-    for (int j = 0; j < vs ; j++){
-      float P = ctrls[i + j*us];
-      s += R(i, j, n, u, v) * P;
+// The degree + 1 basis functions that are non zero in the span, N[span - degree] ... N[span].
+void basis_funs(__global const double *kn, const int span, const int degree, const double u, double *n)
+{
+  double left[MAX_DEGREE + 1];
+  double right[MAX_DEGREE + 1];
+  n[0] = 1.0;
+  for (int j = 1; j <= degree; j++){
+    left[j] = u - kn[span + 1 - j];
+    right[j] = kn[span + j] - u;
+    double saved = 0.0;
+    for (int r = 0; r < j; r++){
+      double denom = right[r + 1] + left[j - r];
+      double temp = denom != 0.0 ? n[r] / denom : 0.0;
+      n[r] = saved + right[r + 1] * temp;
+      saved = left[j - r] * temp;
     }
+    n[j] = saved;
   }
-  return s;
 }
 
-__kernel void nurbsSurf(__global const float *_kn1, __global const float *_kn2,
-                        __global const float *_ctrls, __global float *surf)
+// One work item per (u, v) pair. ctrls holds count1 x count2 xyz triples and weights count1 x count2 values,
+// both row major. surf receives len(us) x len(vs) xyz triples.
+__kernel void nurbs_surface(__global const double *kn1, __global const double *kn2, const int degree,
+                            __global const double *ctrls, __global const double *weights,
+                            const int count1, const int count2,
+                            __global const double *us, __global const double *vs, __global double *surf)
 {
-  int u = get_global_id(0);
-  int v = get_global_id(1);
-  int us = get_global_size(0);
-  int vs = get_global_size(1);
-  kn1 = _kn1;
-  kn2 = _kn2;
-  ctrls = _ctrls;
-  surf[v*us+u] = S((float)u, (float)v);
-}
\ No newline at end of file
+  int a = get_global_id(0);
+  int b = get_global_id(1);
+  int vs_count = get_global_size(1);
+  double u = us[a];
+  double v = vs[b];
+  double nu[MAX_DEGREE + 1];
+  double nv[MAX_DEGREE + 1];
+  int span_u = find_span(kn1, count1, degree, u);
+  int span_v = find_span(kn2, count2, degree, v);
+  basis_funs(kn1, span_u, degree, u, nu);
+  basis_funs(kn2, span_v, degree, v, nv);
+  double x = 0.0;
+  double y = 0.0;
+  double z = 0.0;
+  double w = 0.0;
+  for (int k = 0; k <= degree; k++){
+    int i = span_u - degree + k;
+    for (int l = 0; l <= degree; l++){
+      int index = i * count2 + span_v - degree + l;
+      double r = nu[k] * nv[l] * weights[index];
+      x += r * ctrls[index * 3];
+      y += r * ctrls[index * 3 + 1];
+      z += r * ctrls[index * 3 + 2];
+      w += r;
+    }
+  }
+  if (w == 0.0)
+    w = 1e-99;
+  int out = (a * vs_count + b) * 3;
+  surf[out] = x / w;
+  surf[out + 1] = y / w;
+  surf[out + 2] = z / w;
+}
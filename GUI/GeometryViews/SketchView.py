@@ -1,54 +1,101 @@
-from math import pi, cos, sin
+from math import pi, cos, sin, ceil, log2
 
 from PyQt5.QtCore import QRectF, QPointF, Qt
-from PyQt5.QtGui import QPainter, QPainterPath, QBrush, QColor, QTransform
+from PyQt5.QtGui import QPainter, QPainterPath, QBrush, QColor, QTransform, QPen, QPixmap
 
-from Data.Areas import CompositeArea
-from Data.Edges import EdgeDrawDataType, EdgeType, get_fillet_offset_distance
+from Data.Areas import Area, CompositeArea
+from Data.Edges import Edge, EdgeDrawDataType, EdgeType, get_fillet_offset_distance
+from Data.Point3d import KeyPoint
+from Data.Proformer import ProformerCopy
 from Data.Style import BrushType
-from Data.Vertex import Vertex
-from GUI.Widgets.NewDrawers import Limits, create_pens
+from Data.Vertex import Vertex, Vector3
+from GUI.Widgets.NewDrawers import Limits, get_pens, get_copy_transform
 
 sketch_views = {}
 
 
 class SketchViewInstance:
+	"""
+	Retained painter paths for the edges and areas of a sketch as seen through one instance. The paths are kept per
+	edge and area, and only those the spatial index of the sketch reports as changed are made again. Without an
+	instance the index is also used to skip the items outside the viewport of the painter.
+	"""
 	def __init__(self, sketch, instance_uid):
 		self._sketch = sketch
 		self._instance_uid = instance_uid
-		self._edges = {}
-		self._areas = {}
-		self._invalidated = True
-		sketch.add_change_handler(self.on_sketch_changed)
+		self._edge_paths = {}
+		self._area_paths = {}
+		self._kps = QPainterPath()
+		sketch.get_spatial_index().add_update_handler(self.on_index_updated)
 
 	@property
 	def instance(self):
 		return self._instance_uid
 
-
-	def on_sketch_changed(self, event):
-		self._invalidated = True
+	def on_index_updated(self, items):
+		if items is None:
+			self._edge_paths = {}
+			self._area_paths = {}
+		else:
+			for item in items:
+				self._edge_paths.pop(item.uid, None)
+				self._area_paths.pop(item.uid, None)
+
+	def get_visible_items(self, qp: QPainter):
+		"""
+		Returns the key points, edges and areas that may be visible in the viewport of the painter. The pending copies
+		of proformers are given as ProformerCopy items.
+		"""
+		index = self._sketch.get_spatial_index()
+		index.update()
+		if self._instance_uid is None:
+			transform, invertible = qp.transform().inverted()
+			if invertible:
+				rect = transform.mapRect(QRectF(qp.viewport()))
+				items = index.get_items_in(rect.left(), -rect.bottom(), rect.right(), -rect.top())
+				return self.split_items(items)
+		items = []
+		items.extend(self._sketch.get_keypoints())
+		items.extend(self._sketch.get_edges())
+		items.extend(self._sketch.get_areas())
+		for proformer in self._sketch.proformers:
+			items.extend(proformer.get_pending_copies())
+		return self.split_items(items)
+
+	@staticmethod
+	def split_items(items):
+		key_points = []
+		edges = []
+		areas = []
+		for item in items:
+			base = item.base if isinstance(item, ProformerCopy) else item
+			if isinstance(base, KeyPoint):
+				key_points.append(item)
+			elif isinstance(base, Edge):
+				edges.append(item)
+			elif isinstance(base, Area):
+				areas.append(item)
+		return key_points, edges, areas
 
 	def draw(self, qp: QPainter, pens, annotation_scale, show_area_names, show_keypoints):
-		if self._invalidated:
-			self.regenerate_paths()
+		key_points, edges, areas = self.get_visible_items(qp)
 
-		for area_uid in self._areas:
-			area = self._sketch.get_area(area_uid)
-			if area.brush is not None:
-				if area.brush.type == BrushType.Solid:
+		for area in areas:
+			base_area = area.base if isinstance(area, ProformerCopy) else area
+			if base_area.brush is not None:
+				if base_area.brush.type == BrushType.Solid:
 					brush = QBrush(QColor(0, 0, 0))
 				else:
 					brush = QBrush(QColor(0, 0, 0), Qt.HorPattern)
-				transform = QTransform().scale(annotation_scale, annotation_scale).rotate(area.brush_rotation)
+				transform = QTransform().scale(annotation_scale, annotation_scale).rotate(base_area.brush_rotation)
 				brush.setTransform(transform)
-				qp.fillPath(self._areas[area_uid], brush)
+				path = self.get_area_path(base_area)[0]
+				if base_area is not area:
+					path = get_copy_transform(area).map(path)
+				qp.fillPath(path, brush)
 
 		qp.setBrush(QBrush())
-		for pen_name in self._edges:
-			pen = pens[pen_name]
-			qp.setPen(pen)
-			qp.drawPath(self._edges[pen_name])
+		self.draw_edges(qp, pens, edges)
 
 		if show_keypoints:
 			qp.drawPath(self._kps)
@@ -56,70 +103,108 @@ class SketchViewInstance:
 		for sketch_instance in self._sketch.sketch_instances:
 			sketch_view = get_sketch_view(sketch_instance.sketch)
 			sioffset = sketch_instance.offset / sketch_instance.scale
-			instance_pens = create_pens(sketch_instance.sketch.document, annotation_scale * 5000 / sketch_instance.scale)
+			instance_pens = get_pens(sketch_instance.sketch.document, annotation_scale * 5000 / sketch_instance.scale)
 			sketch_view.draw_instance(qp, instance_pens, sketch_instance.scale, annotation_scale, sioffset, Vertex(), sketch_instance.rotation, sketch_instance.uid, show_area_names, show_keypoints)
 
-	def get_edge_path(self, pen_name):
-		if pen_name in self._edges:
-			return self._edges[pen_name]
-		else:
-			path = QPainterPath()
-			self._edges[pen_name] = path
-			return path
-
-	def regenerate_paths(self):
-		self._edges = {}
-		self._areas = {}
-		self._invalidated = False
-		for edge in self._sketch.get_edges():
-			draw_data = edge.get_draw_data(self._instance_uid)
-			path = self.get_edge_path(edge.style.uid)
-			coords = None
-			if 'coords' in draw_data:
-				coords = draw_data['coords']
-			if draw_data['type'] == EdgeDrawDataType.Line:
-				c1 = coords[0]
-				c2 = coords[1]
-				path.moveTo(c1.x, -c1.y)
-				path.lineTo(c2.x, -c2.y)
-			elif draw_data['type'] == EdgeDrawDataType.Lines:
-				c1 = coords[0]
-				path.moveTo(c1.x, -c1.y)
-				for i in range(1, len(coords)):
-					c2 = coords[i]
-					path.lineTo(c2.x, -c2.y)
-			elif draw_data['type'] == EdgeDrawDataType.Arc:
-				rect = draw_data["rect"]
-				start_angle = draw_data["sa"]
-				span = draw_data["span"]
-				radius = draw_data["r"]
-				c = draw_data["c"]
-				rect = QRectF(rect[0], -rect[1], rect[2], rect[3])
-				path.moveTo(c.x, -c.y)
-				path.arcMoveTo(rect, start_angle*180/pi)
-				path.arcTo(rect, start_angle*180/pi, span*180/pi)
-			elif draw_data['type'] == EdgeDrawDataType.Circle:
-				rect = draw_data["rect"]
-				rect = QRectF(rect[0], -rect[1], rect[2], rect[3])
-				path.addEllipse(rect)
-		for area in self._sketch.get_areas():
-			limits = Limits()
-			if type(area) == CompositeArea:
-				path = get_area_path(area.base_area, limits, self._instance_uid)
-				for subarea in area.subtracted_areas:
-					other_limits = Limits()
-					sub_area_path = get_area_path(subarea, other_limits, self._instance_uid)
-					limits.check_limits(other_limits)
-					path = path.subtracted(sub_area_path)
+	def draw_edges(self, qp: QPainter, pens, edges):
+		paths = {}
+		for edge in edges:
+			if isinstance(edge, ProformerCopy):
+				pen_name, path = self.get_edge_path(edge.base)
+				path = get_copy_transform(edge).map(path)
 			else:
-				path = get_area_path(area, limits, self._instance_uid)
-			self._areas[area.uid] = path
+				pen_name, path = self.get_edge_path(edge)
+			if pen_name not in paths:
+				paths[pen_name] = []
+			paths[pen_name].append(path)
+		for pen_name in paths:
+			if pen_name in pens:
+				qp.setPen(pens[pen_name])
+			else:
+				qp.setPen(pens['default'])
+			for path in paths[pen_name]:
+				qp.drawPath(path)
+
+	def get_edge_path(self, edge):
+		"""
+		Returns the name of the pen and the painter path of the edge, from the cache if the edge has not changed.
+		"""
+		if edge.uid in self._edge_paths:
+			return self._edge_paths[edge.uid]
+		path = QPainterPath()
+		draw_data = edge.get_draw_data(self._instance_uid)
+		coords = None
+		if 'coords' in draw_data:
+			coords = draw_data['coords']
+		if draw_data['type'] == EdgeDrawDataType.Line:
+			c1 = coords[0]
+			c2 = coords[1]
+			path.moveTo(c1.x, -c1.y)
+			path.lineTo(c2.x, -c2.y)
+		elif draw_data['type'] == EdgeDrawDataType.Lines:
+			c1 = coords[0]
+			path.moveTo(c1.x, -c1.y)
+			for i in range(1, len(coords)):
+				c2 = coords[i]
+				path.lineTo(c2.x, -c2.y)
+		elif draw_data['type'] == EdgeDrawDataType.Arc:
+			rect = draw_data["rect"]
+			start_angle = draw_data["sa"]
+			span = draw_data["span"]
+			c = draw_data["c"]
+			rect = QRectF(rect[0], -rect[1], rect[2], rect[3])
+			path.moveTo(c.x, -c.y)
+			path.arcMoveTo(rect, start_angle*180/pi)
+			path.arcTo(rect, start_angle*180/pi, span*180/pi)
+		elif draw_data['type'] == EdgeDrawDataType.Circle:
+			rect = draw_data["rect"]
+			rect = QRectF(rect[0], -rect[1], rect[2], rect[3])
+			path.addEllipse(rect)
+		if edge.style is None:
+			pen_name = 'default'
+		else:
+			pen_name = edge.style.uid
+		self._edge_paths[edge.uid] = (pen_name, path)
+		return pen_name, path
+
+	def get_area_path(self, area):
+		"""
+		Returns the painter path of the area and its limits, from the cache if the area has not changed.
+		"""
+		if area.uid in self._area_paths:
+			return self._area_paths[area.uid]
+		limits = Limits()
+		if type(area) == CompositeArea:
+			path = get_area_path(area.base_area, limits, self._instance_uid)
+			for subarea in area.subtracted_areas:
+				other_limits = Limits()
+				sub_area_path = get_area_path(subarea, other_limits, self._instance_uid)
+				limits.check_limits(other_limits)
+				path = path.subtracted(sub_area_path)
+		else:
+			path = get_area_path(area, limits, self._instance_uid)
+		self._area_paths[area.uid] = (path, limits)
+		return path, limits
 
 class SketchView(SketchViewInstance):
+	"""
+	The view of a sketch and all its instances. Instances that are small on screen are drawn with less detail,
+	below lod_outline_pixels only their bounds are drawn and below lod_raster_pixels a raster of the sketch is drawn.
+	The rasters are kept per size bucket, pens and the values the instances give the sketch, so they are shared by
+	all instances that look the same.
+	"""
+	lod_outline_pixels = 6
+	lod_raster_pixels = 96
+	lod_raster_steps = 4
+
 	def __init__(self, sketch):
 		SketchViewInstance.__init__(self, sketch, None)
 		self._instances = {}
+		self._rasters = {}
 
+	def on_index_updated(self, items):
+		SketchViewInstance.on_index_updated(self, items)
+		self._rasters = {}
 
 	def draw_instance(self, qp: QPainter, pens, scale, annotation_scale, offset, view_center, rotation, instance=None, show_area_names=False, show_keypoints=False):
 		qp.save()
@@ -128,19 +213,74 @@ class SketchView(SketchViewInstance):
 		qp.translate(offset.x, -offset.y)
 		qp.rotate(rotation)
 		try:
-			if instance is None:
-				sketch_view_instance = self
-			else:
-				if instance in self._instances:
-					sketch_view_instance = self._instances[instance]
-				else:
-					sketch_view_instance = SketchViewInstance(self._sketch, instance)
-					self._instances[instance] = sketch_view_instance
-			sketch_view_instance.draw(qp, pens, annotation_scale/scale, show_area_names, show_keypoints)
+			if instance is None or not self.draw_instance_lod(qp, pens, annotation_scale/scale, instance):
+				self.get_instance_view(instance).draw(qp, pens, annotation_scale/scale, show_area_names, show_keypoints)
 		except Exception as e:
 			print(str(e))
 		qp.restore()
 
+	def get_instance_view(self, instance):
+		if instance is None:
+			return self
+		if instance not in self._instances:
+			self._instances[instance] = SketchViewInstance(self._sketch, instance)
+		return self._instances[instance]
+
+	def draw_instance_lod(self, qp: QPainter, pens, annotation_scale, instance):
+		"""
+		Draws the sketch as seen through the instance as an outline or a raster if its bounds are small on screen.
+		:return: False if the sketch must be drawn in full
+		"""
+		values_key = self._sketch.get_instance_values_key(instance)
+		if len(values_key) == 0:
+			limits = self._sketch.get_limits()
+		else:
+			limits = self._sketch.get_limits_in_instance(instance)
+		width = limits[2] - limits[0]
+		height = limits[3] - limits[1]
+		if width < 0 or height < 0:
+			return True
+		rect = QRectF(limits[0], -limits[3], width, height)
+		screen_rect = qp.transform().mapRect(rect)
+		pixels = max(screen_rect.width(), screen_rect.height())
+		if pixels < SketchView.lod_outline_pixels:
+			qp.setPen(QPen(pens['default'].color(), 0))
+			qp.setBrush(QBrush())
+			qp.drawRect(rect)
+			return True
+		if pixels < SketchView.lod_raster_pixels and width > 0 and height > 0:
+			pixmap = self.get_raster(pens, limits, pixels, annotation_scale, instance, values_key)
+			qp.drawPixmap(rect, pixmap, QRectF(pixmap.rect()))
+			return True
+		return False
+
+	def get_raster(self, pens, limits, pixels, annotation_scale, instance, values_key):
+		"""
+		Returns the raster of the sketch for the size and pens. An instance that gives the sketch values of its own is
+		drawn through its instance view, the raster is then shared with the instances that give the same values.
+		"""
+		self._sketch.get_spatial_index().update()
+		bucket = ceil(log2(pixels) * SketchView.lod_raster_steps)
+		key = (bucket, id(pens), values_key)
+		if key in self._rasters:
+			return self._rasters[key][0]
+		width = limits[2] - limits[0]
+		height = limits[3] - limits[1]
+		factor = 2 ** (bucket / SketchView.lod_raster_steps) / max(width, height)
+		pixmap = QPixmap(max(1, ceil(width * factor)), max(1, ceil(height * factor)))
+		pixmap.fill(Qt.transparent)
+		painter = QPainter(pixmap)
+		painter.setRenderHint(QPainter.Antialiasing)
+		painter.scale(factor, factor)
+		painter.translate(-limits[0], limits[3])
+		if len(values_key) == 0:
+			SketchViewInstance.draw(self, painter, pens, annotation_scale, False, False)
+		else:
+			self.get_instance_view(instance).draw(painter, pens, annotation_scale, False, False)
+		painter.end()
+		# The pens are kept with the raster so their id is not reused while the raster is cached
+		self._rasters[key] = (pixmap, pens)
+		return pixmap
 
 
 def get_sketch_view(sketch) -> SketchView:
@@ -227,7 +367,7 @@ def get_area_path(area, limits, instance):
 
 					path.arcTo(cx - radius, cy - radius, radius * 2,radius * 2, start_angle, sweep_length)
 				elif is_fillet_kp:
-					center_kp = Vertex(kp.get_instance_x(instance), kp.get_instance_y(instance), kp.get_instance_z(instance))
+					center_kp = Vector3(kp.get_instance_x(instance), kp.get_instance_y(instance), kp.get_instance_z(instance))
 					fillet_offset_x = fillet_dist * cos(angle)
 					fillet_offset_y = fillet_dist * sin(angle)
 					center_kp.x += fillet_offset_x
@@ -257,7 +397,7 @@ def get_area_path(area, limits, instance):
 					# Make sure the direction is correct.
 					f_kp = coords[0]
 					l_kp = coords[len(coords)-1]
-					n_kp = Vertex(x, -y)
+					n_kp = Vector3(x, -y)
 					first_dist = f_kp.distance(n_kp)
 					last_dist = l_kp.distance(n_kp)
 					if first_dist < last_dist:
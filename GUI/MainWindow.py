@@ -187,7 +187,7 @@ class MainWindow(QMainWindow):
 		docs_location = QStandardPaths.standardLocations(QStandardPaths.DocumentsLocation)
 
 		default_path = docs_location[0]
-		file_name = QFileDialog.getOpenFileName(self, 'Open file', default_path, "Text files (*.jadoc)")
+		file_name = QFileDialog.getOpenFileName(self, 'Open file', default_path, "Documents (*.jadoc *.padoc);;Text files (*.jadoc);;Stream files (*.padoc)")
 		file_path = file_name[0]
 
 		if file_path != "":
@@ -262,11 +262,13 @@ class MainWindow(QMainWindow):
 	def on_save_as(self):
 		docs_location = QStandardPaths.standardLocations(QStandardPaths.DocumentsLocation)
 		default_path = docs_location[0]
-		file_types = "Text File(*.jadoc)"
+		file_types = "Text File(*.jadoc);;Stream File(*.padoc)"
 		file_name = QFileDialog.getSaveFileName(self, "Save file", default_path, file_types)
 		if file_name[0] != "":
-			if ".jadoc" in file_name[0]:
+			if ".jadoc" in file_name[0] or ".padoc" in file_name[0]:
 				file_info = QFileInfo(file_name[0])
+			elif ".padoc" in file_name[1]:
+				file_info = QFileInfo(file_name[0] + ".padoc")
 			else:
 				file_info = QFileInfo(file_name[0] + ".jadoc")
 			self._document.path = file_info.absolutePath()
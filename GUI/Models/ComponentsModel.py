@@ -14,6 +14,7 @@ class ComponentsModel(QAbstractTableModel):
 		self._components = doc.get_components()
 		self._doc = doc
 		self._components.add_change_handler(self.on_components_changed)
+		self._end_structure_change = None
 
 	def rowCount(self, model_index=None, *args, **kwargs):
 		return len(self._components.get_components())
@@ -62,18 +63,27 @@ class ComponentsModel(QAbstractTableModel):
 
 	def on_components_changed(self, event: ChangeEvent):
 		if type(event.sender) is Components:
+			# In a change batch the before events arrive after the components have changed, the model is then reset
+			components = self._components.get_components()
 			if event.type == event.BeforeObjectAdded:
-				lenght = len(self._components.get_components())
-				self.beginInsertRows(QModelIndex(), lenght, lenght)
-			if event.type == event.ObjectAdded:
-				self.endInsertRows()
+				if event.object not in components:
+					self.beginInsertRows(QModelIndex(), len(components), len(components))
+					self._end_structure_change = self.endInsertRows
+				else:
+					self.beginResetModel()
+					self._end_structure_change = self.endResetModel
 			if event.type == event.BeforeObjectRemoved:
-				if event.object in self._components.get_components():
-					row = self._components.get_components().index(event.object)
+				if event.object in components:
+					row = components.index(event.object)
 					self.beginRemoveRows(QModelIndex(), row, row)
-			if event.type == event.ObjectRemoved:
-				if event.object in self._components.get_components():
-					self.endRemoveRows()
+					self._end_structure_change = self.endRemoveRows
+				else:
+					self.beginResetModel()
+					self._end_structure_change = self.endResetModel
+			if event.type == event.ObjectAdded or event.type == event.ObjectRemoved:
+				if self._end_structure_change is not None:
+					self._end_structure_change()
+					self._end_structure_change = None
 		if type(event.object) is Component:
 			if event.type == event.ValueChanged:
 				comp = event.sender
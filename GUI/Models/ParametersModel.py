@@ -21,6 +21,7 @@ class ParametersModel(QAbstractTableModel):
 		self._columns_widths = [120, 150, 80, 40]
 		self._instance = None
 		self._user_input_handlers = []
+		self._end_structure_change = None
 
 	@property
 	def instance(self):
@@ -179,17 +180,27 @@ class ParametersModel(QAbstractTableModel):
 				self.modelAboutToBeReset.emit()
 				self.modelReset.emit()
 		if type(event.sender) is Parameter or type(event.object) is Parameter:
+			# In a change batch the before events arrive after the parameters have changed, the model is then reset
 			if event.type == event.BeforeObjectAdded:
-				parent = QModelIndex()
-				row = self.rowCount()
-				self.beginInsertRows(parent, row, row)
-			if event.type == event.ObjectAdded:
-				self.endInsertRows()
+				if self._parameters.get_index_of(event.object) < 0:
+					row = self.rowCount()
+					self.beginInsertRows(QModelIndex(), row, row)
+					self._end_structure_change = self.endInsertRows
+				else:
+					self.beginResetModel()
+					self._end_structure_change = self.endResetModel
 			if event.type == event.BeforeObjectRemoved:
 				row = self._parameters.get_index_of(event.object)
-				self.beginRemoveRows(QModelIndex(), row, row)
-			if event.type == event.ObjectRemoved:
-				self.endRemoveRows()
+				if row >= 0:
+					self.beginRemoveRows(QModelIndex(), row, row)
+					self._end_structure_change = self.endRemoveRows
+				else:
+					self.beginResetModel()
+					self._end_structure_change = self.endResetModel
+			if event.type == event.ObjectAdded or event.type == event.ObjectRemoved:
+				if self._end_structure_change is not None:
+					self._end_structure_change()
+					self._end_structure_change = None
 			if event.type == event.ValueChanged:
 				param = event.object
 				row = self._parameters.get_index_of(param)
@@ -1,5 +1,3 @@
-from math import log10
-
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QLabel, QInputDialog, QDialog
 
@@ -91,7 +89,7 @@ class SketchParametry():
 		sketch = view.sketch
 		doc = self._main_window.document
 		if sketch is not None:
-			find_all_similar(doc, sketch, int(round(log10(1 / self._similar_threshold))))
+			find_all_similar(doc, sketch, tolerance=self._similar_threshold)
 			view.update()
 
 	def on_similar_thresshold_changed(self, event):
@@ -1,7 +1,7 @@
 from PyQt5.QtCore import Qt
 
 from Data.Sketch import Text, Alignment, Attribute
-from Data.Vertex import Vertex
+from Data.Vertex import Vector3
 # from GUI import plugin_initializers
 
 from GUI.Ribbon.RibbonButton import RibbonButton
@@ -32,7 +32,7 @@ class SketchSelect():
 		update_view = False
 		view = self._sketch_editor_view
 		sketch = view.sketch
-		key_points = sketch.get_keypoints()
+		spatial_index = sketch.get_spatial_index()
 
 		if view.kp_hover is not None:
 			view.kp_hover = None
@@ -52,33 +52,24 @@ class SketchSelect():
 
 		#                             ****    Keypoint Hover    ****
 		if self._states.select_kp:
-			for key_point in key_points:
-				x1 = key_point.x
-				y1 = key_point.y
-				if abs(x1 - x) < 5 / scale and abs(y1 - y) < 5 / scale:
-					view.kp_hover = key_point
-					update_view = True
-					break
+			key_point = spatial_index.find_key_point(x, y, 5 / scale)
+			if key_point is not None:
+				view.kp_hover = key_point
+				update_view = True
 
 		#                             ****    Edge Hover    ****
 		if self._states.select_edge and view.kp_hover is None:
-			smallest_dist = 10e10
-			closest_edge = None
-			for edge in sketch.get_edges():
-				dist = edge.distance(Vertex(x, y, 0), None)
-				if dist < smallest_dist:
-					smallest_dist = dist
-					closest_edge = edge
+			closest_edge, smallest_dist = spatial_index.find_edge(x, y, 10 / scale)
 			if smallest_dist * scale < 10:
 				view.edge_hover = closest_edge
 				update_view = True
 
 		#                             ****    Area Hover    ****
 		if self._states.select_area and view.kp_hover is None and view.edge_hover is None:
-			for area in sketch.get_areas():
-				if area.inside(Vertex(x, y, 0)):
-					view.area_hover = area
-					update_view = True
+			areas = spatial_index.get_areas_at(x, y)
+			if len(areas) > 0:
+				view.area_hover = areas[-1]
+				update_view = True
 
 		#                             ****    Text Hover    ****
 		if self._states.select_text and view.edge_hover is None and view.kp_hover is None:
@@ -102,7 +93,7 @@ class SketchSelect():
 		if self._states.select_instance and view.text_hover is None and view.edge_hover is None and view.kp_hover is None and view.area_hover is None:
 			for instance in sketch.sketch_instances:
 				#if instance.inside(Vertex(x, y, 0)):
-				if instance.offset.distance(Vertex(x,y)) < 100/view.scale:
+				if instance.offset.distance(Vector3(x, y)) < 100/view.scale:
 					view.instance_hover = instance
 					update_view = True
 
@@ -6,7 +6,7 @@ from PyQt5.QtGui import QBrush, QFont, QPen, QPainter, QFontMetrics, QColor, QPa
 from Data.Nurbs import Nurbs
 from Data.Sketch import *
 from Data.Style import EdgeLineType, BrushType
-from Data.Vertex import Vertex
+from Data.Vertex import Vector3
 
 
 def scale_dash_pattern(dash_pattern, fat):
@@ -384,7 +384,7 @@ def get_area_path(area, scale, offset, half_height, half_width, limits, instance
 					path.arcTo(cx - radius * scale, cy - radius * scale, scale * radius * 2, scale * radius * 2, start_angle,
 										 sweep_length)
 				elif is_fillet_kp:
-					center_kp = Vertex(kp.get_instance_x(instance), kp.get_instance_y(instance), kp.get_instance_z(instance))
+					center_kp = Vector3(kp.get_instance_x(instance), kp.get_instance_y(instance), kp.get_instance_z(instance))
 					fillet_offset_x = fillet_dist * cos(angle)
 					fillet_offset_y = fillet_dist * sin(angle)
 					center_kp.x += fillet_offset_x
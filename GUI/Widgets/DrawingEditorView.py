@@ -13,6 +13,7 @@ from PyQt5.QtWidgets import QInputDialog
 from PyQt5.QtWidgets import QWidget
 
 from Business.DrawingActions import *
+from Data.Profiler import probe
 from Data.Vertex import Vertex
 from GUI.GeometryViews.SketchView import get_sketch_view
 from GUI.init import is_dark_theme
@@ -241,6 +242,7 @@ class DrawingEditorViewWidget(QWidget):
 				self._offset.y += disty * (delta * 0.01)
 				self.update()
 
+	@probe('DrawingEditorView.paintEvent')
 	def paintEvent(self, event):
 		qp = QtGui.QPainter()
 		qp.begin(self)
@@ -1,76 +1,108 @@
 import numpy as np
-from PyQt5.QtGui import QColor
+from PyQt5.QtGui import QColor, QOpenGLBuffer
 
 from Data.Part import Feature
-from Data.Vertex import Vertex
 
 
-def double_sided_triangle(gl, v1, v2, v3):
-	cp = np.cross(v2 - v1, v3 - v1)
-	n = cp / np.linalg.norm(cp)
-	gl.glNormal3f(n[0], n[1], n[2])
-	gl.glVertex3f(v1[0], v1[1], v1[2])
-	gl.glVertex3f(v2[0], v2[1], v2[2])
-	gl.glVertex3f(v3[0], v3[1], v3[2])
+def to_float32_array(values):
+	if len(values) == 0:
+		return np.zeros((0, 3), dtype=np.float32)
+	return np.asarray(values, dtype=np.float32).reshape(-1, 3)
 
-	n = -n
-	gl.glNormal3f(n[0], n[1], n[2])
-	gl.glVertex3f(v3[0], v3[1], v3[2])
-	gl.glVertex3f(v2[0], v2[1], v2[2])
-	gl.glVertex3f(v1[0], v1[1], v1[2])
 
+class GlBuffer(object):
+	"""
+	Vertex buffer object with interleaved float32 vertices and normals. The data is given in numpy arrays and is only
+	copied to the GPU when it has been replaced since the last upload.
+	"""
+	stride = 6 * 4
 
-def double_sided_quad(gl, v1, v2, v3, v4):
-	double_sided_triangle(gl, v1, v2, v3)
-	double_sided_triangle(gl, v4, v2, v3)
+	def __init__(self):
+		self._buffer = None
+		self._data = None
+		self._count = 0
+		self._upload_needed = False
 
-
-def set_color(gl, c):
-	gl.glColor4f(c.redF(), c.greenF(), c.blueF(), c.alphaF())
-
-
-def set_glsl_color(program, c):
-	program.setUniformValue('color', c)
-
-
-def draw_surfaces(gl, surfaces):
-	gl.glBegin(gl.GL_TRIANGLES)
-	for surface in surfaces:
-		for triangle in surface.get_faces_normals():
-			double_sided_triangle(gl, triangle[0], triangle[1], triangle[2])
-	gl.glEnd()
-
-
-def draw_cube(gl, size, position):
-	gl.glBegin(gl.GL_TRIANGLES)
-	p = position
-	s = size / 2
-	v1 = Vertex(p.x + s, p.y + s, p.z + s).xyz
-	v2 = Vertex(p.x + s, p.y + s, p.z - s).xyz
-	v3 = Vertex(p.x + s, p.y - s, p.z + s).xyz
-	v4 = Vertex(p.x + s, p.y - s, p.z - s).xyz
-	v5 = Vertex(p.x - s, p.y + s, p.z + s).xyz
-	v6 = Vertex(p.x - s, p.y + s, p.z - s).xyz
-	v7 = Vertex(p.x - s, p.y - s, p.z + s).xyz
-	v8 = Vertex(p.x - s, p.y - s, p.z - s).xyz
-	double_sided_quad(gl, v1, v2, v3, v4)
-	double_sided_quad(gl, v1, v2, v5, v6)
-	double_sided_quad(gl, v1, v3, v5, v7)
-	double_sided_quad(gl, v2, v4, v6, v8)
-	double_sided_quad(gl, v7, v8, v3, v4)
-	double_sided_quad(gl, v5, v6, v7, v8)
-	gl.glEnd()
+	@property
+	def count(self):
+		return self._count
+
+	def set_data(self, vertices, normals=None):
+		vertices = to_float32_array(vertices)
+		if normals is None:
+			normals = np.zeros(vertices.shape, dtype=np.float32)
+		else:
+			normals = to_float32_array(normals)
+		self._data = np.ascontiguousarray(np.hstack((vertices, normals)))
+		self._count = len(vertices)
+		self._upload_needed = True
+
+	def upload(self):
+		if not self._upload_needed:
+			return
+		if self._buffer is None:
+			self._buffer = QOpenGLBuffer(QOpenGLBuffer.VertexBuffer)
+			self._buffer.create()
+			self._buffer.setUsagePattern(QOpenGLBuffer.StaticDraw)
+		self._buffer.bind()
+		self._buffer.allocate(self._data.tobytes(), self._data.nbytes)
+		self._buffer.release()
+		self._data = None
+		self._upload_needed = False
+
+	def draw(self, gl, program, mode, vertex_attribute, normals_attribute):
+		if self._count == 0:
+			return
+		self.upload()
+		self._buffer.bind()
+		program.setAttributeBuffer(vertex_attribute, gl.GL_FLOAT, 0, 3, GlBuffer.stride)
+		program.setAttributeBuffer(normals_attribute, gl.GL_FLOAT, 3 * 4, 3, GlBuffer.stride)
+		gl.glDrawArrays(mode, 0, self._count)
+		self._buffer.release()
+
+	def destroy(self):
+		if self._buffer is not None:
+			self._buffer.destroy()
+			self._buffer = None
 
 
 class GlDrawable(object):
 	def __init__(self, gen_list_index):
 		self._gen_list_index = gen_list_index
+		self._faces_buffer = GlBuffer()
+		self._lines_buffer = GlBuffer()
+		self._update_needed = True
 
 	def feature_changed(self, event):
-		self.redraw()
+		self.invalidate()
+
+	def invalidate(self):
+		self._update_needed = True
 
-	def redraw(self, gl, show_surfaces):
-		pass
+	@property
+	def update_needed(self):
+		return self._update_needed
+
+	def update_buffers(self):
+		"""
+		Fills the face and line buffers from the current geometry if the drawable has been invalidated.
+		"""
+		if self._update_needed:
+			self._faces_buffer.set_data(self.vertices, self.normals)
+			self._lines_buffer.set_data(self.lines)
+			self._update_needed = False
+
+	@property
+	def faces_buffer(self):
+		return self._faces_buffer
+
+	@property
+	def lines_buffer(self):
+		return self._lines_buffer
+
+	def destroy(self):
+		self._faces_buffer.destroy()
+		self._lines_buffer.destroy()
 
 	@property
 	def get_gen_list(self):
@@ -84,6 +116,10 @@ class GlDrawable(object):
 	def normals(self):
 		return []
 
+	@property
+	def lines(self):
+		return []
+
 	@property
 	def color(self):
 		return QColor(180, 180, 180, 255)
@@ -103,30 +139,14 @@ class GlPlaneDrawable(GlDrawable):
 		self._normals = []
 		plane_feature.add_change_handler(self.on_plane_changed)
 
-	def on_plane_changed(self, event):
-		self._vertices = []
-		self._normals = []
+	@property
+	def plane_feature(self):
+		return self._plane_feature
 
-	def redraw(self, gl, show_surfaces):
+	def on_plane_changed(self, event):
 		self._vertices = []
 		self._normals = []
-		gl.glNewList(self._gen_list_index, gl.GL_COMPILE)
-		gl.glDisable(gl.GL_LIGHT0)
-		gl.glDisable(gl.GL_LIGHTING)
-		p = self._plane_feature.get_vertex('p')
-		xd = self._plane_feature.get_vertex('xd')
-		yd = self._plane_feature.get_vertex('yd')
-		parent = self._plane_feature.get_feature_parent()
-		limits = parent.get_limits()
-		size1 = max(np.absolute(limits[0].xyz))
-		size2 = max(np.absolute(limits[1].xyz))
-		size = max(size1, size2) * 1.2
-		v1 = p.xyz * size - xd.xyz * size + yd.xyz * size
-		v2 = p.xyz * size - xd.xyz * size - yd.xyz * size
-		v3 = p.xyz * size + xd.xyz * size + yd.xyz * size
-		v4 = p.xyz * size + xd.xyz * size - yd.xyz * size
-		self.draw_feature_plane(gl, v1, v2, v3, v4)
-		gl.glEndList()
+		self.invalidate()
 
 	@property
 	def color(self):
@@ -136,39 +156,6 @@ class GlPlaneDrawable(GlDrawable):
 	def edge_color(self):
 		return self._plane_color_edge
 
-	def draw_feature_plane(self, gl, v1, v2, v3, v4):
-		gl.glDisable(gl.GL_DEPTH_TEST)
-		gl.glBegin(gl.GL_TRIANGLES)
-		set_color(gl, self._plane_color)
-
-		m = 2
-		for i in range(m):
-			for l in range(m):
-				delta_x_1 = float(i) / float(m)
-				delta_x_2 = float(i + 1.0) / float(m)
-				delta_y_1 = float(l) / float(m)
-				delta_y_2 = float(l + 1.0) / float(m)
-				ul = v1 + (v2 - v1) * delta_x_1 + (v3 - v1) * delta_y_1
-				ll = v1 + (v2 - v1) * delta_x_1 + (v3 - v1) * delta_y_2
-				ur = v1 + (v2 - v1) * delta_x_2 + (v3 - v1) * delta_y_1
-				lr = v1 + (v2 - v1) * delta_x_2 + (v3 - v1) * delta_y_2
-				double_sided_triangle(gl, ul, ll, ur)
-				double_sided_triangle(gl, ur, lr, ll)
-		gl.glEnd()
-		gl.glEnable(gl.GL_DEPTH_TEST)
-		gl.glLineWidth(2.0)
-		gl.glBegin(gl.GL_LINES)
-		set_color(gl, self._plane_color_edge)
-		gl.glVertex3d(v1[0], v1[1], v1[2])
-		gl.glVertex3d(v2[0], v2[1], v2[2])
-		gl.glVertex3d(v2[0], v2[1], v2[2])
-		gl.glVertex3d(v4[0], v4[1], v4[2])
-		gl.glVertex3d(v4[0], v4[1], v4[2])
-		gl.glVertex3d(v3[0], v3[1], v3[2])
-		gl.glVertex3d(v3[0], v3[1], v3[2])
-		gl.glVertex3d(v1[0], v1[1], v1[2])
-		gl.glEnd()
-
 	@property
 	def vertices(self):
 		if len(self._vertices) == 0:
@@ -214,12 +201,45 @@ class GlPlaneDrawable(GlDrawable):
 		return lines
 
 
-def draw_lines(gl, lines):
-	gl.glLineWidth(2.0)
-	gl.glBegin(gl.GL_LINES)
-	for line in lines:
-		gl.glVertex3d(line[0], line[1], line[2])
-	gl.glEnd()
+class GlFeatureDrawable(GlDrawable):
+	"""
+	The faces of the surfaces generated by one feature of a part. The buffers are only refilled when the part has
+	generated new geometry for the feature.
+	"""
+	def __init__(self, gen_list_index, part, feature):
+		GlDrawable.__init__(self, gen_list_index)
+		self._part = part
+		self._feature = feature
+		self._feature_geometry = None
+
+	@property
+	def feature(self):
+		return self._feature
+
+	def update_buffers(self):
+		feature_geometry = self._part.get_feature_geometry(self._feature.uid)
+		if feature_geometry is not self._feature_geometry:
+			self._feature_geometry = feature_geometry
+			self.invalidate()
+		GlDrawable.update_buffers(self)
+
+	@property
+	def vertices(self):
+		vertices = []
+		if self._feature_geometry is not None:
+			for surface in self._feature_geometry.surfaces:
+				faces, norms = surface.get_faces_normals()
+				vertices.extend(faces)
+		return vertices
+
+	@property
+	def normals(self):
+		normals = []
+		if self._feature_geometry is not None:
+			for surface in self._feature_geometry.surfaces:
+				faces, norms = surface.get_faces_normals()
+				normals.extend(norms)
+		return normals
 
 
 class GlPartDrawable(GlDrawable):
@@ -229,49 +249,19 @@ class GlPartDrawable(GlDrawable):
 		self._part_color = QColor(160, 160, 160, 255)
 		self._part_color_edge = QColor(140, 140, 140, 255)
 		# self._part_color_edge = QColor(10, 10, 10, 255)
-		self._lines = []
-		self._vertices = []
-		self._normals = []
 
-	def redraw(self, gl, show_surfaces):
-		gl.glNewList(self._gen_list_index, gl.GL_COMPILE)
-		gl.glEnable(gl.GL_COLOR_MATERIAL)
-		set_color(gl, self._part_color)
-		gl.glMaterialfv(gl.GL_FRONT, gl.GL_DIFFUSE, [0.5, 0.5, 0.5, 0.5])
-		lines = self._part.get_lines()
-
-		if show_surfaces:
-			set_color(gl, self._part_color)
-			gl.glEnable(gl.GL_LIGHT0)
-			gl.glEnable(gl.GL_LIGHTING)
-			surfaces = self._part.get_surfaces()
-		# draw_surfaces(gl, surfaces)
-
-		# draw_cube(gl, 1, Vertex(3, 0, 0))
-
-		set_color(gl, self._part_color_edge)
-		gl.glDisable(gl.GL_LIGHT0)
-		gl.glDisable(gl.GL_LIGHTING)
-		draw_lines(gl, lines)
-
-		gl.glEndList()
+	@property
+	def part(self):
+		return self._part
 
 	@property
-	def vertices(self):
-		if len(self._vertices) == 0:
-			surfaces = self._part.get_surfaces()
-			for surface in surfaces:
-				faces, norms = surface.get_faces_normals()
-				self._vertices.extend(faces)
-				self._normals.extend(norms)
-		return self._vertices
+	def color(self):
+		return self._part_color
 
 	@property
-	def normals(self):
-		return self._normals
+	def edge_color(self):
+		return self._part_color_edge
 
 	@property
 	def lines(self):
-		if len(self._lines) == 0:
-			self._lines = self._part.get_lines()
-		return self._lines
+		return self._part.get_lines()
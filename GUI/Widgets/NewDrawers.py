@@ -1,13 +1,14 @@
-from math import cos, sin, pi, tan
+from math import cos, sin, pi, tan, log2
 
 from PyQt5.QtCore import Qt, QPointF, QRectF, QLineF
 from PyQt5.QtGui import QPainter, QBrush, QColor, QPen, QPainterPath, QTransform, QFont, QFontMetrics
 
-from Data.Areas import CompositeArea
+from Data.Areas import Area, CompositeArea
 from Data.Edges import Edge, EdgeType
+from Data.Proformer import ProformerCopy
 from Data.Sketch import Attribute, Text, Alignment
 from Data.Style import BrushType, EdgeLineType
-from Data.Vertex import Vertex
+from Data.Vertex import Vertex, Vector3
 
 
 def scale_dash_pattern(dash_pattern, fat):
@@ -60,6 +61,58 @@ def create_pens(document, scale, color_override=None, fat=1):
 		pens[style.uid] = get_pen_from_style(style, scale, color_override, fat)
 	return pens
 
+pen_scale_steps = 8
+
+_pen_caches = {}
+
+
+def get_pen_scale_bucket(scale):
+	"""
+	Rounds the scale to steps of 1/pen_scale_steps in log2, so scales that only differ slightly share their pens.
+	"""
+	if scale <= 0:
+		return None
+	return round(log2(scale) * pen_scale_steps)
+
+
+def get_pens(document, scale, color_override=None, fat=1):
+	"""
+	Returns pens for all edge styles of the document like create_pens, but from a cache keyed by the scale bucket,
+	color and fatness. The cache of a document is cleared when its styles change.
+	"""
+	styles = document.styles
+	cache = _pen_caches.get(id(styles), None)
+	if cache is None or cache[0] is not styles:
+		cache = (styles, {})
+		_pen_caches[id(styles)] = cache
+
+		def on_styles_changed(event):
+			cache[1].clear()
+
+		styles.add_change_handler(on_styles_changed)
+	bucket = get_pen_scale_bucket(scale)
+	color_key = None if color_override is None else color_override.rgba()
+	key = (bucket, color_key, fat)
+	pens = cache[1].get(key, None)
+	if pens is None:
+		if bucket is None:
+			bucket_scale = 0
+		else:
+			bucket_scale = 2 ** (bucket / pen_scale_steps)
+		pens = create_pens(document, bucket_scale, color_override, fat)
+		cache[1][key] = pens
+	return pens
+
+
+def get_copy_transform(copy):
+	"""
+	Returns the transform that places the base item of a pending proformer copy where the copy is, in the coordinates
+	the sketches are drawn in, where y is flipped.
+	"""
+	t = copy.get_transform()
+	return QTransform(t[0, 0], -t[1, 0], -t[0, 1], t[1, 1], t[0, 2], -t[1, 2])
+
+
 def draw_sketch(qp: QPainter, sketch, scale, annotation_scale, offset, view_center, rotation, pens, fields, instance=None):
 	qp.save()
 	qp.translate(view_center.x, view_center.y)
@@ -71,20 +124,34 @@ def draw_sketch(qp: QPainter, sketch, scale, annotation_scale, offset, view_cent
 
 		edges = sketch.get_edges()
 		areas = sketch.get_areas()
+		copies = [copy for proformer in sketch.proformers for copy in proformer.get_pending_copies()]
 
-		for area in areas:
-			if area.brush is not None:
-				if area.brush.type == BrushType.Solid:
+		for area in areas + [copy for copy in copies if isinstance(copy.base, Area)]:
+			base_area = area if isinstance(area, Area) else area.base
+			if base_area.brush is not None:
+				if base_area.brush.type == BrushType.Solid:
 					brush = QBrush(QColor(0, 0, 0))
 				else:
 					brush = QBrush(QColor(0, 0, 0), Qt.HorPattern)
 				#transx = offset.x * scale + center.x
 				#transy = -offset.y * scale + center.y
-				transform = QTransform().scale(annotation_scale/scale, annotation_scale/scale).rotate(area.brush_rotation)
+				transform = QTransform().scale(annotation_scale/scale, annotation_scale/scale).rotate(base_area.brush_rotation)
 				brush.setTransform(transform)
-				draw_area(area, qp, False, brush, annotation_scale, instance)
+				if base_area is area:
+					draw_area(area, qp, False, brush, annotation_scale, instance)
+				else:
+					qp.save()
+					qp.setTransform(get_copy_transform(area), True)
+					draw_area(base_area, qp, False, brush, annotation_scale, instance)
+					qp.restore()
 		for edge in edges:
 			draw_edge(edge, qp, pens, instance)
+		for copy in copies:
+			if isinstance(copy.base, Edge):
+				qp.save()
+				qp.setTransform(get_copy_transform(copy), True)
+				draw_edge(copy.base, qp, pens, instance)
+				qp.restore()
 		for text in sketch.get_texts():
 			if type(text) is Attribute:
 				value = None
@@ -99,7 +166,7 @@ def draw_sketch(qp: QPainter, sketch, scale, annotation_scale, offset, view_cent
 			si = sketch_instance.sketch
 			siscale = sketch_instance.scale
 			sioffset = sketch_instance.offset / sketch_instance.scale
-			instance_pens = create_pens(sketch.document, annotation_scale * 5000 / (scale*siscale))
+			instance_pens = get_pens(sketch.document, annotation_scale * 5000 / (scale*siscale))
 			draw_sketch(qp, si, siscale, annotation_scale/scale, sioffset, Vertex(), sketch_instance.rotation, instance_pens, fields, sketch_instance.uid)
 	except Exception as e:
 		print(str(e))
@@ -174,6 +241,12 @@ def get_fillet_offset_distance(fillet_kp, r, edge1, edge2):
 
 
 def draw_edge(edge: Edge, qp, pens, instance):
+	if isinstance(edge, ProformerCopy):
+		qp.save()
+		qp.setTransform(get_copy_transform(edge), True)
+		draw_edge(edge.base, qp, pens, instance)
+		qp.restore()
+		return
 	if edge.style is None:
 		qp.setPen(pens['default'])
 	else:
@@ -327,9 +400,26 @@ class Limits:
 		self.y_min *= other
 
 
-def draw_area(area, qp, show_names, brush, annotation_scale, instance):
-	limits = Limits()
-	if type(area) == CompositeArea:
+def copy_limits(limits):
+	new_limits = Limits()
+	new_limits.x_max = limits.x_max
+	new_limits.y_max = limits.y_max
+	new_limits.x_min = limits.x_min
+	new_limits.y_min = limits.y_min
+	return new_limits
+
+
+def draw_area(area, qp, show_names, brush, annotation_scale, instance, path=None, limits=None):
+	if isinstance(area, ProformerCopy) and path is None:
+		qp.save()
+		qp.setTransform(get_copy_transform(area), True)
+		draw_area(area.base, qp, show_names, brush, annotation_scale, instance)
+		qp.restore()
+		return
+	if path is not None:
+		limits = Limits() if limits is None else copy_limits(limits)
+	elif type(area) == CompositeArea:
+		limits = Limits()
 		path = get_area_path(area.base_area, limits, instance)
 		for subarea in area.subtracted_areas:
 			other_limits = Limits()
@@ -337,6 +427,7 @@ def draw_area(area, qp, show_names, brush, annotation_scale, instance):
 			limits.check_limits(other_limits)
 			path = path.subtracted(sub_area_path)
 	else:
+		limits = Limits()
 		path = get_area_path(area, limits, instance)
 	qp.fillPath(path, brush)
 
@@ -432,7 +523,7 @@ def get_area_path(area, limits, instance):
 					path.arcTo(cx - radius, cy - radius, radius * 2,radius * 2, start_angle,
 										 sweep_length)
 				elif is_fillet_kp:
-					center_kp = Vertex(kp.get_instance_x(instance), kp.get_instance_y(instance), kp.get_instance_z(instance))
+					center_kp = Vector3(kp.get_instance_x(instance), kp.get_instance_y(instance), kp.get_instance_z(instance))
 					fillet_offset_x = fillet_dist * cos(angle)
 					fillet_offset_y = fillet_dist * sin(angle)
 					center_kp.x += fillet_offset_x
@@ -464,7 +555,7 @@ def get_area_path(area, limits, instance):
 					# Make sure the direction is correct.
 					f_kp = coords[0]
 					l_kp = coords[len(coords)-1]
-					n_kp = Vertex(x, -y)
+					n_kp = Vector3(x, -y)
 					first_dist = f_kp.distance(n_kp)
 					last_dist = l_kp.distance(n_kp)
 					if first_dist < last_dist:
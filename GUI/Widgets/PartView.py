@@ -24,9 +24,10 @@ from PyQt5.QtWidgets import QOpenGLWidget
 from Business.PartAction import *
 from Data.Events import ChangeEvent
 from Data.Part import Part, Feature
+from Data.Profiler import probe
 from Data.Vertex import Vertex
 
-from GUI.Widgets.GlDrawable import GlPlaneDrawable, GlPartDrawable
+from GUI.Widgets.GlDrawable import GlPlaneDrawable, GlPartDrawable, GlFeatureDrawable
 from GUI.Widgets.SimpleDialogs import SketchDialog, ExtrudeDialog, RevolveDialog
 
 
@@ -41,6 +42,8 @@ class PartViewWidget(QOpenGLWidget):
 		self._is_dark_theme = is_dark_theme()
 		self._gen_lists_start = 0
 		self._drawables = []
+		self._released_drawables = []
+		self._plane_limits = None
 		self.xRot = 225 * 16
 		self.yRot = 45 * 16
 		self.zRot = 0
@@ -62,13 +65,6 @@ class PartViewWidget(QOpenGLWidget):
 		self._show_lines = True
 		self._show_planes = True
 		self._program = None
-		self._vertices = [[0, 0, 0]]
-		self._normals = [[0, 0, 0]]
-		self._plane_faces_index = 0
-		self._plane_edges_index = 0
-		self._part_faces_index = 0
-		self._part_edges_index = 0
-		self._new_verts = False
 		format = QSurfaceFormat()
 		format.setSamples(4)
 		self.setFormat(format)
@@ -112,6 +108,7 @@ class PartViewWidget(QOpenGLWidget):
 		if self._part is not None:
 			part.remove_change_handler(self.part_changed)
 		self._part = part
+		self._plane_limits = None
 		self.update_drawables()
 		self.redraw_drawables()
 		self.part_color = QColor(part.color[0], part.color[1], part.color[2], part.color[3])
@@ -121,56 +118,78 @@ class PartViewWidget(QOpenGLWidget):
 		self.update()
 
 	def update_drawables(self):
+		"""
+		Creates drawables for the planes and features of the part. Drawables of features that are still in the part
+		are kept, so their buffers are only refilled if the feature has new geometry. The buffers of the drawables
+		that are no longer used are destroyed by paintGL, where the GL context is current.
+		"""
+		old_drawables = {}
+		part_drawable = None
+		for drawable in self._drawables:
+			if type(drawable) == GlPlaneDrawable:
+				old_drawables[drawable.plane_feature.uid] = drawable
+			elif type(drawable) == GlFeatureDrawable:
+				old_drawables[drawable.feature.uid] = drawable
+			elif type(drawable) == GlPartDrawable and drawable.part is self._part:
+				part_drawable = drawable
+			elif drawable is not None:
+				self._released_drawables.append(drawable)
 		self._drawables = []
 		if self._part is not None:
 			for plane_feature in self._part.get_plane_features():
-				drawable = GlPlaneDrawable(len(self._drawables) + self._gen_lists_start, plane_feature)
+				drawable = old_drawables.pop(plane_feature.uid, None)
+				if drawable is None:
+					drawable = GlPlaneDrawable(len(self._drawables) + self._gen_lists_start, plane_feature)
 				self._drawables.append(drawable)
-			part_drawable = GlPartDrawable(len(self._drawables) + self._gen_lists_start, self._part)
+			for feature in self._part.get_features_list():
+				if self._part.get_feature_geometry(feature.uid) is not None:
+					drawable = old_drawables.pop(feature.uid, None)
+					if drawable is None:
+						drawable = GlFeatureDrawable(len(self._drawables) + self._gen_lists_start, self._part, feature)
+					self._drawables.append(drawable)
+			if part_drawable is None:
+				part_drawable = GlPartDrawable(len(self._drawables) + self._gen_lists_start, self._part)
 			self._drawables.append(part_drawable)
+		self._released_drawables.extend(old_drawables.values())
+
+	def destroy_released_drawables(self):
+		for drawable in self._released_drawables:
+			drawable.destroy()
+		self._released_drawables = []
 
 	def redraw_drawables(self, show_messages=True):
-		if self._part.update_needed:
+		"""
+		Refills the buffers of the drawables whose geometry has changed. The part lines are only refilled when the part
+		has regenerated its geometry, and the planes when the part limits they are sized by have changed.
+		"""
+		geometry_updated = self._part.update_needed
+		if geometry_updated:
 			self._part.update_geometry()
 			self.update_drawables()
-		count = len(self._drawables) * 4
+		limits = self._part.get_limits()
+		plane_limits = (limits[0].x, limits[0].y, limits[0].z, limits[1].x, limits[1].y, limits[1].z)
+		limits_changed = plane_limits != self._plane_limits
+		self._plane_limits = plane_limits
+		count = len(self._drawables)
 		counter = 1
-		self._vertices.clear()
-		self._normals.clear()
 		for drawable in self._drawables:
-			if type(drawable) == GlPlaneDrawable:
+			if type(drawable) == GlPlaneDrawable and limits_changed:
 				drawable.on_plane_changed(None)
-				self._vertices.extend(drawable.vertices)
-				self._normals.extend(drawable.normals)
-			if show_messages:
-				self._document.set_status("Drawing planes faces %d" % counter, 100 * counter / count)
-			counter += 1
-		self._plane_faces_index = len(self._vertices) - 1
-		for drawable in self._drawables:
-			if type(drawable) == GlPlaneDrawable:
-				self._vertices.extend(drawable.lines)
-				self._normals.extend(drawable.lines)
+			elif type(drawable) == GlPartDrawable and geometry_updated:
+				drawable.invalidate()
+			drawable.update_buffers()
 			if show_messages:
-				self._document.set_status("Drawing plane edges %d" % counter, 100 * counter / count)
+				self._document.set_status("Drawing %d" % counter, 100 * counter / count)
 			counter += 1
-		self._plane_edges_index = len(self._vertices) - 1
-		for drawable in self._drawables:
-			if type(drawable) == GlPartDrawable:
-				self._vertices.extend(drawable.vertices)
-				self._normals.extend(drawable.normals)
-			if show_messages:
-				self._document.set_status("Drawing part faces %d" % counter, 100 * counter / count)
-			counter += 1
-		self._part_faces_index = len(self._vertices) - 1
+
+	def draw_buffers(self, drawable_type, mode, faces):
 		for drawable in self._drawables:
-			if type(drawable) == GlPartDrawable:
-				self._vertices.extend(drawable.lines)
-				self._normals.extend(drawable.lines)
-			if show_messages:
-				self._document.set_status("Drawing part edges %d" % counter, 100 * counter / count)
-			counter += 1
-		self._part_edges_index = len(self._vertices) - 1
-		self._new_verts = True
+			if type(drawable) == drawable_type:
+				if faces:
+					buffer = drawable.faces_buffer
+				else:
+					buffer = drawable.lines_buffer
+				buffer.draw(self._gl, self._program, mode, self.PROGRAM_VERTEX_ATTRIBUTE, self.PROGRAM_NORMALS_ATTRIBUTE)
 
 	def on_zoom_fit(self):
 		self.redraw_drawables()
@@ -307,10 +326,9 @@ class PartViewWidget(QOpenGLWidget):
 		self._program.bind()
 		self._program.enableAttributeArray(self.PROGRAM_VERTEX_ATTRIBUTE)
 		self._program.enableAttributeArray(self.PROGRAM_NORMALS_ATTRIBUTE)
-		self._program.setAttributeArray(self.PROGRAM_VERTEX_ATTRIBUTE, self._vertices)
-		self._program.setAttributeArray(self.PROGRAM_NORMALS_ATTRIBUTE, self._normals)
 		self._program.setUniformValue('gradient_color', self.background_color)
 
+	@probe('PartView.paintGL')
 	def paintGL(self):
 		gl = self._gl
 		if gl is None:
@@ -318,11 +336,7 @@ class PartViewWidget(QOpenGLWidget):
 		if self._part is not None:
 			if self._part.update_needed:
 				self.redraw_drawables(False)
-		if self._new_verts:
-			if len(self._vertices) > 0:
-				self._program.setAttributeArray(self.PROGRAM_VERTEX_ATTRIBUTE, self._vertices)
-				self._program.setAttributeArray(self.PROGRAM_NORMALS_ATTRIBUTE, self._normals)
-			self._new_verts = False
+		self.destroy_released_drawables()
 		c = self.background_color
 		self._gl.glClearColor(c.redF(), c.greenF(), c.blueF(), c.alphaF())
 		self._gl.glClear(self._gl.GL_COLOR_BUFFER_BIT | self._gl.GL_DEPTH_BUFFER_BIT)
@@ -373,34 +387,29 @@ class PartViewWidget(QOpenGLWidget):
 		self._program.setUniformValue('model_view_matrix', mv)
 		self._program.setUniformValue('normal_matrix', mv.normalMatrix())
 		self._gl.glEnable(self._gl.GL_DEPTH_TEST)
-		if self._plane_faces_index + 1 < self._plane_edges_index and self._show_planes:
+		if self._show_planes:
 			self.set_color(self.plane_color_edge)
 			self._gl.glLineWidth(2.0)
-			count = self._plane_edges_index - self._plane_faces_index
-			self._gl.glDrawArrays(self._gl.GL_LINES, self._plane_faces_index + 1, count)
-		if self._part_faces_index + 1 < self._part_edges_index:
+			self.draw_buffers(GlPlaneDrawable, self._gl.GL_LINES, False)
+		if self._show_lines:
+			self.set_color(self.part_color_edge)
+			self._gl.glLineWidth(1.5)
+			self.draw_buffers(GlPartDrawable, self._gl.GL_LINES, False)
+		if self._show_surfaces:
+			if self._show_lines:
+				self._gl.glEnable(self._gl.GL_POLYGON_OFFSET_FILL)
+				self._gl.glPolygonOffset(1.0, 1.0)
+			self._program.setUniformValue('lighting', True)
+			self.set_color(self.part_color)
+			self.set_specular(self.part_specular)
+			self.draw_buffers(GlFeatureDrawable, self._gl.GL_TRIANGLES, True)
+			self._program.setUniformValue('lighting', False)
 			if self._show_lines:
-				self.set_color(self.part_color_edge)
-				self._gl.glLineWidth(1.5)
-				count = self._part_edges_index - self._part_faces_index
-				self._gl.glDrawArrays(self._gl.GL_LINES, self._part_faces_index + 1, count)
-		if self._plane_edges_index + 1 < self._part_faces_index:
-			if self._show_surfaces:
-				if self._show_lines:
-					self._gl.glEnable(self._gl.GL_POLYGON_OFFSET_FILL)
-					self._gl.glPolygonOffset(1.0, 1.0)
-				self._program.setUniformValue('lighting', True)
-				self.set_color(self.part_color)
-				self.set_specular(self.part_specular)
-				count = self._part_faces_index - self._plane_edges_index
-				self._gl.glDrawArrays(self._gl.GL_TRIANGLES, self._plane_edges_index + 1, count)
-				self._program.setUniformValue('lighting', False)
-				if self._show_lines:
-					self._gl.glDisable(self._gl.GL_POLYGON_OFFSET_FILL)
-		if self._plane_faces_index > 0 and self._show_planes:
+				self._gl.glDisable(self._gl.GL_POLYGON_OFFSET_FILL)
+		if self._show_planes:
 			self._gl.glDepthMask(self._gl.GL_FALSE)
 			self.set_color(self.plane_color)
-			self._gl.glDrawArrays(self._gl.GL_TRIANGLES, 0, self._plane_faces_index + 1)
+			self.draw_buffers(GlPlaneDrawable, self._gl.GL_TRIANGLES, True)
 			self._gl.glDepthMask(self._gl.GL_TRUE)
 
 	def resizeGL(self, width, height):
@@ -6,6 +6,8 @@ from PyQt5.QtGui import QColor, QLinearGradient, QTransform, QPen, QPainter, QBr
 from PyQt5.QtWidgets import QDialog, QInputDialog, QMessageBox, QWidget
 
 from Business.SketchActions import *
+from Data.Profiler import probe
+from Data.Proformer import ProformerCopy, materialize_item
 from Data.Style import BrushType
 from GUI.GeometryViews.SketchView import get_sketch_view
 
@@ -288,6 +290,8 @@ class SketchEditorViewWidget(QWidget):
 		x = (self._mouse_position.x() - half_width) / scale - self._offset.x
 		y = -((self._mouse_position.y() - half_height) / scale + self._offset.y)
 
+		self.materialize_hover()
+
 		#                             ****    Keypoint move    ****
 		if self._states.left_button_hold and self._kp_hover is not None and self._states.allow_move:
 			if self._kp_hover in self._selected_key_points and self._kp_hover.editable:
@@ -296,6 +300,14 @@ class SketchEditorViewWidget(QWidget):
 		for event_handler in self._mouse_press_event_handlers:
 			event_handler(scale, x, y)
 
+	def materialize_hover(self):
+		"""
+		Creates the pattern copies under the mouse when they are pressed, hovering only gives them as ProformerCopy.
+		"""
+		self._kp_hover = materialize_item(self._kp_hover)
+		self._edge_hover = materialize_item(self._edge_hover)
+		self._area_hover = materialize_item(self._area_hover)
+
 	def wheelEvent(self, event):
 		if self._mouse_position is not None:
 			delta = event.angleDelta().y() / 8
@@ -312,6 +324,7 @@ class SketchEditorViewWidget(QWidget):
 				self._offset.y += disty * (delta * 0.01)
 				self.update()
 
+	@probe('SketchEditorView.paintEvent')
 	def paintEvent(self, event):
 		qp = QPainter()
 		qp.begin(self)
@@ -383,10 +396,10 @@ class SketchEditorViewWidget(QWidget):
 		edge_thickness = 6000/self._scale
 		if not self._states.show_thickness:
 			edge_thickness = 0
-		pens = create_pens(self._doc, edge_thickness)
-		pens_hover = create_pens(self._doc, edge_thickness, QColor(100, 100, 200), 2)
-		pens_select_high = create_pens(self._doc, edge_thickness, QColor(255, 0, 0), 3)
-		pens_select = create_pens(self._doc, edge_thickness, QColor(255, 255, 255))
+		pens = get_pens(self._doc, edge_thickness)
+		pens_hover = get_pens(self._doc, edge_thickness, QColor(100, 100, 200), 2)
+		pens_select_high = get_pens(self._doc, edge_thickness, QColor(255, 0, 0), 3)
+		pens_select = get_pens(self._doc, edge_thickness, QColor(255, 255, 255))
 		if self._is_dark_theme:
 			kp_pen = QPen(QColor(0, 200, 200), 1/self._scale)
 			kp_pen_hl = QPen(QColor(190, 0, 0), 3/self._scale)
@@ -399,10 +412,9 @@ class SketchEditorViewWidget(QWidget):
 		if self._sketch is None:
 			return
 
-		edges = self._sketch.get_edges()
-
-		for edge in edges:
-			draw_edge(edge, qp, pens, None)
+		sketch_view = get_sketch_view(self._sketch)
+		key_points, edges, areas = sketch_view.get_visible_items(qp)
+		sketch_view.draw_edges(qp, pens, edges)
 
 		for edge in self._selected_edges:
 			draw_edge(edge, qp, pens_select_high, None)
@@ -415,15 +427,14 @@ class SketchEditorViewWidget(QWidget):
 
 		qp.setPen(pens['default'])
 
-		key_points = self._sketch.get_keypoints()
 		for kp in key_points:
 			qp.setPen(kp_pen)
 			key_point = kp
 
-			if self._kp_hover is key_point and self._states.select_kp:
+			if self._kp_hover == key_point and self._states.select_kp:
 				qp.setPen(kp_pen_hover)
 
-			if self._states.show_key_points or self._kp_hover is key_point or self._states.set_similar_x or self._states.set_similar_y:
+			if self._states.show_key_points or self._kp_hover == key_point or self._states.set_similar_x or self._states.set_similar_y:
 				draw_kp(qp, key_point, self._scale)
 
 		qp.setPen(kp_pen_hl)
@@ -438,7 +449,8 @@ class SketchEditorViewWidget(QWidget):
 		area_brush = QBrush(QColor(150, 150, 150, 80))
 		area_hover_brush = QBrush(QColor(150, 150, 200, 80))
 		area_selected_brush = QBrush(QColor(150, 150, 200, 120))
-		areas = self._sketch.get_areas()
+		sketch_view = get_sketch_view(self._sketch)
+		key_points, edges, areas = sketch_view.get_visible_items(qp)
 
 		qp.setPen(Qt.NoPen)
 
@@ -449,16 +461,23 @@ class SketchEditorViewWidget(QWidget):
 			if area == self._area_hover:
 				brush = area_hover_brush
 
-			draw_area(area, qp, self._states.show_area_names or area in self._selected_areas, brush, 1/self._scale, None)
-			if area.brush is not None:
-				if area.brush.type == BrushType.Solid:
+			base_area = area.base if isinstance(area, ProformerCopy) else area
+			path, limits = sketch_view.get_area_path(base_area)
+			if base_area is not area:
+				path = get_copy_transform(area).map(path)
+				rect = path.boundingRect()
+				limits = Limits()
+				limits.x_min, limits.y_min, limits.x_max, limits.y_max = rect.left(), rect.top(), rect.right(), rect.bottom()
+			draw_area(area, qp, self._states.show_area_names or area in self._selected_areas, brush, 1/self._scale, None, path, limits)
+			if base_area.brush is not None:
+				if base_area.brush.type == BrushType.Solid:
 					brush = QBrush(QColor(0, 0, 0))
 				else:
 					brush = QBrush(QColor(0, 0, 0), Qt.HorPattern)
-				transform = QTransform().scale(1 / self._scale, 1 / self._scale).rotate(area.brush_rotation)
+				transform = QTransform().scale(1 / self._scale, 1 / self._scale).rotate(base_area.brush_rotation)
 				brush.setTransform(transform)
 
-				draw_area(area, qp, self._states.show_area_names or area in self._selected_areas, brush, 1/self._scale, None)
+				draw_area(area, qp, self._states.show_area_names or area in self._selected_areas, brush, 1/self._scale, None, path, limits)
 
 	def draw_instances(self, event, qp):
 
@@ -468,7 +487,7 @@ class SketchEditorViewWidget(QWidget):
 		for sketch_inst in self._sketch.sketch_instances:
 			si = sketch_inst.sketch
 			os = sketch_inst.offset/sketch_inst.scale
-			pens = create_pens(self._doc, 6000/(self._scale*sketch_inst.scale))
+			pens = get_pens(self._doc, 6000/(self._scale*sketch_inst.scale))
 
 			sketch_view = get_sketch_view(si)
 			sketch_view.draw_instance(qp, pens, sketch_inst.scale, 1 / self._scale, os, Vertex(), sketch_inst.rotation, sketch_inst.uid)
@@ -478,7 +497,7 @@ class SketchEditorViewWidget(QWidget):
 			sketch_inst = self._instance_hover
 			si = sketch_inst.sketch
 			os = sketch_inst.offset / sketch_inst.scale
-			hover_pens = create_pens(self._doc, 6000 / (self._scale * sketch_inst.scale), QColor(100, 100, 200), 1)
+			hover_pens = get_pens(self._doc, 6000 / (self._scale * sketch_inst.scale), QColor(100, 100, 200), 1)
 			sketch_view = get_sketch_view(si)
 			sketch_view.draw_instance(qp, hover_pens, sketch_inst.scale, 1 / self._scale, os, Vertex(), sketch_inst.rotation, sketch_inst.uid)
 			#draw_sketch(qp, si, sketch_inst.scale, 1 / self._scale, os, Vertex(), sketch_inst.rotation, hover_pens, {}, sketch_inst.uid)
@@ -486,7 +505,7 @@ class SketchEditorViewWidget(QWidget):
 		for sketch_inst in self._selected_instances:
 			si = sketch_inst.sketch
 			os = sketch_inst.offset / sketch_inst.scale
-			sel_pens = create_pens(self._doc, 6000 / (self._scale * sketch_inst.scale), QColor(255, 0, 0), 2)
+			sel_pens = get_pens(self._doc, 6000 / (self._scale * sketch_inst.scale), QColor(255, 0, 0), 2)
 			sketch_view = get_sketch_view(si)
 			sketch_view.draw_instance(qp, sel_pens, sketch_inst.scale, 1/self._scale, os, Vertex(), sketch_inst.rotation, sketch_inst.uid)
 			#draw_sketch(qp, si, sketch_inst.scale, 1 / self._scale, os, Vertex(), sketch_inst.rotation, sel_pens, {},sketch_inst.uid)
@@ -2,8 +2,10 @@ from PyQt5.QtGui import QColor, QBrush
 from PyQt5.QtGui import QPainter
 from PyQt5.QtWidgets import QWidget
 
+from Data.Profiler import probe
+from Data.Proformer import materialize_item
 from Data.Vertex import Vertex
-from GUI.Widgets.NewDrawers import create_pens, draw_sketch, draw_area, draw_edge, draw_kp
+from GUI.Widgets.NewDrawers import get_pens, draw_sketch, draw_area, draw_edge, draw_kp
 
 
 class SketchViewWidget(QWidget):
@@ -65,31 +67,22 @@ class SketchViewWidget(QWidget):
 		y = -((self._mouse_position.y() - height) / scale + offset.y)
 
 
+		spatial_index = self._sketch.get_spatial_index()
 		if self._keypoints_selectable:
-			for key_point in self._sketch.get_keypoints():
-				x1 = key_point.x
-				y1 = key_point.y
-				if abs(x1 - x) < 5 / scale and abs(y1 - y) < 5 / scale:
-					self._kp_hover = key_point
-					update_view = True
-					break
+			key_point = spatial_index.find_key_point(x, y, 5 / scale)
+			if key_point is not None:
+				self._kp_hover = key_point
+				update_view = True
 		if self._edges_selectable:
-			smallest_dist = 10e10
-			closest_edge = None
-			for edge in self._sketch.get_edges():
-				dist = edge.distance(Vertex(x, y, 0))
-				if dist < smallest_dist:
-					smallest_dist = dist
-					closest_edge = edge
+			closest_edge, smallest_dist = spatial_index.find_edge(x, y, 10 / scale)
 			if smallest_dist * scale < 10:
 				self._edge_hover = closest_edge
 				update_view = True
 		if self._areas_selectable and self._edge_hover is None:
-			for area in self._sketch.get_areas():
-				if area.inside(Vertex(x, y, 0)):
-					self._area_hover = area
-					update_view = True
-					break
+			areas = spatial_index.get_areas_at(x, y)
+			if len(areas) > 0:
+				self._area_hover = areas[0]
+				update_view = True
 		if update_view:
 			self.update()
 
@@ -100,6 +93,9 @@ class SketchViewWidget(QWidget):
 			return
 		if q_mouse_event.button() == 1:
 			pass
+		self._kp_hover = materialize_item(self._kp_hover)
+		self._edge_hover = materialize_item(self._edge_hover)
+		self._area_hover = materialize_item(self._area_hover)
 
 		if self._kp_hover is not None and self._keypoints_selectable:
 			self._selected_kps.clear()
@@ -162,6 +158,7 @@ class SketchViewWidget(QWidget):
 	def set_change_listener(self, change_listener):
 		self._change_listener = change_listener
 
+	@probe('SketchViewWidget.paintEvent')
 	def paintEvent(self, event):
 		qp = QPainter()
 		qp.begin(self)
@@ -179,10 +176,10 @@ class SketchViewWidget(QWidget):
 			scale_y = self.height() / sketch_height
 			scale = min(scale_x, scale_y) * 0.9
 
-			pens = create_pens(self._doc, 6000/scale, QColor(0, 0, 0))
-			pens_hover = create_pens(self._doc, 6000/scale, QColor(100, 100, 200), 1)
-			pens_select_high = create_pens(self._doc, 6000/scale, QColor(255, 0, 0), 2)
-			pens_select = create_pens(self._doc, 6000/scale, QColor(255, 255, 255))
+			pens = get_pens(self._doc, 6000/scale, QColor(0, 0, 0))
+			pens_hover = get_pens(self._doc, 6000/scale, QColor(100, 100, 200), 1)
+			pens_select_high = get_pens(self._doc, 6000/scale, QColor(255, 0, 0), 2)
+			pens_select = get_pens(self._doc, 6000/scale, QColor(255, 255, 255))
 
 			offset = Vertex(-limits[0] - sketch_width / 2, -limits[1] - sketch_height / 2)
 			draw_sketch(qp, self._sketch, scale, 1/scale, offset, center, 0, pens, {})
@@ -0,0 +1,94 @@
+import unittest
+from unittest import mock
+
+import Business.SketchActions as SketchActions
+from Data.Document import Document
+from Data.Events import ChangeEvent
+from Data.Objects import ObservableObject
+from Data.Proformer import ProformerType
+from Data.Sketch import Sketch
+
+
+class ChangeBatchTest(unittest.TestCase):
+	def setUp(self):
+		self.doc = Document()
+		self.sketch = Sketch(self.doc)
+		self.doc.add_sketch(self.sketch)
+		self.kps = [self.sketch.create_keypoint(i, 0, 0) for i in range(5)]
+		for i in range(4):
+			self.sketch.create_line_edge(self.kps[i], self.kps[i + 1])
+		self.index = self.sketch.get_spatial_index()
+		self.sketch.get_limits()
+
+	def test_move_key_points_in_batch(self):
+		with self.doc.batch():
+			for kp in self.kps:
+				kp.y = 10 + kp.x
+		for kp in self.kps:
+			self.assertIs(self.index.find_key_point(kp.x, 10 + kp.x, 0.1), kp)
+			self.assertIsNone(self.index.find_key_point(kp.x, 0, 0.1))
+		self.assertEqual(self.sketch.get_limits(), [0.0, 10.0, 4.0, 14.0])
+
+	def test_value_change_keeps_first_old_value(self):
+		events = []
+		self.kps[0].add_change_handler(lambda event: events.append(event))
+		with self.doc.batch():
+			self.kps[0].name = "a"
+			self.kps[0].name = "b"
+		name_events = [event for event in events if event.object == 'name']
+		self.assertEqual(len(name_events), 1)
+		self.assertEqual(name_events[0].old_value, "Keypoint")
+		self.assertEqual(name_events[0].new_value, "b")
+
+	def test_structural_events_are_deferred_in_order(self):
+		events = []
+		self.sketch.add_change_handler(lambda event: events.append((event.type, event.object)))
+		with self.doc.batch():
+			kp = self.sketch.create_keypoint(10, 10, 0)
+			edge = self.sketch.create_line_edge(self.kps[4], kp)
+			self.assertEqual(events, [])
+			self.assertIs(self.index.find_key_point(10, 10, 0.1), kp)
+		structural = [event for event in events if event[0] != ChangeEvent.ObjectChanged]
+		self.assertEqual(structural, [(ChangeEvent.BeforeObjectAdded, kp), (ChangeEvent.ObjectAdded, kp),
+																	(ChangeEvent.BeforeObjectAdded, edge), (ChangeEvent.ObjectAdded, edge)])
+
+	@staticmethod
+	def create_pattern():
+		doc = Document()
+		sketch = Sketch(doc)
+		doc.add_sketch(sketch)
+		kps = [sketch.create_keypoint(x, y, 0) for x, y in [(0, 0), (1, 0), (1, 1), (0, 1)]]
+		edges = [sketch.create_line_edge(kps[i], kps[(i + 1) % 4]) for i in range(4)]
+		area = sketch.create_area()
+		for edge in edges:
+			area.add_edge(edge)
+		counts = {'param_1_name': 'count1', 'param_1_value': 3, 'param_2_name': 'count2', 'param_2_value': 3}
+		dimensions = {'param_1_name': 'length', 'param_1_value': 3.0, 'param_2_name': 'angle', 'param_2_value': 0.0}
+		return SketchActions.create_pattern(sketch, ProformerType.Square, kps, edges, [area], counts, dimensions)
+
+	@staticmethod
+	def count_handler_calls(function):
+		calls = []
+		notify = ObservableObject.notify
+
+		def counting_notify(observable, event):
+			calls.extend((event.type, event.object) for handler in observable.change_handlers)
+			notify(observable, event)
+
+		with mock.patch.object(ObservableObject, 'notify', counting_notify):
+			function()
+		return calls
+
+	def test_batch_reduces_handler_calls(self):
+		proformer = self.create_pattern()
+		unbatched = self.count_handler_calls(lambda: [proformer.materialize_copy(i) for i in proformer.get_pending_indexes()])
+		proformer = self.create_pattern()
+		batched = self.count_handler_calls(proformer.materialize)
+		self.assertEqual(len(proformer.result_areas), 8)
+		self.assertLess(len(batched), len(unbatched) * 0.75)
+		changed = [call for call in batched if call[0] == ChangeEvent.ObjectChanged]
+		self.assertEqual(len(changed), len(set(id(call[1]) for call in changed)))
+
+
+if __name__ == '__main__':
+	unittest.main()
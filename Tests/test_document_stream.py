@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import Business
+import Data.DocumentStream
+from Data.Document import Document
+from Data.DocumentStream import ChunkReader, stream_format_ending
+from Data.Geometries import GeometryStub
+from Data.Sketch import Sketch
+
+
+class DocumentStreamTest(unittest.TestCase):
+	def setUp(self):
+		self.path = tempfile.mkdtemp(prefix="pracedru-test-")
+		doc = Document()
+		for name in ("First", "Second", "Third"):
+			sketch = Sketch(doc)
+			sketch.name = name
+			doc.add_sketch(sketch)
+			kps = [sketch.create_keypoint(x, y, 0) for x, y in [(0, 0), (1, 0), (1, 1)]]
+			for i in range(3):
+				sketch.create_line_edge(kps[i], kps[(i + 1) % 3])
+		doc.path = self.path
+		doc.name = "test" + stream_format_ending
+		Business.save_document(doc)
+		self.file_path = os.path.join(self.path, doc.name)
+
+	def tearDown(self):
+		shutil.rmtree(self.path, ignore_errors=True)
+
+	def load_counting_reads(self):
+		reads = []
+		read_chunk = ChunkReader.read_chunk
+
+		def counting_read_chunk(reader, name):
+			reads.append(name)
+			return read_chunk(reader, name)
+
+		with mock.patch.object(ChunkReader, 'read_chunk', counting_read_chunk):
+			doc = Business.load_document(self.file_path, lazy=True)
+			self.assertEqual([name for name in reads if name.startswith('geoms/')], [])
+			sketch = doc.get_geometries().get_sketch_by_name("Second")
+		return doc, sketch, reads
+
+	def test_lazy_load_decodes_only_accessed_geometry(self):
+		doc, sketch, reads = self.load_counting_reads()
+		self.assertEqual(sketch.name, "Second")
+		self.assertEqual(len(sketch.get_edges()), 3)
+		self.assertEqual(len([name for name in reads if name.startswith('geoms/') and not name.endswith('/xyz')]), 1)
+		stubs = [geometry for geometry in doc.get_geometries()._geometries.values() if type(geometry) is GeometryStub]
+		self.assertEqual(sorted(stub.name for stub in stubs), ["First", "Third"])
+		self.assertFalse(hasattr(stubs[0], 'data'))
+
+	def test_lazy_document_saves_unloaded_geometries(self):
+		doc, sketch, reads = self.load_counting_reads()
+		Business.save_document(doc)
+		self.assertEqual(len(doc.get_geometries().get_sketch_by_name("Third").get_edges()), 3)
+		doc = Business.load_document(self.file_path)
+		names = sorted(geometry.name for geometry in doc.get_geometries().items())
+		self.assertEqual(names, ["First", "Second", "Third"])
+
+	def test_lazy_load_of_file_without_geometry_headers(self):
+		read_document_data = Data.DocumentStream.read_document_data
+
+		def read_old_document_data(file_path):
+			with mock.patch.object(Data.DocumentStream.LazySections, 'get_header', lambda sections, key: None):
+				return read_document_data(file_path)
+
+		with mock.patch.object(Data.DocumentStream, 'read_document_data', read_old_document_data):
+			doc = Business.load_document(self.file_path, lazy=True)
+		self.assertEqual(doc.get_geometries().get_sketch_by_name("Third").name, "Third")
+
+	def test_doc_sections_decoded_once_and_membership_without_decoding(self):
+		reads = []
+		read_chunk = ChunkReader.read_chunk
+
+		def counting_read_chunk(reader, name):
+			reads.append(name)
+			return read_chunk(reader, name)
+
+		with mock.patch.object(ChunkReader, 'read_chunk', counting_read_chunk):
+			data = Data.DocumentStream.read_document_data(self.file_path)
+			geometries = data['geoms']['geoms']
+			uid = next(iter(geometries))
+			self.assertIn('name', data)
+			self.assertIn(uid, geometries)
+			self.assertNotIn('missing', geometries)
+			self.assertEqual(reads, ['sections', 'geoms'])
+			self.assertEqual(data.get('name'), data['name'])
+			self.assertEqual(reads.count('doc/name'), 1)
+			geometries[uid]
+			geometries[uid]
+			self.assertEqual(reads.count('geoms/' + uid), 2)
+
+	def test_failed_save_keeps_file_and_removes_temp_file(self):
+		with open(self.file_path, 'rb') as data_file:
+			saved = data_file.read()
+		doc = Business.load_document(self.file_path)
+		with mock.patch.object(Sketch, 'serialize_json', side_effect=ValueError("serialization failed")):
+			with self.assertRaises(ValueError):
+				Data.DocumentStream.write_document(self.file_path, doc)
+		self.assertEqual(os.listdir(self.path), [os.path.basename(self.file_path)])
+		with open(self.file_path, 'rb') as data_file:
+			self.assertEqual(data_file.read(), saved)
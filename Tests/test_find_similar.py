@@ -0,0 +1,34 @@
+import unittest
+
+import Business.SketchActions as SketchActions
+from Data.Document import Document
+from Data.Sketch import Sketch
+
+
+class FindAllSimilarTest(unittest.TestCase):
+	def setUp(self):
+		self.doc = Document()
+		self.sketch = Sketch(self.doc)
+		self.doc.add_sketch(self.sketch)
+
+	def test_chained_values_are_split(self):
+		values = [0.0, 0.9, 1.8, 2.7, 3.6]
+		labels, means = SketchActions.cluster_values(values, 1.0)
+		self.assertEqual(list(labels), [0, 0, 1, 1, 2])
+		self.assertEqual(list(means), [0.45, 2.25, 3.6])
+
+	def test_parameters_stay_within_tolerance(self):
+		values = [0.0, 0.9, 1.8, 2.7, 3.6, 0.3]
+		kps = [self.sketch.create_keypoint(x, 0, 0) for x in values]
+		SketchActions.find_all_similar(self.doc, self.sketch, tolerance=1.0)
+		for kp, x in zip(kps, values):
+			self.assertLessEqual(abs(kp.get_x_parameter().value - x), 1.0)
+		self.assertEqual(len(set(kp.get_x_parameter() for kp in kps)), 3)
+
+	def test_digits_round_the_parameter_values(self):
+		values = [0.101, 0.104, 0.2, 0.203, 0.3]
+		kps = [self.sketch.create_keypoint(x, 0, 0) for x in values]
+		SketchActions.find_all_similar(self.doc, self.sketch, digits=2)
+		self.assertEqual([kp.get_x_parameter().value for kp in kps], [0.1, 0.1, 0.2, 0.2, 0.3])
+		self.assertIs(kps[0].get_x_parameter(), kps[1].get_x_parameter())
+		self.assertIsNot(kps[1].get_x_parameter(), kps[2].get_x_parameter())
@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+from Data.Nurbs import NurbsSurface, example_surface
+from Data.NurbsBackend import NumpyNurbsBackend, OpenCLNurbsBackend, cl
+
+
+class RecordingBackend(NumpyNurbsBackend):
+	def __init__(self):
+		self.surfaces = []
+
+	def evaluate_surface_grid(self, surface, us, vs):
+		self.surfaces.append(surface)
+		return NumpyNurbsBackend.evaluate_surface_grid(self, surface, us, vs)
+
+
+@unittest.skipIf(cl is None, "pyopencl is not installed")
+class OpenCLNurbsBackendTest(unittest.TestCase):
+	def setUp(self):
+		self.fallback = RecordingBackend()
+		try:
+			self.backend = OpenCLNurbsBackend(self.fallback)
+		except Exception as e:
+			self.skipTest("OpenCL backend not available: " + str(e))
+		self.us = np.linspace(0.0, 1.0, 17)
+		self.vs = np.linspace(0.0, 1.0, 13)
+
+	def assert_matches_numpy(self, surface):
+		expected = surface.evaluate_grid(self.us, self.vs)
+		result = self.backend.evaluate_surface_grid(surface, self.us, self.vs)
+		np.testing.assert_allclose(result, expected, atol=1e-9)
+
+	def test_example_surface(self):
+		self.assert_matches_numpy(example_surface())
+		self.assertEqual(self.fallback.surfaces, [])
+
+	def test_rational_surface(self):
+		surface = NurbsSurface()
+		x, y = np.meshgrid(np.arange(6.0), np.arange(5.0), indexing='ij')
+		surface.set_controls(np.dstack((x, y, np.sin(x) * np.cos(y))))
+		surface._weights = 1.0 + (x + y) / 10.0
+		self.assert_matches_numpy(surface)
+		self.assertEqual(self.fallback.surfaces, [])
+
+	def test_too_few_controls_fall_back(self):
+		surface = NurbsSurface()
+		surface.set_controls(np.array([[[0, 0, 0], [1, 0, 0]], [[0, 1, 0], [1, 1, 1]], [[0, 2, 0], [1, 2, 0]]]))
+		surface.curves[1]._knots = [0.0, 0.0, 0.0, 1.0, 1.0]
+		self.assert_matches_numpy(surface)
+		self.assertEqual(self.fallback.surfaces, [surface])
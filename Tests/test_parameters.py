@@ -0,0 +1,92 @@
+import unittest
+from unittest import mock
+
+from Data.Document import Document
+from Data.Parameters import Parameter, dependency_order
+from Data.Sketch import Sketch
+
+
+class ParameterFormulaTest(unittest.TestCase):
+	def setUp(self):
+		self.doc = Document()
+		self.sketch = Sketch(self.doc)
+		self.doc.add_sketch(self.sketch)
+
+	def test_formula_with_two_word_names(self):
+		width = self.doc.create_parameter("plate width", 2.0)
+		self.sketch.create_parameter("new parameter", 3.0)
+		result = self.sketch.create_parameter("result")
+		result.value = "plate width * new parameter + plate width"
+		self.assertEqual(result.value, 8.0)
+		self.assertIn("{" + width.uid + "}", result.get_instance_internal_formula(None))
+		width.value = 4.0
+		self.assertEqual(result.value, 16.0)
+
+	def test_longest_name_wins(self):
+		self.doc.create_parameter("a", 1.0)
+		self.doc.create_parameter("a b", 10.0)
+		result = self.sketch.create_parameter("result")
+		result.value = "a b + a"
+		self.assertEqual(result.value, 11.0)
+
+	def test_self_reference(self):
+		param = self.sketch.create_parameter("new parameter")
+		with self.assertRaises(Exception):
+			param.value = "new parameter + 1"
+
+
+class ParameterPropagationTest(unittest.TestCase):
+	def setUp(self):
+		self.doc = Document()
+		self.sketch = Sketch(self.doc)
+		self.doc.add_sketch(self.sketch)
+		self.a = self.sketch.create_parameter("a", 1.0)
+		self.b = self.sketch.create_parameter("b")
+		self.b.value = "a * 2"
+		self.c = self.sketch.create_parameter("c")
+		self.c.value = "a + 1"
+		self.d = self.sketch.create_parameter("d")
+		self.d.value = "b + c"
+
+	def record_updates(self, change):
+		updates = []
+		update_from_senders = Parameter.update_from_senders
+
+		def recording_update(param, instance_uid, sender_uids):
+			updates.append((param.name, instance_uid))
+			return update_from_senders(param, instance_uid, sender_uids)
+
+		with mock.patch.object(Parameter, 'update_from_senders', recording_update):
+			change()
+		return updates
+
+	def assert_diamond_order(self, updates, instance_uid):
+		self.assertEqual(sorted(updates[:2]), [("b", instance_uid), ("c", instance_uid)])
+		self.assertEqual(updates[2:], [("d", instance_uid)])
+
+	def test_dependency_order(self):
+		order = dependency_order([self.a])
+		self.assertEqual(len(order), 4)
+		self.assertEqual(order[0], self.a)
+		self.assertEqual(set(order[1:3]), {self.b, self.c})
+		self.assertEqual(order[3], self.d)
+
+	def test_diamond_is_evaluated_once_in_order(self):
+		def change():
+			self.a.value = 3.0
+		self.assert_diamond_order(self.record_updates(change), None)
+		self.assertEqual((self.b.value, self.c.value, self.d.value), (6.0, 4.0, 10.0))
+
+	def test_instance_values_propagate(self):
+		def change():
+			self.a.set_instance_value("instance", 5.0)
+		self.assert_diamond_order(self.record_updates(change), "instance")
+		self.assertEqual(self.b.get_instance_value("instance"), 10.0)
+		self.assertEqual(self.c.get_instance_value("instance"), 6.0)
+		self.assertEqual(self.d.get_instance_value("instance"), 16.0)
+		self.assertEqual(self.d.value, 4.0)
+		self.assertFalse(self.d.has_instance_value("other"))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from math import pi
+
+import Business.SketchActions as SketchActions
+from Data.Document import Document
+from Data.Events import ChangeEvent
+from Data.Proformer import ProformerCopy, ProformerType, materialize_item
+from Data.Sketch import Sketch
+
+
+class ProformerTest(unittest.TestCase):
+	def setUp(self):
+		self.doc = Document()
+		self.sketch = Sketch(self.doc)
+		self.doc.add_sketch(self.sketch)
+		self.kps = [self.sketch.create_keypoint(x, y, 0) for x, y in [(0, 0), (1, 0), (1, 1), (0, 1)]]
+		self.edges = [self.sketch.create_line_edge(self.kps[i], self.kps[(i + 1) % 4]) for i in range(4)]
+		self.area = self.sketch.create_area()
+		for edge in self.edges:
+			self.area.add_edge(edge)
+		counts = {'param_1_name': 'count1', 'param_1_value': 5, 'param_2_name': 'count2', 'param_2_value': 5}
+		dimensions = {'param_1_name': 'length', 'param_1_value': 3.0, 'param_2_name': 'angle', 'param_2_value': 0.0}
+		self.proformer = SketchActions.create_pattern(self.sketch, ProformerType.Square, self.kps, self.edges, [self.area], counts, dimensions)
+		self.events = []
+		self.sketch.add_change_handler(lambda event: self.events.append((event.type, event.object)))
+
+	def get_created_count(self):
+		return len(self.proformer.result_keypoints) + len(self.proformer.result_edges) + len(self.proformer.result_areas)
+
+	def test_copies_are_not_created(self):
+		self.assertEqual(self.sketch.get_limits(), [0.0, 0.0, 13.0, 13.0])
+		self.assertEqual(len(self.sketch.get_keypoints()), 4)
+		self.assertEqual(self.sketch.key_point_count, 100)
+		self.assertEqual(self.sketch.edges_count, 100)
+		self.assertEqual(self.get_created_count(), 0)
+		self.assertEqual(len(self.sketch.get_spatial_index().get_items_in(-1, -1, 14, 14)), 9 * 25)
+		self.assertEqual(self.get_created_count(), 0)
+
+	def test_limits_follow_base_geometry(self):
+		self.sketch.get_limits()
+		self.kps[2].x = 2.0
+		self.assertEqual(self.sketch.get_limits(), [0.0, 0.0, 14.0, 13.0])
+		self.sketch.get_parameter_by_name('count1').value = 2
+		self.assertEqual(self.sketch.get_limits(), [0.0, 0.0, 5.0, 13.0])
+		self.assertEqual(self.get_created_count(), 0)
+
+	def test_copy_created_by_uid(self):
+		kp = self.sketch.get_keypoint(self.kps[2].uid + "-Square6")
+		self.assertEqual((kp.x, kp.y), (7.0, 4.0))
+		self.assertEqual(len(self.proformer.result_keypoints), 4)
+		self.assertEqual(len(self.proformer.result_areas), 1)
+		self.assertIsNone(self.sketch.get_keypoint(self.kps[2].uid + "-Square24"))
+		self.assertIs(self.sketch.get_area(self.area.uid + "-Square6"), list(self.proformer.result_areas)[0])
+
+	def test_created_copies_are_added_and_removed_with_events(self):
+		self.sketch.get_edge(self.edges[0].uid + "-Square23")
+		added = [item for event_type, item in self.events if event_type == ChangeEvent.ObjectAdded]
+		before_added = [item for event_type, item in self.events if event_type == ChangeEvent.BeforeObjectAdded]
+		self.assertEqual(len(added), 9)
+		self.assertEqual(added, before_added)
+		self.events.clear()
+		self.sketch.get_parameter_by_name('count2').value = 2
+		removed = [item for event_type, item in self.events if event_type == ChangeEvent.ObjectRemoved]
+		self.assertEqual(set(removed), set(added))
+		self.assertEqual(self.get_created_count(), 0)
+
+	def test_hit_tests_do_not_create_copies(self):
+		index = self.sketch.get_spatial_index()
+		kp = index.find_key_point(10.0, 7.05, 0.1)
+		self.assertIsInstance(kp, ProformerCopy)
+		self.assertEqual(kp.uid, self.kps[2].uid + "-Square12")
+		self.assertEqual((kp.x, kp.y), (10.0, 7.0))
+		self.assertEqual(index.find_key_point(10.0, 7.05, 0.1), kp)
+		edge, distance = index.find_edge(6.5, 3.1, 0.5)
+		self.assertEqual(edge.uid, self.edges[0].uid + "-Square6")
+		self.assertAlmostEqual(distance, 0.1)
+		areas = index.get_areas_at(12.5, 12.5)
+		self.assertEqual([area.uid for area in areas], [self.area.uid + "-Square23"])
+		self.assertEqual(self.get_created_count(), 0)
+		self.assertEqual(self.events, [])
+
+	def test_materialize_hit_copy(self):
+		index = self.sketch.get_spatial_index()
+		kp = materialize_item(index.find_key_point(10.0, 7.05, 0.1))
+		self.assertIs(self.sketch.get_keypoint(self.kps[2].uid + "-Square12"), kp)
+		self.assertEqual((kp.x, kp.y), (10.0, 7.0))
+		self.assertEqual(len(self.proformer.result_keypoints), 4)
+		self.assertIs(index.find_key_point(10.0, 7.05, 0.1), kp)
+		self.assertIs(materialize_item(kp), kp)
+
+	def test_circular_copies(self):
+		center = self.sketch.create_keypoint(-1, 0, 0)
+		counts = {'param_1_name': 'count', 'param_1_value': 4}
+		dimensions = {'param_1_name': 'dim', 'param_1_value': pi / 2}
+		proformer = SketchActions.create_pattern(self.sketch, ProformerType.Circular, self.kps, self.edges, [self.area], counts, dimensions, center)
+		index = self.sketch.get_spatial_index()
+		kp = index.find_key_point(-2.0, 2.0, 0.01)
+		self.assertEqual(kp.uid, self.kps[2].uid + "-Circular0")
+		areas = index.get_areas_at(-2.5, -0.5)
+		self.assertEqual([area.uid for area in areas], [self.area.uid + "-Circular1"])
+		self.assertEqual(len(proformer.result_keypoints), 0)
+		materialize_item(areas[0])
+		self.assertEqual(len(proformer.result_keypoints), 4)
@@ -0,0 +1,97 @@
+import unittest
+from math import pi
+
+import Business.SketchActions as SketchActions
+from Data.Areas import CompositeArea
+from Data.Document import Document
+from Data.Sketch import Sketch
+
+
+class CreateAllAreasTest(unittest.TestCase):
+	def setUp(self):
+		self.doc = Document()
+		self.sketch = Sketch(self.doc)
+		self.doc.add_sketch(self.sketch)
+
+	def add_square(self, x, y, size=1.0):
+		kps = [self.sketch.create_keypoint(x + dx * size, y + dy * size, 0) for dx, dy in [(0, 0), (1, 0), (1, 1), (0, 1)]]
+		for i in range(4):
+			self.sketch.create_line_edge(kps[i], kps[(i + 1) % 4])
+		return kps
+
+	def get_area_sizes(self):
+		return sorted(len(area.get_edges()) for area in self.sketch.get_areas())
+
+	def test_grid_has_cells_and_outline(self):
+		cells = 3
+		kps = [[self.sketch.create_keypoint(i, j, 0) for j in range(cells + 1)] for i in range(cells + 1)]
+		for i in range(cells + 1):
+			for j in range(cells):
+				self.sketch.create_line_edge(kps[i][j], kps[i][j + 1])
+				self.sketch.create_line_edge(kps[j][i], kps[j + 1][i])
+		SketchActions.create_all_areas(self.doc, self.sketch)
+		self.assertEqual(self.get_area_sizes(), [4] * 9 + [12])
+
+	def test_single_loop_is_one_area(self):
+		self.add_square(0, 0)
+		SketchActions.create_all_areas(self.doc, self.sketch)
+		self.assertEqual(self.get_area_sizes(), [4])
+
+	def test_outline_touching_itself_is_not_an_area(self):
+		first = self.add_square(0, 0)
+		second = self.add_square(3, 0)
+		self.sketch.create_line_edge(first[1], second[0])
+		SketchActions.create_all_areas(self.doc, self.sketch)
+		self.assertEqual(self.get_area_sizes(), [4, 4])
+
+
+class InsidePointsTest(unittest.TestCase):
+	def setUp(self):
+		self.doc = Document()
+		self.sketch = Sketch(self.doc)
+		self.doc.add_sketch(self.sketch)
+
+	def add_rectangle(self, x1, y1, x2, y2):
+		kps = [self.sketch.create_keypoint(x, y, 0) for x, y in [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]]
+		for i in range(4):
+			self.sketch.create_line_edge(kps[i], kps[(i + 1) % 4])
+
+	def get_single_area(self):
+		SketchActions.create_all_areas(self.doc, self.sketch)
+		areas = list(self.sketch.get_areas())
+		self.assertEqual(len(areas), 1)
+		return areas[0]
+
+	def test_rectangle(self):
+		self.add_rectangle(0, 0, 4, 2)
+		area = self.get_single_area()
+		inside = area.inside_points([[1, 1], [3.9, 0.1], [5, 1], [2, 2.5], [-0.1, 1]])
+		self.assertEqual(inside.tolist(), [True, True, False, False, False])
+
+	def test_arc_area(self):
+		center = self.sketch.create_keypoint(0, 0, 0)
+		arc = self.sketch.create_arc_edge(center, 0, pi, 1)
+		start_kp, end_kp = arc.get_end_key_points()
+		self.sketch.create_line_edge(end_kp, start_kp)
+		area = self.get_single_area()
+		inside = area.inside_points([[0, 0.5], [0, 0.95], [0.9, 0.1], [0.9, 0.9], [0, -0.1]])
+		self.assertEqual(inside.tolist(), [True, True, True, False, False])
+
+	def test_composite_area_with_hole(self):
+		self.add_rectangle(0, 0, 4, 4)
+		self.add_rectangle(1, 1, 3, 3)
+		SketchActions.create_all_areas(self.doc, self.sketch)
+		composites = [area for area in self.sketch.get_areas() if type(area) is CompositeArea]
+		self.assertEqual(len(composites), 1)
+		inside = composites[0].inside_points([[0.5, 0.5], [3.5, 2], [2, 2], [1.5, 2.5], [5, 2]])
+		self.assertEqual(inside.tolist(), [True, True, False, False, False])
+
+	def test_nurbs_area_uses_the_curve(self):
+		kps = [self.sketch.create_keypoint(x, y, 0) for x, y in [(0, 0), (1, 2), (2, 0)]]
+		nurbs_edge = self.sketch.create_nurbs_edge(kps[0])
+		nurbs_edge.add_key_point(kps[1])
+		nurbs_edge.add_key_point(kps[2])
+		self.sketch.create_line_edge(kps[2], kps[0])
+		area = self.get_single_area()
+		inside = area.inside_points([[1, 0.5], [1, 1.5], [0.5, 0.9]])
+		self.assertEqual(inside.tolist(), [True, False, False])
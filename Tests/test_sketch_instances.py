@@ -0,0 +1,42 @@
+import unittest
+
+from Data.Document import Document
+from Data.Sketch import Sketch
+
+
+class SketchInstanceValuesTest(unittest.TestCase):
+	def setUp(self):
+		self.doc = Document()
+		self.sketch = Sketch(self.doc)
+		self.doc.add_sketch(self.sketch)
+		self.kps = [self.sketch.create_keypoint(x, y, 0) for x, y in [(0, 0), (2, 0), (2, 1)]]
+		self.width = self.sketch.create_parameter("width", 2.0)
+
+	def test_instance_without_own_values_looks_like_sketch(self):
+		self.assertEqual(self.sketch.get_instance_values_key("instance"), ())
+		self.assertEqual(self.sketch.get_limits_in_instance("instance"), [0.0, 0.0, 2.0, 1.0])
+
+	def test_instance_values_change_key_and_limits(self):
+		self.kps[1].set_instance_x("instance", 5.0)
+		self.width.set_instance_value("instance", 5.0)
+		key = self.sketch.get_instance_values_key("instance")
+		self.assertEqual(key, ((self.width.uid, 5.0), (self.kps[1].uid, (5.0, 0.0, 0.0))))
+		self.assertEqual(self.sketch.get_instance_values_key("other"), ())
+		self.assertEqual(self.sketch.get_limits_in_instance("instance"), [0.0, 0.0, 5.0, 1.0])
+		self.assertEqual(self.sketch.get_limits(), [0.0, 0.0, 2.0, 1.0])
+
+
+class SketchInstanceLimitsTest(unittest.TestCase):
+	def test_deleted_instance_limits_are_dropped(self):
+		doc = Document()
+		sketch = Sketch(doc)
+		doc.add_sketch(sketch)
+		inserted = Sketch(doc)
+		doc.add_sketch(inserted)
+		inserted.create_keypoint(1, 1, 0)
+		instance = sketch.create_sketch_instance(inserted, sketch.create_keypoint(3, 0, 0))
+		self.assertEqual(sketch.get_limits(), [3.0, 0.0, 4.0, 1.0])
+		self.assertIn(instance.uid, sketch._instance_limits)
+		instance.delete()
+		self.assertNotIn(instance.uid, sketch._instance_limits)
+		self.assertEqual(list(sketch.sketch_instances), [])
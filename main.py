@@ -6,6 +6,7 @@ from PyQt5.QtWidgets import *
 
 import Business
 from Data.Document import Document
+from Data.Profiler import start_from_environment
 from GUI.MainWindow import MainWindow
 import os
 from pathlib import Path
@@ -31,6 +32,7 @@ def load_language(a):
 
 
 def main():
+	start_from_environment()
 	a = QApplication(sys.argv)
 	a.setQuitOnLastWindowClosed(True)
 	load_language(a)